@@ -1,42 +1,86 @@
 import contextlib
-import json
 import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable
+from contextlib import AbstractContextManager
+from itertools import repeat
 from pathlib import Path
-from typing import Optional, cast
+from time import perf_counter
+from typing import TYPE_CHECKING, Optional, TextIO, cast
 
-from memory_block_data_path import MEMORY_BLOCK_DATA_PATH
+from salut.cache import IncludeCache, get_file_hash
+from salut.compression import delta_encode, rle_encode
+from salut.diagnostics import Diagnostics, Stats, write_report
+from salut.dispatch import INSTRUCTIONS_BY_NAME, find_instruction
 from salut.errors import (
     AssemblerError,
     AssemblerNameError,
     InstructionError,
     LabelError,
+    MemoryOverflowError,
     OperandError,
     RecursiveIncludeError,
     UndefinedValueError,
 )
+from salut.fixups import Fixup
+from salut.linker import RAM_SIZE, Linker
+from salut.objects import ObjectUnit
+from salut.readers import read_binary
+from salut.tokenizer import EMPTY, Label, Operand, Statement, tokenize_line
 from salut.utils import (
     FLAG_NAMES,
     FLAG_NUMBER_NAMES,
     IMM,
-    INSTRUCTIONS,
+    IMMEDIATE,
     NAME,
     PATH,
     PORT_NAMES,
     REGISTER_NAMES,
     RESERVED_NAMES,
     SQUARED_IMM,
+    SQUARED_IMMEDIATE,
     SQUARED_R,
     SQUARED_SUM_R,
     Instruction,
     immediate_to_int,
 )
+from salut.writers import WRITERS, OutputStamps, write_output
+
+# argparse, процессы и оптимизатор (таблица декодирования) импортируются,
+# только когда нужны: ассемблер часто импортируется ради одной сборки
+if TYPE_CHECKING:
+    import argparse
+
+INCLUDE_CACHE_PATH = ".salut_cache"
+OBJECT_SUFFIX = ".sobj"
+STDIN_PATH = "-"
+CHUNK_LINES = 8192  # строк в одной части файла при параллельной сборке
+# строка исходника: разобранная строка и её код (имя вместо слова - для Fixup)
+LineCache = dict[str, tuple[Statement, tuple[int | str, ...]]]
 
 
 class Assembler:
     _illegal_characters: str = " :,-+[]'"
 
-    def __init__(self, address_shift: int, included_files: Optional[list[str]]) -> None:
-        self._address_shift: int = address_shift
+    def __init__(
+        self,
+        included_files: Optional[list[str]] = None,
+        path: Optional[str] = None,
+        include_cache: Optional[IncludeCache] = None,
+        jobs: int = 1,
+        diagnostics: Optional[Diagnostics] = None,
+        stats: Optional[Stats] = None,
+        line_cache: Optional[LineCache] = None,
+    ) -> None:
+        self._path: Optional[str] = path
+        self._include_cache = include_cache
+        self._jobs = jobs  # число процессов для сборки больших файлов по частям
+        # сообщения сборки (по умолчанию выводятся сразу) и замеры этапов, если нужны
+        self._diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self._stats = stats
+        # разобранные строки с кодом, общие для всех сборок (см. salut.server)
+        self._line_cache = line_cache
         self._line_count: int = 0
         self._word_count: int = 0  # одно слово - 16 бит
         self._constants: dict[str, int] = {}  # константы, объявленные через .equ
@@ -44,37 +88,32 @@ class Assembler:
         self._local_labels: dict[
             str, dict[str, int]  # глобальная: {локальная: адрес}
         ] = {}
-        self._included_names: list[str | tuple[str, str]] = []
+        # адреса глобальных меток по возрастанию и их имена (для поиска области видимости)
+        self._global_label_addresses: list[int] = []
+        self._global_label_names: list[str] = []
+        self._included_names: set[str | tuple[str, str]] = set()
         if included_files is None:
             included_files = []
         self._included_files = included_files
         self._was_error = False
-        self._word_to_line: dict[
-            int, int
-        ] = {}  # номер слова: номер строки (для принта ошибок)
-
-    @staticmethod
-    def _format_line(line: str) -> str:
-        """Убирает комментарии, табуляцию и превращает всё в верхний регистр"""
-        return line.split(";")[0].upper().strip()
-
-    @staticmethod
-    def _parse_line(line: str) -> tuple[str, list[str]]:
-        """Возвращает имя инструкции и её операнды из форматированной (непустой) строчки кода"""
-        splitted_line = line.split(maxsplit=1)
-        if len(splitted_line) == 1:
-            return line, []
-        instruction_name = splitted_line[0]
-        operands = splitted_line[1].replace(" ", "").split(",")
-        return instruction_name, operands
+        # файлы, включённые в код (в том числе вложенно): (путь, sha256)
+        self._dependencies: list[tuple[str, str]] = []
+        # слова, в которые при разрешении имён подставляются метки и константы
+        self._fixups: list[Fixup] = []
+        # номер первого слова инструкции и номер её строки, по возрастанию
+        # (строки с .INCLUDE покрывают весь код включённого файла)
+        self._line_map_words: array[int] = array("I")
+        self._line_map_lines: array[int] = array("I")
+        # первые слова инструкций самого файла (без .DATA и включённых файлов)
+        self._instruction_words: array[int] = array("I")
+        # .ASSUME: (адрес, регистр, значение), значение-имя хранится как Fixup
+        self._assumptions: list[tuple[int, int, int | Fixup]] = []
+        # имена из .KEEP: их код не удаляется как недостижимый
+        self._kept_names: list[Fixup] = []
 
     @staticmethod
     def _find_operand_patterns(instruction_name: str) -> list[str]:
-        instructions = [
-            instruction
-            for instruction in INSTRUCTIONS
-            if instruction_name in instruction.names
-        ]
+        instructions = INSTRUCTIONS_BY_NAME.get(instruction_name, [])
         patterns: list[list[set]] = [
             [set(possible_values) for possible_values in instruction.operands]
             for instruction in instructions
@@ -105,19 +144,22 @@ class Assembler:
         ]
 
     @staticmethod
-    def _find_instruction(instruction_name: str, operands: list[str]) -> Instruction:
-        instructions = [
-            instruction
-            for instruction in INSTRUCTIONS
-            if instruction_name in instruction.names
-        ]
+    def _find_instruction(statement: Statement) -> Instruction:
+        instruction_name, operands = statement.name, statement.operands
+        instructions = INSTRUCTIONS_BY_NAME.get(instruction_name)
         if not instructions:
             raise InstructionError(f"Unknown instruction '{instruction_name}'.")
 
-        if not all(operands):
-            raise OperandError(
-                "Missing operand: found two commas with nothing in between."
-            )
+        for operand in operands:
+            if operand.kind == EMPTY:
+                raise OperandError(
+                    "Missing operand: found two commas with nothing in between.",
+                    column=operand.column,
+                )
+
+        instruction = find_instruction(instruction_name, statement.signature)
+        if instruction is not None:
+            return instruction
 
         possible_operand_lengths = [
             len(instruction.operands) for instruction in instructions
@@ -132,58 +174,198 @@ class Assembler:
                 f"Instruction {instruction_name} expected {operand_number} operand{'s' if operand_number != 1 else ''}."
             )
 
-        for instruction in instructions:
-            if instruction.do_operands_match(operands):
-                return instruction
-
         raise OperandError(
             f"Operands for instruction {instruction_name} don't match any valid pattern.\n"
             f"Expected patterns:\n{'\n'.join(Assembler._find_operand_patterns(instruction_name))}"
         )
 
-    def _parse_instruction(
-        self, instruction_name: str, operands: list[str]
-    ) -> list[int | str] | list[int]:
-        instruction = self._find_instruction(instruction_name, operands)
+    def _parse_instruction(self, statement: Statement) -> "list[int | str] | array[int]":
+        """Возвращает машинный код строчки. Имя метки или константы может стоять
+        только последним словом, для него потом создаётся Fixup"""
+        stats = self._stats
+        if stats is None:
+            instruction = self._find_instruction(statement)
+        else:
+            start = perf_counter()
+            instruction = self._find_instruction(statement)
+            stats.add_time("match", start)
+        operands = statement.operands
         if ".DATA" in instruction.names:
-            return [operands[0]]
+            return [cast(int | str, operands[0].value)]
         if ".EQU" in instruction.names:
-            self._check_constant_name(operands[0])
-            self._constants[operands[0]] = immediate_to_int(operands[1])
+            self._check_constant_name(operands[0].text)
+            self._constants[operands[0].text] = immediate_to_int(operands[1].text)
+            return []
+        if ".RLE" in instruction.names or ".DELTA" in instruction.names:
+            with self._phase("encode"):
+                return self._compress(statement)
+        if ".KEEP" in instruction.names:
+            self._kept_names.append(self._get_name_fixup(operands[0]))
+            return []
+        if ".ASSUME" in instruction.names:
+            self._add_assumption(statement)
             return []
         if ".INCLUDE" in instruction.names:
-            path = operands[0].lower()
+            path = operands[0].text.lower()
             if not Path(path).is_file():
-                raise OperandError(f"Invalid path for file to include: {path}")
-            if path in self._included_files:
-                raise RecursiveIncludeError(
-                    f"Recursion path:\n{'\n↓\n'.join(self._included_files)}"
+                raise OperandError(
+                    f"Invalid path for file to include: {path}", column=operands[0].column
+                )
+            return self._include(path)
+        if stats is None:
+            return instruction.get_machine_code(operands)
+        start = perf_counter()
+        machine_code = instruction.get_machine_code(operands)
+        stats.add_time("encode", start)
+        return machine_code
+
+    def _phase(self, phase: str) -> AbstractContextManager[None]:
+        """Замер этапа, если нужна статистика"""
+        if self._stats is None:
+            return contextlib.nullcontext()
+        return self._stats.phase(phase)
+
+    def _compress(self, statement: Statement) -> "array[int]":
+        """Сжимает файл из директивы .RLE или .DELTA (см. salut.compression)"""
+        operands = statement.operands
+        path = operands[0].text.lower()
+        if not Path(path).is_file():
+            raise OperandError(
+                f"Invalid path for file to compress: {path}", column=operands[0].column
+            )
+        try:
+            words = read_binary(path)
+        except ValueError as error:
+            raise OperandError(str(error), column=operands[0].column) from None
+        if statement.name == ".RLE":
+            encoded = rle_encode(words)
+        else:
+            stride = operands[1].value
+            if isinstance(stride, str):
+                if stride not in self._constants:
+                    raise UndefinedValueError(
+                        f"Undefined value: '{stride}'", column=operands[1].column
+                    )
+                stride = self._constants[stride]
+            if not 0 < cast(int, stride) <= RAM_SIZE:
+                raise OperandError(
+                    f"Delta stride must be in range [1; {RAM_SIZE}].",
+                    column=operands[1].column,
                 )
-            with open(path) as program_file:
-                machine_code = Assembler.assemble(
-                    program_file.readlines(),
-                    path=path,
-                    address_shift=self._word_count,
-                    included_files=self._included_files + [path],
-                    previous_assembler=self,
+            encoded = delta_encode(words, cast(int, stride))
+        self._dependencies.append((path, get_file_hash(path)))
+        self._diagnostics.info(
+            f"{path}: {len(words)} words compressed to {len(encoded)} "
+            f"({len(encoded) * 100 / max(len(words), 1):.1f}%)."
+        )
+        return encoded
+
+    def _get_name_fixup(self, operand: Operand) -> Fixup:
+        """Fixup для имени в директиве (в код оно не записывается)"""
+        return Fixup(
+            self._word_count,
+            operand.text,
+            self._get_current_global_label(),
+            self._line_count,
+            operand.column,
+            self._path,
+        )
+
+    def _add_assumption(self, statement: Statement) -> None:
+        register, value = statement.operands
+        if isinstance(value.value, str):
+            value_or_fixup: int | Fixup = self._get_name_fixup(value)
+        else:
+            value_or_fixup = cast(int, value.value) & 0xFFFF
+        self._assumptions.append(
+            (self._word_count, cast(int, register.value), value_or_fixup)
+        )
+
+    def _raise_recursive_include(self) -> None:
+        raise RecursiveIncludeError(
+            f"Recursion path:\n{'\n↓\n'.join(self._included_files)}"
+        )
+
+    def _include(self, path: str) -> "array[int]":
+        """Собирает файл (или берёт его из кэша) и размещает его код с текущего адреса"""
+        if path in self._included_files:
+            self._raise_recursive_include()
+        with self._phase("include"):
+            file_hash = get_file_hash(path)
+            unit = None
+            if self._include_cache is not None:
+                unit = self._include_cache.load(path, file_hash)
+                if unit is not None and any(
+                    dependency_path in self._included_files
+                    for dependency_path, _ in unit.dependencies
+                ):
+                    self._raise_recursive_include()
+        if self._stats is not None:
+            self._stats.count("includes")
+            self._stats.count("include_cache_hits", unit is not None)
+        if unit is None:
+            # файл читается построчно по мере сборки
+            with open(path, encoding="utf-8") as program_file:
+                unit = Assembler.assemble_unit(
+                    program_file,
+                    path,
+                    self._included_files + [path],
+                    self._include_cache,
+                    self._jobs,
+                    self._diagnostics,
+                    self._stats,
+                    self._line_cache,
                 )
-                if machine_code is None:
-                    self._was_error = True
-                    return []
-                return machine_code
-        return instruction.get_machine_code(operands)
+            if unit is None:
+                self._was_error = True
+                return array("H")
+            if self._include_cache is not None:
+                with self._phase("include"):
+                    self._include_cache.store(path, file_hash, unit)
+
+        with self._phase("include"):
+            code = self._add_unit(unit)
+        self._dependencies.append((path, file_hash))
+        return code
+
+    def _add_unit(self, unit: ObjectUnit) -> "array[int]":
+        """Добавляет имена из unit, размещённого с текущего адреса, и возвращает его код"""
+        global_labels, local_labels, fixups = unit.get_rebased_symbols(self._word_count)
+        code = unit.get_rebased_code(self._word_count)
+        try:
+            self.add_labels(global_labels, local_labels)
+            self.add_constants(unit.constants)
+        except NameError as error:
+            self.report_error(error, self._path)
+            self._was_error = True
+            return array("H")
+        self._fixups += fixups
+        self._dependencies += unit.dependencies
+        self._instruction_words.extend(
+            word + self._word_count for word in unit.instruction_words
+        )
+        return code
 
     def _get_current_global_label(self, address: Optional[int] = None) -> str | None:
         if address is None:
             address = self._word_count
-        address += self._address_shift
-        global_labels = [(k, v) for k, v in self._global_labels.items() if v <= address]
-        if not global_labels:
+        index = bisect_right(self._global_label_addresses, address) - 1
+        if index < 0:
             return None
-        return max(
-            global_labels,
-            key=lambda x: x[1],
-        )[0]
+        return self._global_label_names[index]
+
+    def _index_global_label(self, label: str, address: int) -> None:
+        """Добавляет глобальную метку в отсортированный по адресам индекс"""
+        addresses = self._global_label_addresses
+        if not addresses or addresses[-1] < address:
+            addresses.append(address)
+            self._global_label_names.append(label)
+            return
+        index = bisect_right(addresses, address)
+        if addresses[index - 1] == address:
+            return  # по этому адресу уже есть метка, область видимости определяет она
+        addresses.insert(index, address)
+        self._global_label_names.insert(index, label)
 
     def _check_name(self, name: str) -> None:
         if not name:
@@ -242,14 +424,9 @@ class Assembler:
         elif label in self._global_labels:
             raise AssemblerNameError(f"Global label '{label}' is already defined.")
 
-    def _add_label(self, line: str) -> None:
-        """Добавляет метку, если имя метки правильное, иначе вызывает ошибку
-
-        Args:
-            line (str): строка, оканчивающаяся на :
-        """
-        label = line[:-1].strip()
-        address = self._word_count + self._address_shift
+    def _add_label(self, label: str) -> None:
+        """Добавляет метку, если имя метки правильное, иначе вызывает ошибку"""
+        address = self._word_count
 
         self._check_label_name(label)
 
@@ -269,47 +446,186 @@ class Assembler:
                 f"Global labels '{current_global_label}' and '{label}' conflict as they point to the same address."
             )
         self._global_labels[label] = address
+        self._index_global_label(label, address)
         self._local_labels[label] = {}
 
-    def _assemble_line(self, line: str) -> list[int | str] | list[int]:
+    def _assemble_line(self, line: str) -> list[int]:
         self._line_count += 1
 
-        formatted_line = self._format_line(line)
-        if not formatted_line:
+        cached = None if self._line_cache is None else self._line_cache.get(line)
+        if cached is not None:
+            statement, output = cached[0], list(cached[1])
+        else:
+            statement, output = self._tokenize_and_parse(line)
+        if not output:
             return []
+        last_word = output[-1]
+        if isinstance(last_word, str):
+            self._add_fixup(len(output) - 1, last_word, cast(Statement, statement))
+            output[-1] = 0
+        elif last_word < 0:
+            output[-1] = last_word & 0xFFFF  # отрицательные числа в дополнительном коде
+        self._line_map_words.append(self._word_count)
+        self._line_map_lines.append(self._line_count)
+        if not statement.name.startswith("."):
+            self._instruction_words.append(self._word_count)
+        self._word_count += len(output)
+        return cast(list[int], output)
 
-        if formatted_line.endswith(":"):
-            self._add_label(formatted_line)
-            return []
+    def _tokenize_and_parse(
+        self, line: str
+    ) -> tuple[Optional[Statement | Label], "list[int | str] | array[int]"]:
+        if self._stats is None:
+            statement = tokenize_line(line)
+        else:
+            start = perf_counter()
+            statement = tokenize_line(line)
+            self._stats.add_time("tokenize", start)
+        if statement is None:
+            return None, []
 
-        output = self._parse_instruction(*self._parse_line(formatted_line))
-        for i in range(len(output)):
-            self._word_to_line[self._word_count + i] = self._line_count
-        self._word_count += len(output)
-        return output
+        try:
+            if isinstance(statement, Label):
+                self._add_label(statement.name)
+                return statement, []
+            output = self._parse_instruction(statement)
+        except AssemblerError as error:
+            if error.column is None:
+                error.column = statement.column
+            raise
+        # код инструкций и .DATA зависит только от текста строки
+        if self._line_cache is not None and (
+            statement.name == ".DATA" or not statement.name.startswith(".")
+        ):
+            self._line_cache[line] = (statement, tuple(output))
+        return statement, output
 
-    def replace_names(self, machine_code: list[int | str], path: Optional[str]) -> None:
-        self._line_count = 0
-        for i, value in enumerate(machine_code):
-            self._line_count += 1
-            if isinstance(value, int):
-                continue
-            with contextlib.suppress(ValueError):
-                machine_code[i] = immediate_to_int(value)
-                continue
-            if value in self._global_labels:
-                machine_code[i] = self._global_labels[value]
-                continue
-            if value in self._constants:
-                machine_code[i] = self._constants[value]
-                continue
-            current_global_label = self._get_current_global_label(i)
-            if current_global_label and value in self._local_labels[current_global_label]:
-                machine_code[i] = self._local_labels[current_global_label][value]
-                continue
-            self._was_error = True
-            self._line_count = self._word_to_line[i]
-            self.print_error(UndefinedValueError(f"Undefined value: '{value}'"), path)
+    def get_line(self, word_index: int) -> int:
+        """Возвращает номер строки, из которой получилось слово word_index"""
+        return self._line_map_lines[bisect_right(self._line_map_words, word_index) - 1]
+
+    def _add_fixup(self, offset: int, symbol: str, statement: Statement) -> None:
+        """Запоминает, что в слово offset текущей инструкции надо подставить symbol"""
+        column = next(
+            operand.column
+            for operand in statement.operands
+            if operand.kind in (IMMEDIATE, SQUARED_IMMEDIATE)
+        )
+        self._fixups.append(
+            Fixup(
+                self._word_count + offset,
+                symbol,
+                self._get_current_global_label(),
+                self._line_count,
+                column,
+                self._path,
+            )
+        )
+
+    def _resolve_fixup(self, fixup: Fixup) -> Optional[tuple[int, bool]]:
+        """Возвращает значение имени и является ли оно адресом метки.
+        None, если имя не определено"""
+        value = fixup.symbol
+        if value in self._global_labels:
+            return self._global_labels[value], True
+        if value in self._constants:
+            return self._constants[value], False
+        # fixup из включённого файла до его первой глобальной метки
+        current_global_label = fixup.scope or self._get_current_global_label(fixup.index)
+        if current_global_label and value in self._local_labels[current_global_label]:
+            return self._local_labels[current_global_label][value], True
+        return None
+
+    def _optimize(self, machine_code: "array[int]") -> "array[int]":
+        """Оптимизирует код до подстановки имён и сдвигает метки, fixup-ы и строки"""
+        kept_addresses = []
+        for fixup in self._kept_names:
+            resolved = self._resolve_fixup(fixup)
+            if resolved is None:
+                self._was_error = True
+                self._line_count = fixup.line
+                self.report_error(
+                    UndefinedValueError(
+                        f"Undefined value: '{fixup.symbol}'", column=fixup.column
+                    ),
+                    fixup.path,
+                )
+            elif resolved[1]:
+                kept_addresses.append(resolved[0])
+        if self._was_error:
+            return machine_code
+        from salut.optimizer import Optimizer
+
+        label_addresses = list(self._global_labels.values())
+        for labels in self._local_labels.values():
+            label_addresses += labels.values()
+        optimizer = Optimizer(
+            machine_code,
+            self._instruction_words,
+            self._fixups,
+            label_addresses,
+            self._resolve_fixup,
+            self._assumptions,
+        )
+        optimizer.remove_unreachable(self._global_label_addresses, kept_addresses)
+        optimizer.optimize()
+        # метки удалённых участков иначе указывали бы на следующий живой код
+        for label, address in list(self._global_labels.items()):
+            if optimizer.is_region_removed(address):
+                del self._global_labels[label]
+                self._local_labels.pop(label, None)
+        get_address = optimizer.get_address
+        for label, address in self._global_labels.items():
+            self._global_labels[label] = get_address(address)
+        for labels in self._local_labels.values():
+            for label, address in labels.items():
+                labels[label] = get_address(address)
+        label_index = [
+            (get_address(address), label)
+            for address, label in zip(self._global_label_addresses, self._global_label_names)
+            if label in self._global_labels
+        ]
+        self._global_label_addresses = [address for address, _ in label_index]
+        self._global_label_names = [label for _, label in label_index]
+        self._fixups = optimizer.get_fixups()
+        line_map = [
+            (get_address(word), line)
+            for word, line in zip(self._line_map_words, self._line_map_lines)
+            if not optimizer.is_removed(word)
+        ]
+        self._line_map_words = array("I", (word for word, _ in line_map))
+        self._line_map_lines = array("I", (line for _, line in line_map))
+        self._instruction_words = array(
+            "I",
+            (
+                get_address(word)
+                for word in self._instruction_words
+                if not optimizer.is_removed(word)
+            ),
+        )
+        machine_code = optimizer.get_code()
+        self._word_count = len(machine_code)
+        self._diagnostics.info(optimizer.get_report())
+        return machine_code
+
+    def replace_names(self, machine_code: "array[int]") -> None:
+        """Подставляет значения меток и констант в слова из таблицы fixup-ов"""
+        if self._stats is not None:
+            self._stats.count("fixups", len(self._fixups))
+        with self._phase("resolve"):
+            for fixup in self._fixups:
+                resolved = self._resolve_fixup(fixup)
+                if resolved is not None:
+                    machine_code[fixup.index] = resolved[0] & 0xFFFF
+                    continue
+                self._was_error = True
+                self._line_count = fixup.line
+                self.report_error(
+                    UndefinedValueError(
+                        f"Undefined value: '{fixup.symbol}'", column=fixup.column
+                    ),
+                    fixup.path,
+                )
 
     def add_labels(
         self, global_labels: dict[str, int], local_labels: dict[str, dict[str, int]]
@@ -320,17 +636,18 @@ class Assembler:
                     f"Global label '{k}' is already defined and cannot be included from another file."
                 )
             self._global_labels[k] = v
-            self._included_names.append(k)
+            self._index_global_label(k, v)
+            self._included_names.add(k)
         for k1, v1 in local_labels.items():
+            if k1 not in self._local_labels:
+                self._local_labels[k1] = {}
             for k2, v2 in v1.items():
-                if k1 in self._local_labels and k2 in self._local_labels[k1]:
+                if k2 in self._local_labels[k1]:
                     raise NameError(
                         f"Local label '{k2}' of global label '{k1}' is already defined and cannot be included from another file."
                     )
-                if k1 not in self._local_labels:
-                    self._local_labels[k1] = {}
                 self._local_labels[k1][k2] = v2
-                self._included_names.append((k1, k2))
+                self._included_names.add((k1, k2))
 
     def add_constants(self, constants: dict[str, int]) -> None:
         for k, v in constants.items():
@@ -339,12 +656,10 @@ class Assembler:
                     f"Constant '{k}' is already defined and cannot be included from another file."
                 )
             self._constants[k] = v
-            self._included_names.append(k)
+            self._included_names.add(k)
 
-    def print_error(self, error: Exception, path: Optional[str]) -> None:
-        print(
-            f"{error.__class__.__name__} on line {self._line_count}{f' in {path}' if path else ''}:\n{error}\n"
-        )
+    def report_error(self, error: Exception, path: Optional[str]) -> None:
+        self._diagnostics.error(error, self._line_count, path)
 
     @staticmethod
     def print_machine_code(machine_code: list[int]) -> None:
@@ -356,64 +671,445 @@ class Assembler:
                 + "  ".join(format(j, "04X") for j in machine_code[i : i + line_width])
             )
 
-    @classmethod
-    def assemble(
-        cls,
-        lines: list[str],
-        path: Optional[str] = None,
-        address_shift: int = 0,
-        included_files: Optional[list[str]] = None,
-        previous_assembler: Optional["Assembler"] = None,
-    ) -> Optional[list[int] | list[int | str]]:
-        assembler = cls(address_shift, included_files)
-        machine_code = []
+    def _assemble_lines(self, lines: Iterable[str]) -> "array[int]":
+        if self._jobs > 1:
+            lines = list(lines)
+            if len(lines) > CHUNK_LINES:
+                units = self._assemble_chunks(lines)
+                if units is not None:
+                    self._line_count += len(lines)
+                    if self._stats is not None:
+                        self._stats.count("lines", len(lines))
+                    return self._merge_chunks(units)
+                # при ошибках файл собирается заново в одном процессе,
+                # чтобы сообщения об ошибках не зависели от разбиения на части
+        machine_code = array("H")
+        line_count = self._line_count
+        if self._stats is not None:
+            lines = self._stats.timed_lines(lines)
         for line in lines:
             try:
-                machine_code.extend(assembler._assemble_line(line))
+                machine_code.extend(self._assemble_line(line))
             except AssemblerError as error:
-                assembler.print_error(error, path)
-                assembler._was_error = True
-        if not included_files:
-            assembler.replace_names(machine_code, path)
-        if previous_assembler:
-            try:
-                previous_assembler.add_labels(
-                    assembler._global_labels, assembler._local_labels
+                self.report_error(error, self._path)
+                self._was_error = True
+        if self._stats is not None:
+            self._stats.count("lines", self._line_count - line_count)
+        return machine_code
+
+    @staticmethod
+    def _get_chunk_end(lines: list[str], end: int) -> int:
+        """Сдвигает границу части так, чтобы часть не начиналась с локальных меток
+        чужой глобальной метки"""
+        for i in range(end, len(lines)):
+            code = lines[i].split(";", 1)[0].strip()
+            if not code.endswith(":"):
+                continue
+            if not code.startswith("."):
+                return i
+            # локальная метка: часть должна начинаться со следующей глобальной
+            for j in range(i + 1, len(lines)):
+                code = lines[j].split(";", 1)[0].strip()
+                if code.endswith(":") and not code.startswith("."):
+                    return j
+            return len(lines)
+        return end
+
+    def _assemble_chunks(self, lines: list[str]) -> Optional[list[ObjectUnit]]:
+        """Собирает части файла параллельно, адреса в каждой части отсчитываются от нуля.
+        None, если в какой-то части есть ошибка или части определяют одно и то же имя"""
+        chunks = []
+        start = 0
+        while start < len(lines):
+            end = self._get_chunk_end(lines, min(start + CHUNK_LINES, len(lines)))
+            chunks.append((start, lines[start:end]))
+            start = end
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(self._jobs) as executor:
+            units = list(
+                executor.map(
+                    _assemble_chunk,
+                    chunks,
+                    repeat(self._path),
+                    repeat(self._included_files),
+                    repeat(self._include_cache),
                 )
-                previous_assembler.add_constants(assembler._constants)
-            except NameError as error:
-                assembler.print_error(error, path)
-                assembler._was_error = True
-        memory_use_percentage = len(machine_code) * 100 / 65536
-        if len(machine_code) > 65536 and not included_files:
-            print(
-                "MemoryOverflowError:\n"
-                f"Program is too large: used {memory_use_percentage:.2f}% of available RAM (128 KiB)."
             )
-            assembler._was_error = True
+        if any(unit is None for unit in units):
+            return None
+
+        names: set[str] = set()
+        labels: set[str] = set()
+        constants: set[str] = set()
+        global_label_at_end = False  # есть ли глобальная метка в конце предыдущей части
+        for unit in cast(list[ObjectUnit], units):
+            unit_labels = set(unit.global_labels).union(*unit.local_labels.values())
+            if (
+                not names.isdisjoint(unit.global_labels)
+                or not constants.isdisjoint(unit_labels)
+                or not labels.isdisjoint(unit.constants)
+                or (global_label_at_end and 0 in unit.global_labels.values())
+            ):
+                return None
+            names.update(unit.global_labels, unit.constants)
+            labels |= unit_labels
+            constants.update(unit.constants)
+            global_label_at_end = len(unit.code) in unit.global_labels.values() or (
+                global_label_at_end and not unit.code
+            )
+        return cast(list[ObjectUnit], units)
+
+    def _merge_chunks(self, units: list[ObjectUnit]) -> "array[int]":
+        """Размещает собранные части файла друг за другом"""
+        machine_code = array("H")
+        for unit in units:
+            line_map_words, line_map_lines = unit.line_map
+            self._line_map_words.extend(word + self._word_count for word in line_map_words)
+            self._line_map_lines.extend(line_map_lines)
+            code = self._add_unit(unit)
+            machine_code.extend(code)
+            self._word_count += len(code)
+        return machine_code
+
+    @classmethod
+    def assemble_unit(
+        cls,
+        lines: Iterable[str],
+        path: Optional[str] = None,
+        included_files: Optional[list[str]] = None,
+        include_cache: Optional[IncludeCache] = None,
+        jobs: int = 1,
+        diagnostics: Optional[Diagnostics] = None,
+        stats: Optional[Stats] = None,
+        line_cache: Optional[LineCache] = None,
+    ) -> Optional[ObjectUnit]:
+        """Собирает файл без разрешения имён, адреса отсчитываются от нуля"""
+        assembler = cls(
+            included_files, path, include_cache, jobs, diagnostics, stats, line_cache
+        )
+        machine_code = assembler._assemble_lines(lines)
         if assembler._was_error:
             return None
-        if not included_files:
-            # Assembler.print_machine_code(machine_code)
-            print(machine_code[:100])
-            print("Program assembled succesfully!")
-            print(
-                f"{assembler._word_count * 2} bytes ({memory_use_percentage:.2f}%) of RAM used."
+        return assembler._get_unit(machine_code, assembler._fixups)
+
+    @classmethod
+    def compile(
+        cls,
+        lines: Iterable[str],
+        path: Optional[str] = None,
+        include_cache: Optional[IncludeCache] = None,
+        jobs: int = 1,
+        diagnostics: Optional[Diagnostics] = None,
+        stats: Optional[Stats] = None,
+        line_cache: Optional[LineCache] = None,
+    ) -> Optional[ObjectUnit]:
+        """Собирает объектный файл для salut.linker: имена, определённые в самом файле,
+        подставляются сразу (адреса меток попадают в таблицу перемещений),
+        остальные импортируются из других файлов"""
+        assembler = cls([], path, include_cache, jobs, diagnostics, stats, line_cache)
+        machine_code = assembler._assemble_lines(lines)
+        if assembler._was_error:
+            return None
+        imports = []
+        relocations = array("I")
+        if stats is not None:
+            stats.count("fixups", len(assembler._fixups))
+        with assembler._phase("resolve"):
+            for fixup in assembler._fixups:
+                resolved = assembler._resolve_fixup(fixup)
+                if resolved is None:
+                    imports.append(fixup)
+                    continue
+                value, is_address = resolved
+                machine_code[fixup.index] = value & 0xFFFF
+                if is_address:
+                    relocations.append(fixup.index)
+        return assembler._get_unit(machine_code, imports, relocations)
+
+    def _get_unit(
+        self,
+        machine_code: "array[int]",
+        fixups: list[Fixup],
+        relocations: Optional["array[int]"] = None,
+    ) -> ObjectUnit:
+        return ObjectUnit(
+            machine_code,
+            fixups,
+            self._global_labels,
+            self._local_labels,
+            self._constants,
+            self._dependencies,
+            relocations,
+            (self._line_map_words, self._line_map_lines),
+            self._path,
+            self._instruction_words,
+        )
+
+    @classmethod
+    def assemble(
+        cls,
+        lines: Iterable[str],
+        path: Optional[str] = None,
+        include_cache: Optional[IncludeCache] = None,
+        jobs: int = 1,
+        optimize: bool = False,
+        diagnostics: Optional[Diagnostics] = None,
+        stats: Optional[Stats] = None,
+        line_cache: Optional[LineCache] = None,
+    ) -> Optional["array[int]"]:
+        """Возвращает машинный код: массив 16-битных слов.
+        lines читаются по одной (можно передать открытый файл), в памяти остаётся
+        только машинный код. При jobs > 1 большие файлы собираются по частям
+        в нескольких процессах. optimize включает salut.optimizer.
+        Сообщения попадают в diagnostics (по умолчанию выводятся), замеры - в stats.
+        line_cache хранит разобранные строки между сборками"""
+        # части файла, собранные в других процессах, не знают, где их инструкции,
+        # поэтому оптимизируемый файл собирается в одном процессе
+        assembler = cls(
+            [],
+            path,
+            include_cache,
+            1 if optimize else jobs,
+            diagnostics,
+            stats,
+            line_cache,
+        )
+        return assembler.assemble_program(lines, optimize)
+
+    def assemble_program(
+        self, lines: Iterable[str], optimize: bool = False
+    ) -> Optional["array[int]"]:
+        """Собирает программу этим ассемблером (см. assemble), после сборки
+        имена программы можно получить через get_symbols"""
+        machine_code = self._assemble_lines(lines)
+        if (
+            optimize
+            and not self._was_error
+            # с неизвестными именами код не оптимизируется, ошибки выводит replace_names
+            and all(map(self._resolve_fixup, self._fixups))
+        ):
+            with self._phase("optimize"):
+                machine_code = self._optimize(machine_code)
+        self.replace_names(machine_code)
+        memory_use_percentage = len(machine_code) * 100 / RAM_SIZE
+        if len(machine_code) > RAM_SIZE:
+            self._diagnostics.error(
+                MemoryOverflowError(
+                    f"Program is too large: used {memory_use_percentage:.2f}% of available RAM (128 KiB)."
+                ),
+                None,
+                self._path,
             )
+            self._was_error = True
+        if self._was_error:
+            return None
+        if self._stats is not None:
+            self._stats.count("words", len(machine_code))
+        self._diagnostics.info("Program assembled succesfully!")
+        self._diagnostics.info(
+            f"{self._word_count * 2} bytes ({memory_use_percentage:.2f}%) of RAM used."
+        )
         return machine_code
 
+    def get_symbols(
+        self,
+    ) -> tuple[dict[str, int], dict[str, dict[str, int]], dict[str, int]]:
+        """Глобальные метки (имя: адрес), локальные метки ({глобальная: {локальная: адрес}})
+        и константы собранной программы"""
+        return (
+            dict(self._global_labels),
+            {label: dict(labels) for label, labels in self._local_labels.items()},
+            dict(self._constants),
+        )
+
+
+def _assemble_chunk(
+    chunk: tuple[int, list[str]],
+    path: Optional[str],
+    included_files: list[str],
+    include_cache: Optional[IncludeCache],
+) -> Optional[ObjectUnit]:
+    """Собирает часть файла в отдельном процессе, None при ошибке"""
+    first_line, lines = chunk
+    # сообщения не выводятся: при ошибке файл собирается заново в одном процессе
+    assembler = Assembler(
+        included_files, path, include_cache, diagnostics=Diagnostics(echo=False)
+    )
+    assembler._line_count = first_line
+    machine_code = assembler._assemble_lines(lines)
+    if assembler._was_error:
+        return None
+    return assembler._get_unit(machine_code, assembler._fixups)
+
+
+def open_program(path: str) -> AbstractContextManager[TextIO]:
+    """Открывает исходник для чтения по строкам, "-" - стандартный ввод"""
+    if path == STDIN_PATH:
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, encoding="utf-8")
+
+
+def load_unit(
+    path: str,
+    include_cache: IncludeCache,
+    jobs: int = 1,
+    diagnostics: Optional[Diagnostics] = None,
+    stats: Optional[Stats] = None,
+) -> Optional[ObjectUnit]:
+    """Загружает объектный файл или собирает его из исходника"""
+    if path.endswith(OBJECT_SUFFIX):
+        return ObjectUnit.load(path)
+    with open_program(path) as program_file:
+        return Assembler.compile(
+            program_file,
+            path=None if path == STDIN_PATH else path,
+            include_cache=include_cache,
+            jobs=jobs,
+            diagnostics=diagnostics,
+            stats=stats,
+        )
+
 
 def main() -> None:
-    program_path = "program.txt" if len(sys.argv) <= 1 else sys.argv[1]
-    with open(MEMORY_BLOCK_DATA_PATH) as memory_block_data_file:
-        memory_block_data = json.load(memory_block_data_file)
-    with open(program_path, encoding="utf-8") as program_file:
-        machine_code = Assembler.assemble(program_file.readlines())
-        if machine_code is None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SALUT-2 assembler")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=["program.txt"],
+        help=f"programs to assemble or object files ({OBJECT_SUFFIX}) to link, "
+        f"'{STDIN_PATH}' reads a program from standard input",
+    )
+    parser.add_argument(
+        "-c",
+        "--compile",
+        action="store_true",
+        help=f"only assemble every program into an object file ({OBJECT_SUFFIX})",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="output path: object file with -c and a single program, "
+        "otherwise memory image (memory block data.json by default)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=WRITERS,
+        default="json",
+        help="memory image format: memory block data.json, raw little-endian "
+        "or big-endian words, or Intel HEX",
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="don't write the memory image if it's the same as the last written one",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help=f"processes for assembling programs longer than {CHUNK_LINES} lines",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="remove jumps to the next instruction and redundant moves, "
+        "thread jump chains (single program only)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the time of every assembly phase and counters",
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="PATH",
+        help="write phase times, counters and messages as JSON ('-' for stdout)",
+    )
+    args = parser.parse_args()
+    if args.compile:
+        if args.output and len(args.paths) > 1:
+            parser.error("-o can only be used with a single program")
+        if STDIN_PATH in args.paths and not args.output:
+            parser.error("-o is required to compile a program from standard input")
+    diagnostics = Diagnostics()
+    stats = Stats() if args.stats or args.stats_json else None
+    _build(args, parser, diagnostics, stats)
+    if stats is not None and args.stats:
+        print(stats.get_report())
+    if stats is not None and args.stats_json:
+        write_report(args.stats_json, stats, diagnostics)
+
+
+def _build(
+    args: "argparse.Namespace",
+    parser: "argparse.ArgumentParser",
+    diagnostics: Diagnostics,
+    stats: Optional[Stats],
+) -> None:
+    include_cache = IncludeCache(INCLUDE_CACHE_PATH)
+    if args.compile:
+        for path in args.paths:
+            unit = load_unit(path, include_cache, args.jobs, diagnostics, stats)
+            if unit is None:
+                continue
+            unit.save(args.output or str(Path(path).with_suffix(OBJECT_SUFFIX)))
+        return
+
+    if len(args.paths) == 1 and not args.paths[0].endswith(OBJECT_SUFFIX):
+        with open_program(args.paths[0]) as program_file:
+            machine_code = Assembler.assemble(
+                program_file,
+                include_cache=include_cache,
+                jobs=args.jobs,
+                optimize=args.optimize,
+                diagnostics=diagnostics,
+                stats=stats,
+            )
+    else:
+        units = [
+            load_unit(path, include_cache, args.jobs, diagnostics, stats)
+            for path in args.paths
+        ]
+        if any(unit is None for unit in units):
             return
-        memory_block_data["data"] = machine_code
-    with open(MEMORY_BLOCK_DATA_PATH, "w") as memory_block_data_file:
-        json.dump(memory_block_data, memory_block_data_file, indent=4)
+        start = perf_counter()
+        machine_code = Linker.link_units(cast(list[ObjectUnit], units), diagnostics)
+        if stats is not None:
+            stats.add_time("link", start)
+        if machine_code is not None:
+            if stats is not None:
+                stats.count("words", len(machine_code))
+            diagnostics.info("Program linked succesfully!")
+            diagnostics.info(
+                f"{len(machine_code) * 2} bytes "
+                f"({len(machine_code) * 100 / RAM_SIZE:.2f}%) of RAM used."
+            )
+    if machine_code is None:
+        return
+    if args.output:
+        output_path = args.output
+    elif args.format == "json":
+        from memory_block_data_path import get_memory_block_data_path
+
+        output_path = get_memory_block_data_path()
+    elif args.paths[0] != STDIN_PATH:
+        output_path = str(Path(args.paths[0]).with_suffix(WRITERS[args.format][1]))
+    else:
+        parser.error(f"-o is required to write {args.format} from standard input")
+    stamps = OutputStamps(INCLUDE_CACHE_PATH) if args.skip_unchanged else None
+    start = perf_counter()
+    written = write_output(machine_code, output_path, args.format, stamps)
+    if stats is not None:
+        stats.add_time("write", start)
+    if not written:
+        diagnostics.info(f"{output_path} is up to date.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+import random
+from collections.abc import Mapping
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from salut.semantics import get_semantics, get_value_kinds
+from salut.utils import IMM, IMMEDIATE, INSTRUCTIONS, SQUARED_IMM, Instruction
+
+# варианты инструкций, которые можно сгенерировать (директивы без опкода не берутся)
+_INSTRUCTIONS = [instruction for instruction in INSTRUCTIONS if instruction.opcode is not None]
+
+
+class ProgramShape(NamedTuple):
+    """Параметры синтетической программы"""
+
+    lines: int = 10000  # строк во всех файлах вместе
+    label_density: float = 0.02  # доля строк с глобальной меткой
+    local_label_density: float = 0.05  # доля строк с локальной меткой
+    constants: int = 20  # .EQU в начале каждого файла
+    include_depth: int = 0  # глубина цепочки .INCLUDE (0 - один файл)
+    # имя инструкции: вес, остальные инструкции не используются (None - все поровну)
+    mix: Optional[Mapping[str, float]] = None
+    seed: int = 0
+
+
+def _is_jump(instruction: Instruction) -> bool:
+    return get_value_kinds(instruction) == (IMMEDIATE,) and "{jump}" in get_semantics(
+        instruction
+    )
+
+
+class _FileGenerator:
+    def __init__(self, prefix: str, rng: random.Random) -> None:
+        self._prefix = prefix  # имена в каждом файле свои, чтобы файлы не конфликтовали
+        self._rng = rng
+        self._constants: list[str] = []
+        self._global_labels: list[str] = []
+        self._local_labels: list[str] = []  # метки текущей глобальной метки
+
+    def _get_immediate(self, jump: bool) -> str:
+        rng = self._rng
+        if (jump or rng.random() < 0.2) and self._global_labels:
+            if self._local_labels and rng.random() < 0.5:
+                return rng.choice(self._local_labels)
+            return rng.choice(self._global_labels)
+        if self._constants and rng.random() < 0.3:
+            return rng.choice(self._constants)
+        return str(rng.randrange(0x10000))
+
+    def _get_instruction(self, instruction: Instruction) -> str:
+        jump = _is_jump(instruction)
+        operands = []
+        for possible_values in instruction.operands:
+            if possible_values[0] == IMM[0]:
+                operands.append(self._get_immediate(jump))
+            elif possible_values[0] == SQUARED_IMM[0]:
+                operands.append(f"[{self._get_immediate(False)}]")
+            else:
+                operands.append(self._rng.choice(possible_values))
+        name = self._rng.choice(instruction.names)
+        return f"    {name} {', '.join(operands)}" if operands else f"    {name}"
+
+    def generate(
+        self, shape: ProgramShape, lines: int, instructions: list[Instruction], weights: list[float]
+    ) -> list[str]:
+        rng = self._rng
+        program = []
+        for i in range(shape.constants):
+            name = f"{self._prefix}c{i}"
+            program.append(f".EQU {name}, {rng.randrange(0x10000)}")
+            self._constants.append(name)
+        # файл начинается с глобальной метки: локальные метки всегда в её области
+        program.append(f"{self._prefix}start:")
+        self._global_labels.append(f"{self._prefix}start")
+        # две метки подряд указывают на один адрес, а это ошибка для глобальных меток,
+        # поэтому после метки всегда идёт инструкция
+        after_label = True
+        while len(program) < lines or after_label:
+            chance = 1.0 if after_label else rng.random()
+            after_label = chance < shape.label_density + shape.local_label_density
+            if chance < shape.label_density:
+                name = f"{self._prefix}l{len(self._global_labels)}"
+                program.append(f"{name}:")
+                self._global_labels.append(name)
+                self._local_labels = []
+            elif chance < shape.label_density + shape.local_label_density:
+                name = f".l{len(self._local_labels)}"
+                program.append(f"{name}:")
+                self._local_labels.append(name)
+            else:
+                instruction = rng.choices(instructions, weights)[0]
+                program.append(self._get_instruction(instruction))
+        return program
+
+
+def generate_program(shape: ProgramShape) -> list[list[str]]:
+    """Строки главного файла и включаемых в него по цепочке файлов (f1.txt, f2.txt...).
+    Файл N включает файл N + 1 последней строкой (после инструкции)"""
+    if shape.mix is None:
+        instructions, weights = _INSTRUCTIONS, [1.0] * len(_INSTRUCTIONS)
+    else:
+        mix = {name.upper(): weight for name, weight in shape.mix.items()}
+        instructions = [
+            instruction for instruction in _INSTRUCTIONS if instruction.names[0] in mix
+        ]
+        if not instructions:
+            raise ValueError("Instruction mix doesn't contain any known instruction")
+        # вес инструкции делится между её вариантами (MOV Reg, Imm; MOV Reg, Reg...)
+        variants = {name: 0 for name in mix}
+        for instruction in instructions:
+            variants[instruction.names[0]] += 1
+        weights = [
+            mix[instruction.names[0]] / variants[instruction.names[0]]
+            for instruction in instructions
+        ]
+    rng = random.Random(shape.seed)
+    files = shape.include_depth + 1
+    programs = []
+    for i in range(files):
+        lines = shape.lines // files + (i < shape.lines % files) - (i + 1 < files)
+        program = _FileGenerator(f"f{i}_", rng).generate(shape, lines, instructions, weights)
+        if i + 1 < files:
+            program.append(f".INCLUDE {get_file_name(i + 1)}")
+        programs.append(program)
+    return programs
+
+
+def get_file_name(index: int) -> str:
+    # включаемые пути приводятся к нижнему регистру, имена файлов тоже в нижнем
+    return "main.txt" if index == 0 else f"f{index}.txt"
+
+
+def write_program(shape: ProgramShape, directory: str | Path) -> Path:
+    """Записывает программу в directory, возвращает путь к главному файлу.
+    .INCLUDE ищет файлы от текущей папки, поэтому собирать её надо из directory"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for i, program in enumerate(generate_program(shape)):
+        (directory / get_file_name(i)).write_text("\n".join(program) + "\n", encoding="utf-8")
+    return directory / get_file_name(0)
@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from assembler import Assembler
+from benchmarks.generator import ProgramShape, write_program
+from salut.diagnostics import PHASES, Diagnostics, Stats
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+# настоящие программы из репозитория
+FIXTURES = ("bad_apple_program.txt", "pixel_move.txt", "screen_lib.txt")
+SIZES = (2000, 8000, 32000)  # строк в синтетических программах для проверки роста
+TOLERANCE = 0.25  # во сколько раз (сверх 1) можно стать медленнее базового замера
+SCALING_LIMIT = 1.5  # во сколько раз может вырасти время на строку от меньшей к большей
+
+
+class Case(NamedTuple):
+    name: str
+    path: Path  # главный файл, включаемые файлы ищутся в его папке
+
+
+def time_case(case: Case, repeat: int) -> dict[str, Any]:
+    """Лучший из repeat замеров сборки без кэша включаемых файлов"""
+    results = []
+    with contextlib.chdir(case.path.parent):
+        for _ in range(repeat):
+            diagnostics, stats = Diagnostics(echo=False), Stats()
+            with open(case.path.name, encoding="utf-8") as program_file:
+                machine_code = Assembler.assemble(
+                    program_file, case.path.name, diagnostics=diagnostics, stats=stats
+                )
+            if machine_code is None:
+                error = diagnostics.errors[0]
+                raise RuntimeError(
+                    f"{case.name} failed to assemble: {error.kind} on line {error.line}"
+                    f" in {error.path}: {error.message}"
+                )
+            results.append(stats.to_dict())
+    return min(results, key=lambda result: result["total"])
+
+
+def get_synthetic_shapes(sizes: tuple[int, ...]) -> dict[str, ProgramShape]:
+    """Синтетические программы: ряд по числу строк и отдельные крайние случаи"""
+    largest = max(sizes)
+    shapes = {f"lines-{size}": ProgramShape(lines=size) for size in sizes}
+    shapes |= {
+        "dense-labels": ProgramShape(lines=largest, label_density=0.2, local_label_density=0.3),
+        "constants": ProgramShape(lines=largest, constants=2000),
+        "includes": ProgramShape(lines=largest, include_depth=16),
+        "jumps": ProgramShape(
+            lines=largest, mix={"JMP": 1, "JE": 1, "CALL": 1, "MOV": 1, "CMP": 1}
+        ),
+    }
+    return shapes
+
+
+def run_suite(sizes: tuple[int, ...], repeat: int) -> dict[str, dict[str, Any]]:
+    results = {}
+    for fixture in FIXTURES:
+        results[fixture] = time_case(Case(fixture, ROOT / fixture), repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, shape in get_synthetic_shapes(sizes).items():
+            path = write_program(shape, Path(directory) / name)
+            results[name] = time_case(Case(name, path), repeat)
+    return results
+
+
+def check_scaling(
+    results: dict[str, dict[str, Any]], sizes: tuple[int, ...], limit: float
+) -> list[str]:
+    """Время на строку не должно расти с размером программы (квадратичные поиски)"""
+    per_line = {
+        size: results[f"lines-{size}"]["total"] / results[f"lines-{size}"]["counters"]["lines"]
+        for size in sizes
+    }
+    smallest, largest = min(sizes), max(sizes)
+    growth = per_line[largest] / per_line[smallest]
+    if growth > limit:
+        return [
+            (
+                f"time per line grew {growth:.2f}x from {smallest} to {largest} lines "
+                f"(limit {limit}x)"
+            )
+        ]
+    return []
+
+
+def compare(
+    results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], tolerance: float
+) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["total"] / baseline[name]["total"]
+        if ratio > 1 + tolerance:
+            slowest = max(
+                PHASES,
+                key=lambda phase: result["phases"][phase]
+                - baseline[name]["phases"].get(phase, 0.0),
+            )
+            regressions.append(
+                f"{name} is {ratio:.2f}x slower than the baseline (mostly {slowest})"
+            )
+    return regressions
+
+
+def format_results(
+    results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]]
+) -> str:
+    header = f"{'case':<24}{'lines':>8}{'total ms':>10}{'us/line':>9}{'baseline':>10}"
+    rows = [header + "".join(f"{phase:>10}" for phase in PHASES)]
+    for name, result in results.items():
+        lines = result["counters"]["lines"]
+        ratio = (
+            f"{result['total'] / baseline[name]['total']:.2f}x" if name in baseline else "-"
+        )
+        rows.append(
+            f"{name:<24}{lines:>8}{result['total'] * 1000:>10.1f}"
+            f"{result['total'] * 1e6 / max(lines, 1):>9.2f}{ratio:>10}"
+            + "".join(f"{result['phases'][phase] * 1000:>10.1f}" for phase in PHASES)
+        )
+    return "\n".join(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SALUT-2 assembler benchmarks")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=SIZES,
+        help="line counts of synthetic programs, the largest one is used for the rest",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best is used")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline JSON file")
+    parser.add_argument(
+        "--save", action="store_true", help="save the results as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="allowed slowdown compared to the baseline (0.25 - 25%%)",
+    )
+    parser.add_argument(
+        "--scaling-limit",
+        type=float,
+        default=SCALING_LIMIT,
+        help="allowed growth of time per line from the smallest to the largest size",
+    )
+    args = parser.parse_args()
+    sizes = tuple(sorted(set(args.sizes)))
+
+    results = run_suite(sizes, args.repeat)
+    baseline_path = Path(args.baseline)
+    baseline = (
+        json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline_path.is_file()
+        else {}
+    )
+    print(format_results(results, baseline))
+    if args.save:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {baseline_path}.")
+        return
+    regressions = check_scaling(results, sizes, args.scaling_limit) + compare(
+        results, baseline, args.tolerance
+    )
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
+import os
+
 MEMORY_BLOCK_DATA_PATH = (
     "c:\\Program Files (x86)\\Steam\\steamapps\\"
     "workshop\\content\\387990\\3100500975\\"
     "memoryBlockData\\data.json"
 )
+# переменная окружения с путём к файлу блока памяти вместо пути по умолчанию
+MEMORY_BLOCK_DATA_ENV = "SALUT_MEMORY_BLOCK_DATA"
+
+
+def get_memory_block_data_path() -> str:
+    return os.environ.get(MEMORY_BLOCK_DATA_ENV) or MEMORY_BLOCK_DATA_PATH
@@ -0,0 +1,29 @@
+"""Ассемблер SALUT-2 как библиотека: salut.assemble, salut.assemble_file и т.д.
+Модули импортируются при первом обращении, сам пакет ничего не загружает"""
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from salut.api import (
+        AssemblyResult,
+        assemble,
+        assemble_file,
+        read_image,
+        write_output,
+    )
+
+__all__ = [
+    "AssemblyResult",
+    "assemble",
+    "assemble_file",
+    "read_image",
+    "write_output",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name in __all__:
+        from salut import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module 'salut' has no attribute '{name}'")
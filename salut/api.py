@@ -0,0 +1,68 @@
+"""Сборка без вывода сообщений для использования ассемблера как библиотеки.
+Ядро ассемблера - модуль assembler в корне репозитория, поэтому корень
+должен быть в sys.path (как при запуске из него)"""
+
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from assembler import Assembler
+from salut.cache import IncludeCache
+from salut.diagnostics import Diagnostic, Diagnostics, Stats
+from salut.readers import read_image
+from salut.writers import write_output
+
+__all__ = [
+    "AssemblyResult",
+    "assemble",
+    "assemble_file",
+    "read_image",
+    "write_output",
+]
+
+
+class AssemblyResult(NamedTuple):
+    """Образ памяти (None при ошибке), имена программы и сообщения сборки"""
+
+    machine_code: Optional["array[int]"]
+    global_labels: dict[str, int]  # глобальная: адрес
+    local_labels: dict[str, dict[str, int]]  # глобальная: {локальная: адрес}
+    constants: dict[str, int]
+    diagnostics: list[Diagnostic]
+
+    @property
+    def ok(self) -> bool:
+        return self.machine_code is not None
+
+    @property
+    def errors(self) -> list[Diagnostic]:
+        return [item for item in self.diagnostics if item.kind != "info"]
+
+
+def assemble(
+    source: str | Iterable[str],
+    path: Optional[str] = None,
+    optimize: bool = False,
+    include_cache: Optional[IncludeCache] = None,
+    stats: Optional[Stats] = None,
+) -> AssemblyResult:
+    """Собирает текст программы (строку или строки) без вывода сообщений.
+    path - имя программы в сообщениях, .INCLUDE ищет файлы от текущей папки"""
+    if isinstance(source, str):
+        source = source.splitlines()
+    diagnostics = Diagnostics(echo=False)
+    assembler = Assembler([], path, include_cache, diagnostics=diagnostics, stats=stats)
+    machine_code = assembler.assemble_program(source, optimize)
+    return AssemblyResult(machine_code, *assembler.get_symbols(), diagnostics.items)
+
+
+def assemble_file(
+    path: str | Path,
+    optimize: bool = False,
+    include_cache: Optional[IncludeCache] = None,
+    stats: Optional[Stats] = None,
+) -> AssemblyResult:
+    """Собирает файл программы, файл читается по строкам"""
+    with open(path, encoding="utf-8") as program_file:
+        return assemble(program_file, str(path), optimize, include_cache, stats)
@@ -0,0 +1,372 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Any, NamedTuple, Optional
+
+from assembler import INCLUDE_CACHE_PATH, Assembler
+from salut.cache import IncludeCache, get_file_hash
+from salut.diagnostics import PHASES, Diagnostic, Diagnostics, Stats
+from salut.linker import RAM_SIZE
+from salut.writers import WRITERS, write_output
+
+# .INCLUDE в начале строки, путь до комментария (как его читает ассемблер)
+INCLUDE_PATTERN = re.compile(r"^\s*\.include\s+([^;]*?)\s*(?:;|$)", re.IGNORECASE)
+SHOWN_ERRORS = 5  # ошибок каждой программы в таблице, все ошибки есть в --report
+
+
+class Program(NamedTuple):
+    path: str
+    output: str
+    output_format: str = "bin"
+    optimize: bool = False
+
+
+class ProgramResult(NamedTuple):
+    path: str
+    output: str
+    words: Optional[int]  # None - программа не собрана
+    written: bool
+    diagnostics: list[Diagnostic]
+    stats: dict[str, Any]
+
+
+def get_output_path(
+    path: str, output_format: str, output_directory: Optional[str] = None
+) -> str:
+    """Образ рядом с программой или в output_directory, расширение по формату"""
+    output = Path(path).with_suffix(WRITERS[output_format][1])
+    if output_directory is not None:
+        output = Path(output_directory) / output.name
+    return str(output)
+
+
+def find_programs(
+    patterns: list[str],
+    output_format: str = "bin",
+    output_directory: Optional[str] = None,
+    optimize: bool = False,
+) -> list[Program]:
+    """Программы по шаблонам путей (*.txt, tests/**/*.txt), каждая один раз"""
+    paths: dict[str, None] = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise ValueError(f"No programs match {pattern}")
+        paths |= dict.fromkeys(matches)
+    return [
+        Program(
+            path, get_output_path(path, output_format, output_directory), output_format, optimize
+        )
+        for path in paths
+    ]
+
+
+def _check_type(value: Any, kind: type, name: str, path: str) -> None:
+    if not isinstance(value, kind):
+        raise TypeError(f"{name} in {path} must be a {kind.__name__}, not {value!r}")
+
+
+def _check_format(output_format: Any, path: str) -> None:
+    _check_type(output_format, str, "format", path)
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown format in {path}: {output_format}")
+
+
+def load_manifest(
+    path: str,
+    output_format: str = "bin",
+    output_directory: Optional[str] = None,
+    optimize: bool = False,
+) -> list[Program]:
+    """Читает JSON-манифест: список программ или {"programs": [...]} с полями
+    format, output_dir и optimize по умолчанию. Программа - путь или объект
+    с полями path, output, format и optimize"""
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    if isinstance(manifest, dict):
+        output_format = manifest.get("format", output_format)
+        _check_format(output_format, path)
+        output_directory = manifest.get("output_dir", output_directory)
+        if output_directory is not None:
+            _check_type(output_directory, str, "output_dir", path)
+        optimize = manifest.get("optimize", optimize)
+        manifest = manifest.get("programs")
+    _check_type(manifest, list, "programs", path)
+    programs = []
+    for entry in manifest:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get("path"), str):
+            raise TypeError(f"Invalid program in {path}: {entry!r}")
+        entry_format = entry.get("format", output_format)
+        _check_format(entry_format, path)
+        output = entry.get("output")
+        if output is not None:
+            _check_type(output, str, "output", path)
+        programs.append(
+            Program(
+                entry["path"],
+                output or get_output_path(entry["path"], entry_format, output_directory),
+                entry_format,
+                bool(entry.get("optimize", optimize)),
+            )
+        )
+    return programs
+
+
+def _get_path_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def remove_duplicates(programs: list[Program]) -> list[Program]:
+    """Убирает повторы (программа из шаблона и из манифеста) и проверяет,
+    что образы разных программ не записываются в один файл"""
+    unique: dict[tuple[str, str], Program] = {}
+    outputs: dict[str, Program] = {}
+    for program in programs:
+        key = (_get_path_key(program.path), _get_path_key(program.output))
+        if key in unique:
+            if unique[key][2:] != program[2:]:
+                raise ValueError(
+                    f"{program.path} is built to {program.output} with different options"
+                )
+            continue
+        other = outputs.get(key[1])
+        if other is not None:
+            raise ValueError(
+                f"{other.path} and {program.path} are both written to {program.output}"
+            )
+        unique[key] = outputs[key[1]] = program
+    return list(unique.values())
+
+
+def find_shared_includes(programs: list[Program]) -> list[str]:
+    """Файлы, которые включают несколько программ (screen_lib.txt и т.п.)"""
+    counts: Counter[str] = Counter()
+    for program in programs:
+        includes = set()
+        try:
+            with open(program.path, encoding="utf-8", errors="replace") as program_file:
+                for line in program_file:
+                    match = INCLUDE_PATTERN.match(line)
+                    if match is not None:
+                        includes.add(match.group(1).lower())
+        except OSError:
+            continue
+        counts.update(includes)
+    return [path for path, count in counts.items() if count > 1 and Path(path).is_file()]
+
+
+def _warm_include(path: str) -> None:
+    """Собирает общий включаемый файл в кэш, чтобы программы брали его оттуда,
+    а не собирали каждая в своём процессе. Ошибки выведет сборка программ"""
+    include_cache = IncludeCache(INCLUDE_CACHE_PATH)
+    try:
+        file_hash = get_file_hash(path)
+        if include_cache.load(path, file_hash) is not None:
+            return
+        with open(path, encoding="utf-8") as program_file:
+            unit = Assembler.assemble_unit(
+                program_file,
+                path,
+                [path],
+                include_cache,
+                diagnostics=Diagnostics(echo=False),
+            )
+    except OSError:
+        return
+    if unit is not None:
+        include_cache.store(path, file_hash, unit)
+
+
+def build_program(program: Program) -> ProgramResult:
+    """Собирает программу и записывает образ, сообщения не выводятся"""
+    diagnostics, stats = Diagnostics(echo=False), Stats()
+    machine_code = None
+    written = False
+    try:
+        with open(program.path, encoding="utf-8") as program_file:
+            machine_code = Assembler.assemble(
+                program_file,
+                program.path,
+                IncludeCache(INCLUDE_CACHE_PATH),
+                optimize=program.optimize,
+                diagnostics=diagnostics,
+                stats=stats,
+            )
+        if machine_code is not None:
+            with stats.phase("write"):
+                Path(program.output).parent.mkdir(parents=True, exist_ok=True)
+                written = write_output(machine_code, program.output, program.output_format)
+    except OSError as error:
+        diagnostics.error(error, None, program.path)
+    return ProgramResult(
+        program.path,
+        program.output,
+        len(machine_code) if machine_code is not None and written else None,
+        written,
+        diagnostics.items,
+        stats.to_dict(),
+    )
+
+
+def build_programs(programs: list[Program], jobs: int = 1) -> list[ProgramResult]:
+    """Собирает программы в jobs процессах, результаты в порядке programs.
+    Таблицы инструкций строятся при импорте, дочерние процессы получают их готовыми"""
+    shared_includes = find_shared_includes(programs)
+    # большие программы первыми, чтобы процессы заканчивали примерно одновременно
+    order = sorted(
+        range(len(programs)),
+        key=lambda i: (
+            os.path.getsize(programs[i].path) if os.path.isfile(programs[i].path) else 0
+        ),
+        reverse=True,
+    )
+    ordered = [programs[i] for i in order]
+    if jobs == 1:
+        for path in shared_includes:
+            _warm_include(path)
+        results = list(map(build_program, ordered))
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            list(executor.map(_warm_include, shared_includes))
+            results = list(executor.map(build_program, ordered))
+    by_index = dict(zip(order, results))
+    return [by_index[i] for i in range(len(programs))]
+
+
+def get_report(results: list[ProgramResult], total: float) -> dict[str, Any]:
+    """Отчёт по всем программам: размеры, ошибки, время этапов (сумма по процессам)"""
+    phases = dict.fromkeys(PHASES, 0.0)
+    for result in results:
+        for phase, time in result.stats["phases"].items():
+            phases[phase] += time
+    return {
+        "total": total,
+        "programs": len(results),
+        "failed": sum(result.words is None for result in results),
+        "words": sum(result.words or 0 for result in results),
+        "phases": phases,
+        "results": [
+            {
+                "path": result.path,
+                "output": result.output,
+                "ok": result.words is not None,
+                "words": result.words,
+                "errors": sum(item.kind != "info" for item in result.diagnostics),
+                "diagnostics": [item._asdict() for item in result.diagnostics],
+                "time": result.stats["total"],
+                "phases": result.stats["phases"],
+                "counters": result.stats["counters"],
+            }
+            for result in results
+        ],
+    }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    width = max([len("program")] + [len(result["path"]) for result in report["results"]])
+    rows = [f"{'program':<{width}}{'words':>8}{'RAM':>8}{'ms':>9}  output"]
+    for result in report["results"]:
+        if result["ok"]:
+            rows.append(
+                f"{result['path']:<{width}}{result['words']:>8}"
+                f"{result['words'] * 100 / RAM_SIZE:>7.2f}%{result['time'] * 1000:>9.1f}"
+                f"  {result['output']}"
+            )
+            continue
+        rows.append(
+            f"{result['path']:<{width}}{'FAILED':>8}{'':>8}{result['time'] * 1000:>9.1f}"
+        )
+        errors = [item for item in result["diagnostics"] if item["kind"] != "info"]
+        for item in errors[:SHOWN_ERRORS]:
+            line = f" on line {item['line']}" if item["line"] else ""
+            path = f" in {item['path']}" if item["path"] else ""
+            # у ошибок операндов дальше идут допустимые шаблоны
+            message = item["message"].split("\n", 1)[0]
+            rows.append(f"    {item['kind']}{line}{path}: {message}")
+        if len(errors) > SHOWN_ERRORS:
+            rows.append(f"    ...and {len(errors) - SHOWN_ERRORS} more errors")
+    rows.append(
+        f"{report['programs']} programs, {report['failed']} failed, "
+        f"{report['words']} words, {report['total']:.2f} s"
+    )
+    return "\n".join(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="SALUT-2 batch assembler: assemble many programs in parallel"
+    )
+    parser.add_argument(
+        "programs",
+        nargs="*",
+        help="programs or glob patterns (quoted, '**' searches subdirectories)",
+    )
+    parser.add_argument("-m", "--manifest", help="JSON file with programs and their outputs")
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=WRITERS,
+        default="bin",
+        help="memory image format of programs without their own format "
+        "(json only updates existing memory block data files)",
+    )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        help="directory for memory images (next to the programs by default)",
+    )
+    parser.add_argument(
+        "-O", "--optimize", action="store_true", help="optimize every program like assembler -O"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes (all processor cores by default)",
+    )
+    parser.add_argument(
+        "--report",
+        metavar="PATH",
+        help="write sizes, messages and phase times of every program as JSON ('-' for stdout)",
+    )
+    args = parser.parse_args()
+    if not args.programs and not args.manifest:
+        parser.error("programs or --manifest are required")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    try:
+        programs = find_programs(args.programs, args.format, args.output_dir, args.optimize)
+        if args.manifest:
+            programs += load_manifest(args.manifest, args.format, args.output_dir, args.optimize)
+        programs = remove_duplicates(programs)
+    except (OSError, ValueError, TypeError) as error:
+        parser.error(str(error))
+
+    start = perf_counter()
+    results = build_programs(programs, args.jobs)
+    report = get_report(results, perf_counter() - start)
+    if args.report != "-":
+        print(format_report(report))
+    if args.report:
+        text = json.dumps(report, indent=2)
+        if args.report == "-":
+            print(text)
+        else:
+            with open(args.report, "w", encoding="utf-8") as report_file:
+                report_file.write(text + "\n")
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
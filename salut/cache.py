@@ -0,0 +1,84 @@
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from salut.objects import ObjectUnit
+
+# увеличивать при любом изменении кодирования инструкций или формата ObjectUnit
+ASSEMBLER_VERSION = "3"
+
+
+def get_file_hash(path: str | Path) -> str:
+    """Хэш содержимого файла, файл читается по частям"""
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def _are_dependencies_unchanged(unit: ObjectUnit) -> bool:
+    for dependency_path, dependency_hash in unit.dependencies:
+        try:
+            if get_file_hash(dependency_path) != dependency_hash:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class IncludeCache:
+    """Кэш собранных включаемых файлов на диске.
+    Ключ - путь к файлу, хэш его содержимого и версия ассемблера"""
+
+    def __init__(self, directory: str | Path) -> None:
+        self._directory = Path(directory)
+
+    def _get_cache_path(self, path: str, file_hash: str) -> Path:
+        key = hashlib.sha256()
+        for part in (ASSEMBLER_VERSION.encode(), path.encode(), file_hash.encode()):
+            key.update(len(part).to_bytes(8, "little"))
+            key.update(part)
+        return self._directory / f"{key.hexdigest()}.unit"
+
+    def load(self, path: str, file_hash: str) -> Optional[ObjectUnit]:
+        """Возвращает собранный файл, если ни он, ни файлы, которые он включает,
+        не изменились. file_hash - хэш содержимого файла (get_file_hash)"""
+        try:
+            with open(self._get_cache_path(path, file_hash), "rb") as unit_file:
+                unit = pickle.load(unit_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return unit if _are_dependencies_unchanged(unit) else None
+
+    def store(self, path: str, file_hash: str, unit: ObjectUnit) -> None:
+        temp_path = None
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self._directory)
+            with os.fdopen(file_descriptor, "wb") as unit_file:
+                pickle.dump(unit, unit_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._get_cache_path(path, file_hash))
+        except OSError:
+            # без кэша программа всё равно собирается
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+
+
+class MemoryIncludeCache(IncludeCache):
+    """Кэш собранных включаемых файлов в памяти процесса (для salut.server),
+    старые версии файла заменяются новыми"""
+
+    def __init__(self) -> None:
+        self._units: dict[str, tuple[str, ObjectUnit]] = {}  # путь: (хэш, unit)
+
+    def load(self, path: str, file_hash: str) -> Optional[ObjectUnit]:
+        stored = self._units.get(path)
+        if stored is None or stored[0] != file_hash:
+            return None
+        return stored[1] if _are_dependencies_unchanged(stored[1]) else None
+
+    def store(self, path: str, file_hash: str, unit: ObjectUnit) -> None:
+        self._units[path] = (file_hash, unit)
@@ -0,0 +1,67 @@
+from array import array
+from collections.abc import Sequence
+
+# Сжатые данные (.RLE) - блоки, каждый начинается со слова-заголовка:
+# старший бит 1 - повтор: следующее слово повторяется (заголовок & 0x7FFF) раз,
+# старший бит 0 - заголовок равен числу следующих за ним слов без сжатия.
+# .DELTA сначала заменяет каждое слово на XOR со словом на stride раньше
+# (для кадров видео - с тем же словом прошлого кадра), потом сжимает как .RLE.
+# Распаковка на процессоре - compression_lib.txt
+RUN_BIT = 0x8000
+MAX_BLOCK = 0x7FFF
+MIN_RUN = 3  # повтор из двух слов не короче, чем два слова без сжатия
+
+
+def _add_literals(encoded: "array[int]", literals: Sequence[int]) -> None:
+    for start in range(0, len(literals), MAX_BLOCK):
+        block = literals[start : start + MAX_BLOCK]
+        encoded.append(len(block))
+        encoded.extend(block)
+
+
+def rle_encode(words: Sequence[int]) -> "array[int]":
+    encoded = array("H")
+    literals_start = i = 0
+    while i < len(words):
+        run_end = i + 1
+        while (
+            run_end < len(words)
+            and words[run_end] == words[i]
+            and run_end - i < MAX_BLOCK
+        ):
+            run_end += 1
+        if run_end - i < MIN_RUN:
+            i += 1
+            continue
+        _add_literals(encoded, words[literals_start:i])
+        encoded += array("H", [RUN_BIT | (run_end - i), words[i]])
+        literals_start = i = run_end
+    _add_literals(encoded, words[literals_start:])
+    return encoded
+
+
+def rle_decode(encoded: Sequence[int]) -> "array[int]":
+    words = array("H")
+    i = 0
+    while i < len(encoded):
+        header = encoded[i]
+        if header & RUN_BIT:
+            words += array("H", [encoded[i + 1]]) * (header & MAX_BLOCK)
+            i += 2
+        else:
+            words.extend(encoded[i + 1 : i + 1 + header])
+            i += 1 + header
+    return words
+
+
+def delta_encode(words: Sequence[int], stride: int) -> "array[int]":
+    deltas = array("H", words[:stride])
+    deltas.extend(words[i] ^ words[i - stride] for i in range(stride, len(words)))
+    return rle_encode(deltas)
+
+
+def delta_decode(encoded: Sequence[int], stride: int) -> "array[int]":
+    words = rle_decode(encoded)
+    for i in range(stride, len(words)):
+        words[i] ^= words[i - stride]
+    return words
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from salut.utils import INSTRUCTIONS, Instruction
+
+
+def _build_decode_table() -> list[Optional[Instruction]]:
+    table: list[Optional[Instruction]] = [None] * 65536
+    for instruction in INSTRUCTIONS:
+        opcode = instruction.opcode
+        if opcode is None:
+            continue
+        for word in range(opcode, opcode + (1 << instruction.get_operand_bits())):
+            # как и при сборке, побеждает инструкция, стоящая в таблице раньше
+            if table[word] is None:
+                table[word] = instruction
+    return table
+
+
+# первое слово инструкции: инструкция (None для слов, которые не являются инструкцией)
+DECODE_TABLE = _build_decode_table()
+
+
+def decode(word: int, next_word: int = 0) -> Optional[tuple[Instruction, tuple[int, ...]]]:
+    """Возвращает инструкцию и значения её операндов, None если слово не инструкция"""
+    instruction = DECODE_TABLE[word]
+    if instruction is None:
+        return None
+    return instruction, instruction.decode_operands(word, next_word)
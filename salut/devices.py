@@ -0,0 +1,181 @@
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from salut.errors import SimulatorError
+
+try:
+    import numpy as np
+except ImportError:  # без NumPy команды экрана применяются по одной
+    np = None
+
+if TYPE_CHECKING:
+    from salut.scheduler import InputTrace
+    from salut.simulator import Simulator
+
+SCREEN_SIZE = 32
+# команда экрана: биты 0-4 - x, 5-9 - y (номер пикселя y * 32 + x),
+# 10 - значение пикселя, 11 - запись в буфер, 12 - показать буфер
+PIXEL_MASK = 0x3FF
+VALUE_SHIFT = 10
+BUFFER_BIT = 1 << 11
+UPDATE_BIT = 1 << 12
+PNG_SCALE = 8  # размер пикселя экрана в PNG
+
+# значения на входе джойстика
+JOYSTICK_BUTTONS = {"left": 0, "up": 1, "down": 2, "right": 3, "click": 7}
+
+
+class Device(ABC):
+    """Устройство, подключённое к порту симулятора"""
+
+    @abstractmethod
+    def attach(self, simulator: "Simulator", port: int = 0) -> None:
+        """Подключает устройство к порту port"""
+
+
+def _write_last(target: Any, commands: Any) -> None:
+    # при нескольких записях в один пиксель остаётся последняя:
+    # np.unique находит первое вхождение в перевёрнутом массиве
+    commands = commands[::-1]
+    indices, first = np.unique(commands & PIXEL_MASK, return_index=True)
+    target[indices] = commands[first] >> VALUE_SHIFT & 1
+
+
+def _get_png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    chunk = chunk_type + data
+    return len(data).to_bytes(4, "big") + chunk + zlib.crc32(chunk).to_bytes(4, "big")
+
+
+def encode_png(frame: bytes, scale: int = PNG_SCALE) -> bytes:
+    """Чёрно-белая картинка кадра, y = 0 - нижняя строчка"""
+    size = SCREEN_SIZE * scale
+    rows = []
+    for y in reversed(range(SCREEN_SIZE)):
+        line = frame[y * SCREEN_SIZE : (y + 1) * SCREEN_SIZE]
+        row = b"\0" + bytes(255 * pixel for pixel in line for _ in range(scale))
+        rows += [row] * scale
+    header = size.to_bytes(4, "big") * 2 + bytes((8, 0, 0, 0, 0))  # 8 бит, оттенки серого
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            _get_png_chunk(b"IHDR", header),
+            _get_png_chunk(b"IDAT", zlib.compress(b"".join(rows))),
+            _get_png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+class Screen(Device):
+    """Экран 32x32 с буфером. Выведенные команды копятся в массиве и применяются
+    в flush (с NumPy - сразу всеми командами между обновлениями экрана).
+    Пиксель хранится байтом 0 или 1, кадр - 1024 байта, строчки начиная с y = 0"""
+
+    def __init__(self, keep_frames: bool = True) -> None:
+        self.keep_frames = keep_frames
+        self.frames: list[bytes] = []  # кадры, показанные командой update_screen
+        self.frame_count = 0
+        self._commands = array("H")
+        self._screen = bytearray(SCREEN_SIZE * SCREEN_SIZE)
+        self._buffer = bytearray(SCREEN_SIZE * SCREEN_SIZE)
+
+    def attach(self, simulator: "Simulator", port: int = 0) -> None:
+        simulator.out_handlers[port] = self._commands.append
+
+    def _add_frame(self) -> None:
+        self.frame_count += 1
+        if self.keep_frames:
+            self.frames.append(bytes(self._screen))
+
+    def _apply(self, commands: "array[int]") -> None:
+        screen, buffer = self._screen, self._buffer
+        for command in commands:
+            if command & UPDATE_BIT:
+                screen[:] = buffer
+                self._add_frame()
+            elif command & BUFFER_BIT:
+                buffer[command & PIXEL_MASK] = command >> VALUE_SHIFT & 1
+            else:
+                screen[command & PIXEL_MASK] = command >> VALUE_SHIFT & 1
+
+    def _apply_vectorized(self, commands: "array[int]") -> None:
+        values = np.frombuffer(commands, dtype=np.uint16)
+        screen = np.frombuffer(self._screen, dtype=np.uint8)
+        buffer = np.frombuffer(self._buffer, dtype=np.uint8)
+        start = 0
+        for end in [*np.flatnonzero(values & UPDATE_BIT).tolist(), len(values)]:
+            segment = values[start:end]
+            buffered = (segment & BUFFER_BIT) != 0
+            _write_last(buffer, segment[buffered])
+            _write_last(screen, segment[~buffered])
+            if end < len(values):
+                screen[:] = buffer
+                self._add_frame()
+            start = end + 1
+
+    def flush(self) -> None:
+        """Применяет команды, выведенные после прошлого вызова"""
+        # обработчик порта - метод append этого массива, поэтому массив очищается
+        commands = array("H", self._commands)
+        del self._commands[:]
+        if np is not None:
+            self._apply_vectorized(commands)
+        else:
+            self._apply(commands)
+
+    @property
+    def pixels(self) -> bytes:
+        """Пиксели, которые сейчас видны на экране"""
+        return bytes(self._screen)
+
+    def get_frames_array(self) -> Any:
+        """Кадры массивом NumPy (кадр, y, x)"""
+        if np is None:
+            raise ImportError("NumPy is required to get frames as an array")
+        return np.frombuffer(b"".join(self.frames), dtype=np.uint8).reshape(
+            -1, SCREEN_SIZE, SCREEN_SIZE
+        )
+
+    def save_png(self, path: str | Path, frame: Optional[bytes] = None) -> None:
+        """Сохраняет кадр (по умолчанию то, что видно на экране)"""
+        Path(path).write_bytes(encode_png(self.pixels if frame is None else frame))
+
+    def save_frames(self, directory: str | Path) -> None:
+        """Сохраняет каждый кадр в PNG: frame_00000.png, frame_00001.png, ..."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for i, frame in enumerate(self.frames):
+            self.save_png(directory / f"frame_{i:05}.png", frame)
+
+    def save_raw(self, path: str | Path) -> None:
+        """Сохраняет все кадры подряд по 1024 байта, в .npy - массивом NumPy"""
+        if Path(path).suffix == ".npy":
+            if np is None:
+                raise SimulatorError(f"NumPy is required to save frames to {path}")
+            np.save(path, self.get_frames_array())
+        else:
+            Path(path).write_bytes(b"".join(self.frames))
+
+
+class Joystick(Device):
+    """Джойстик: нажатая кнопка выставляет своё значение на входе порта
+    и включает его сигнальный бит. Нажатия можно записывать в trace"""
+
+    def __init__(self, trace: Optional["InputTrace"] = None) -> None:
+        self.trace = trace
+        self._simulator: Optional[Simulator] = None
+        self._port = 0
+
+    def attach(self, simulator: "Simulator", port: int = 0) -> None:
+        self._simulator = simulator
+        self._port = port
+
+    def press(self, button: str) -> None:
+        if self._simulator is None:
+            raise RuntimeError("Joystick isn't attached to a simulator")
+        value = JOYSTICK_BUTTONS[button]
+        if self.trace is not None:
+            self.trace.add(self._simulator.ticks, self._port, value)
+        self._simulator.input(self._port, value)
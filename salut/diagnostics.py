@@ -0,0 +1,139 @@
+import json
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, NamedTuple, Optional
+
+from salut.errors import format_error
+
+# этапы сборки в порядке вывода
+PHASES = (
+    "read",  # чтение строк исходника
+    "tokenize",
+    "match",  # поиск инструкции по имени и операндам
+    "encode",
+    "include",  # кэш включаемых файлов и размещение их кода (без сборки самих файлов)
+    "resolve",  # подстановка меток и констант
+    "optimize",
+    "link",
+    "write",
+)
+COUNTERS = ("lines", "words", "fixups", "includes", "include_cache_hits")
+
+
+class Diagnostic(NamedTuple):
+    """Сообщение сборки: ошибка (kind - имя класса ошибки) или информация (kind "info")"""
+
+    kind: str
+    message: str
+    line: Optional[int] = None
+    column: Optional[int] = None
+    path: Optional[str] = None
+
+
+class Diagnostics:
+    """Собирает сообщения сборки и компоновки. echo - сразу выводить каждое
+    сообщение (как при запуске из консоли), иначе они только сохраняются"""
+
+    def __init__(self, echo: bool = True) -> None:
+        self.echo = echo
+        self.items: list[Diagnostic] = []
+
+    def error(self, error: Exception, line: Optional[int], path: Optional[str]) -> None:
+        self.items.append(
+            Diagnostic(
+                error.__class__.__name__,
+                str(error),
+                line,
+                getattr(error, "column", None),
+                path,
+            )
+        )
+        if self.echo:
+            print(format_error(error, line, path))
+
+    def info(self, message: str) -> None:
+        self.items.append(Diagnostic("info", message))
+        if self.echo:
+            print(message)
+
+    @property
+    def errors(self) -> list[Diagnostic]:
+        return [item for item in self.items if item.kind != "info"]
+
+
+class Stats:
+    """Время этапов сборки в секундах и счётчики. Части файла, собранные
+    в других процессах (-j), в этапы не попадают"""
+
+    def __init__(self) -> None:
+        self.times: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.counters: dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._start = perf_counter()
+
+    def add_time(self, phase: str, start: float) -> float:
+        """Добавляет к этапу время с start, возвращает текущее время"""
+        now = perf_counter()
+        self.times[phase] += now - start
+        return now
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, start)
+
+    def count(self, counter: str, value: int = 1) -> None:
+        self.counters[counter] += value
+
+    def timed_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Строки из lines, время их чтения попадает в этап read"""
+        iterator = iter(lines)
+        while True:
+            start = perf_counter()
+            line = next(iterator, None)
+            self.add_time("read", start)
+            if line is None:
+                return
+            yield line
+
+    def to_dict(self) -> dict[str, Any]:
+        total = perf_counter() - self._start
+        return {
+            "total": total,
+            "phases": self.times,
+            "counters": self.counters,
+            "lines_per_second": self.counters["lines"] / total if total else 0.0,
+        }
+
+    def get_report(self) -> str:
+        stats = self.to_dict()
+        total = stats["total"]
+        rows = [
+            f"{phase:<10}{time * 1000:>10.1f} ms{time * 100 / (total or 1):>7.1f}%"
+            for phase, time in self.times.items()
+        ]
+        other = total - sum(self.times.values())
+        rows.append(f"{'other':<10}{other * 1000:>10.1f} ms{other * 100 / (total or 1):>7.1f}%")
+        rows.append(f"{'total':<10}{total * 1000:>10.1f} ms")
+        rows += [f"{counter:<20}{value:>10}" for counter, value in self.counters.items()]
+        rows.append(f"{'lines per second':<20}{stats['lines_per_second']:>10.0f}")
+        return "\n".join(rows)
+
+
+def write_report(
+    path: str, stats: Stats, diagnostics: Optional[Diagnostics] = None
+) -> None:
+    """JSON-отчёт: этапы, счётчики и сообщения сборки ("-" - стандартный вывод)"""
+    report = stats.to_dict()
+    if diagnostics is not None:
+        report["errors"] = len(diagnostics.errors)
+        report["diagnostics"] = [item._asdict() for item in diagnostics.items]
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as report_file:
+        report_file.write(text + "\n")
@@ -0,0 +1,179 @@
+import argparse
+from collections.abc import Sequence
+from typing import Optional
+
+from salut.decoder import DECODE_TABLE
+from salut.readers import READERS, read_image
+from salut.semantics import get_semantics, get_value_kinds
+from salut.utils import (
+    FLAG,
+    FLAG_NAMES,
+    IMMEDIATE,
+    PORT,
+    REG,
+    SQUARED_IMMEDIATE,
+    SQUARED_REG,
+    SQUARED_SUM_REG,
+    Instruction,
+)
+
+
+class Disassembler:
+    """
+    Переводит образ памяти обратно в текст программы за один проход по словам.
+    Слова, которые не являются инструкцией, становятся .DATA. Метки (если известны)
+    ставятся перед своими адресами и подставляются в адреса переходов и [Imm]
+    """
+
+    def __init__(
+        self,
+        machine_code: Sequence[int],
+        global_labels: Optional[dict[str, int]] = None,
+        local_labels: Optional[dict[str, dict[str, int]]] = None,
+    ) -> None:
+        self._code = machine_code
+        # адрес: [(глобальная метка области видимости, имя)], глобальные раньше локальных
+        self._labels: dict[int, list[tuple[str, str]]] = {}
+        for name, address in (global_labels or {}).items():
+            self._labels.setdefault(address, []).append((name, name))
+        for global_label, labels in (local_labels or {}).items():
+            for name, address in labels.items():
+                self._labels.setdefault(address, []).append((global_label, name))
+
+    def _get_label_name(self, address: int, scope: str) -> Optional[str]:
+        for global_label, name in self._labels.get(address, []):
+            if not name.startswith(".") or global_label == scope:
+                return name
+        return None
+
+    @staticmethod
+    def _is_second_word_valid(instruction: Optional[Instruction], next_word: int) -> bool:
+        """Регистры во втором слове (DIV с 4 операндами, REM) занимают младшие биты,
+        остальные биты при сборке всегда нулевые"""
+        if instruction is None or {IMMEDIATE, SQUARED_IMMEDIATE} & set(
+            instruction.operand_kinds
+        ):
+            return True
+        return next_word >> (4 * len(instruction.operand_kinds)) == 0
+
+    def format_instruction(
+        self, instruction: Instruction, values: Sequence[int], scope: str = ""
+    ) -> str:
+        """Текст инструкции по значениям операндов из decode_operands"""
+        # переход или вызов по немедленному адресу
+        semantics = get_semantics(instruction)
+        is_jump = get_value_kinds(instruction) == (IMMEDIATE,) and "{jump}" in semantics
+        operands = []
+        remaining_values = iter(values)
+        for kind in instruction.operand_kinds:
+            if kind == REG:
+                operands.append(f"R{next(remaining_values)}")
+            elif kind == SQUARED_REG:
+                operands.append(f"[R{next(remaining_values)}]")
+            elif kind == SQUARED_SUM_REG:
+                operands.append(
+                    f"[R{next(remaining_values)}+R{next(remaining_values)}]"
+                )
+            elif kind == FLAG:
+                operands.append(FLAG_NAMES[next(remaining_values)])
+            elif kind == PORT:
+                operands.append(f"P{next(remaining_values)}")
+            elif kind == IMMEDIATE:
+                value = next(remaining_values)
+                name = self._get_label_name(value, scope) if is_jump else None
+                operands.append(str(value) if name is None else name)
+            elif kind == SQUARED_IMMEDIATE:
+                value = next(remaining_values)
+                name = self._get_label_name(value, scope)
+                operands.append(f"[{value if name is None else name}]")
+            else:
+                operands.append(kind)  # специальный регистр
+        if not operands:
+            return instruction.names[0]
+        return f"{instruction.names[0]} {', '.join(operands)}"
+
+    def disassemble(self, listing: bool = True) -> list[str]:
+        """
+        Строки программы. listing - с адресом и словами перед каждой инструкцией,
+        иначе текст можно снова собрать в тот же образ
+        """
+        lines = []
+        scope = ""
+        address = 0
+        while address < len(self._code):
+            for global_label, name in self._labels.get(address, []):
+                if not name.startswith("."):
+                    scope = name
+                lines.append(f"{name}:" if global_label == name else f"    {name}:")
+            word = self._code[address]
+            instruction = DECODE_TABLE[word]
+            size = 1 if instruction is None else instruction.get_word_usage()
+            # второе слово за концом образа или под меткой - это данные
+            if size == 2 and (
+                address + 1 >= len(self._code)
+                or address + 1 in self._labels
+                or not self._is_second_word_valid(instruction, self._code[address + 1])
+            ):
+                instruction, size = None, 1
+            words = self._code[address : address + size]
+            if instruction is None:
+                text = f".DATA 0x{word:04X}"
+            else:
+                values = instruction.decode_operands(word, words[-1])
+                text = self.format_instruction(instruction, values, scope)
+            if listing:
+                hex_words = " ".join(format(word, "04X") for word in words)
+                lines.append(f"{address:04x}  {hex_words:<9}    {text}")
+            else:
+                lines.append(f"    {text}")
+            address += size
+        # метки сразу за концом образа
+        for global_label, name in self._labels.get(address, []):
+            lines.append(f"{name}:" if global_label == name else f"    {name}:")
+        return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SALUT-2 disassembler")
+    parser.add_argument("image", help="memory image written by assembler.py")
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=READERS.keys(),
+        help="image format (default: by file extension, otherwise bin)",
+    )
+    parser.add_argument(
+        "-s",
+        "--symbols",
+        nargs="+",
+        help="programs or object files the image was built from, for label names",
+    )
+    parser.add_argument(
+        "--plain",
+        action="store_true",
+        help="print only the program text, which assembles back into the same image",
+    )
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+    args = parser.parse_args()
+
+    global_labels: dict[str, int] = {}
+    local_labels: dict[str, dict[str, int]] = {}
+    if args.symbols:
+        from salut.profiler import load_program
+
+        linker = load_program(args.symbols)
+        if linker is None:
+            return
+        global_labels, local_labels = linker.global_labels, linker.local_labels
+    machine_code = read_image(args.image, args.format)
+    disassembler = Disassembler(machine_code, global_labels, local_labels)
+    text = "\n".join(disassembler.disassemble(listing=not args.plain)) + "\n"
+    if args.output is None:
+        print(text, end="")
+    else:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from itertools import product
+from typing import Optional
+
+from salut.utils import (
+    FLAG,
+    FLAG_NAMES,
+    FLAG_NUMBER_NAMES,
+    IMMEDIATE,
+    INSTRUCTIONS,
+    NOT_IMMEDIATE_NAMES,
+    PORT,
+    PORT_NAMES,
+    REG,
+    REGISTER_NAMES,
+    SPECIAL_REGISTER_NAMES,
+    SQUARED_IMMEDIATE,
+    SQUARED_R,
+    SQUARED_REG,
+    SQUARED_SUM_R,
+    SQUARED_SUM_REG,
+    Instruction,
+)
+
+# имя операнда: его класс
+OPERAND_CLASSES: dict[str, str] = (
+    dict.fromkeys(REGISTER_NAMES, REG)
+    | dict.fromkeys(SQUARED_R, SQUARED_REG)
+    | dict.fromkeys(SQUARED_SUM_R, SQUARED_SUM_REG)
+    | dict.fromkeys(FLAG_NAMES + FLAG_NUMBER_NAMES, FLAG)
+    | dict.fromkeys(PORT_NAMES, PORT)
+    | {name: name for name in SPECIAL_REGISTER_NAMES}
+)
+
+
+def classify_operand(operand: str) -> str:
+    """Возвращает класс операнда из форматированной строчки кода"""
+    operand_class = OPERAND_CLASSES.get(operand)
+    if operand_class is not None:
+        return operand_class
+    if (
+        len(operand) >= 3
+        and operand[0] == "["
+        and operand[-1] == "]"
+        and operand.strip("[]") not in NOT_IMMEDIATE_NAMES
+    ):
+        return SQUARED_IMMEDIATE
+    return IMMEDIATE
+
+
+def _get_slot_classes(possible_values: list[str]) -> list[str]:
+    """Возвращает классы операндов, которые подходят на место possible_values"""
+    classes = []
+    if any(i in possible_values for i in ["0_IMMEDIATE", "0_NAME", "0_PATH"]):
+        # значение в квадратных скобках тоже считается немедленным значением
+        classes += [IMMEDIATE, SQUARED_IMMEDIATE]
+    elif "0_SQUARED_IMMEDIATE" in possible_values:
+        classes.append(SQUARED_IMMEDIATE)
+    for value in possible_values:
+        operand_class = OPERAND_CLASSES.get(value)
+        if operand_class is not None and operand_class not in classes:
+            classes.append(operand_class)
+    return classes
+
+
+def _build_indexes() -> tuple[
+    dict[str, list[Instruction]], dict[tuple[str, tuple[str, ...]], Instruction]
+]:
+    by_name: dict[str, list[Instruction]] = {}
+    by_signature: dict[tuple[str, tuple[str, ...]], Instruction] = {}
+    for instruction in INSTRUCTIONS:
+        signatures = list(
+            product(*(_get_slot_classes(values) for values in instruction.operands))
+        )
+        for name in instruction.names:
+            by_name.setdefault(name, []).append(instruction)
+            for signature in signatures:
+                # как и при переборе, побеждает инструкция, стоящая в таблице раньше
+                by_signature.setdefault((name, signature), instruction)
+    return by_name, by_signature
+
+
+# мнемоника: все инструкции с такой мнемоникой (для сообщений об ошибках)
+# (мнемоника, классы операндов): инструкция
+INSTRUCTIONS_BY_NAME, INSTRUCTION_INDEX = _build_indexes()
+
+
+def find_instruction(
+    instruction_name: str, signature: tuple[str, ...]
+) -> Optional[Instruction]:
+    """Находит инструкцию по мнемонике и классам операндов за O(1), None если такой нет"""
+    return INSTRUCTION_INDEX.get((instruction_name, signature))
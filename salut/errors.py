@@ -1,5 +1,10 @@
+from typing import Optional
+
+
 class AssemblerError(Exception):
-    pass
+    def __init__(self, *args: object, column: Optional[int] = None) -> None:
+        super().__init__(*args)
+        self.column = column  # номер столбца в строке с ошибкой, если известен
 
 
 class AssemblerNameError(AssemblerError):
@@ -24,3 +29,25 @@ class OperandError(AssemblerError):
 
 class LabelError(AssemblerError):
     pass
+
+
+class LinkError(AssemblerError):
+    pass
+
+
+class MemoryOverflowError(AssemblerError):
+    pass
+
+
+class SimulatorError(Exception):
+    pass
+
+
+def format_error(error: Exception, line: Optional[int], path: Optional[str]) -> str:
+    column = getattr(error, "column", None)
+    return (
+        f"{error.__class__.__name__}"
+        f"{f' on line {line}' if line else ''}"
+        f"{f', column {column}' if column else ''}"
+        f"{f' in {path}' if path else ''}:\n{error}\n"
+    )
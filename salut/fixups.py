@@ -0,0 +1,12 @@
+from typing import NamedTuple, Optional
+
+
+class Fixup(NamedTuple):
+    """Слово машинного кода, в которое нужно подставить значение метки или константы"""
+
+    index: int  # номер слова (адрес) в машинном коде
+    symbol: str  # имя метки или константы
+    scope: Optional[str]  # глобальная метка, в области которой искать локальные метки
+    line: int  # номер строки (для принта ошибок)
+    column: int
+    path: Optional[str]  # файл, в котором встретилось имя
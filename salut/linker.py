@@ -0,0 +1,113 @@
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable
+from typing import Optional
+
+from salut.diagnostics import Diagnostics
+from salut.errors import LinkError, UndefinedValueError
+from salut.fixups import Fixup
+from salut.objects import ObjectUnit
+
+RAM_SIZE = 65536  # в словах
+
+
+class Linker:
+    """Размещает объектные файлы друг за другом с нулевого адреса
+    и подставляет имена, которые файлы импортируют друг у друга"""
+
+    def __init__(self, diagnostics: Optional[Diagnostics] = None) -> None:
+        self._diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self.code = array("H")
+        self.global_labels: dict[str, int] = {}  # глобальная: адрес
+        self.local_labels: dict[str, dict[str, int]] = {}  # глобальная: {локальная: адрес}
+        self.constants: dict[str, int] = {}
+        # адрес начала каждого файла и путь к нему
+        self.units: list[tuple[int, Optional[str]]] = []
+        self._symbol_paths: dict[str, Optional[str]] = {}  # имя: файл, где оно определено
+        self._global_label_addresses: list[int] = []
+        self._global_label_names: list[str] = []
+        self._fixups: list[Fixup] = []
+        self._was_error = False
+
+    def _report_error(self, error: Exception, line: Optional[int], path: Optional[str]) -> None:
+        self._diagnostics.error(error, line, path)
+        self._was_error = True
+
+    def _check_symbol(self, name: str, kind: str, path: Optional[str]) -> bool:
+        if name not in self._symbol_paths:
+            self._symbol_paths[name] = path
+            return True
+        self._report_error(
+            LinkError(
+                f"{kind} '{name}' is already defined in {self._symbol_paths[name]}."
+            ),
+            None,
+            path,
+        )
+        return False
+
+    def add(self, unit: ObjectUnit) -> None:
+        base = len(self.code)
+        global_labels, local_labels, fixups = unit.get_rebased_symbols(base)
+        for name, address in sorted(global_labels.items(), key=lambda item: item[1]):
+            if not self._check_symbol(name, "Global label", unit.path):
+                continue
+            self.global_labels[name] = address
+            if not self._global_label_addresses or self._global_label_addresses[-1] < address:
+                self._global_label_addresses.append(address)
+                self._global_label_names.append(name)
+        for global_label, labels in local_labels.items():
+            self.local_labels.setdefault(global_label, {}).update(labels)
+        for name, value in unit.constants.items():
+            if self._check_symbol(name, "Constant", unit.path):
+                self.constants[name] = value
+        self._fixups += fixups
+        self.units.append((base, unit.path))
+        self.code.extend(unit.get_rebased_code(base))
+
+    def _get_global_label(self, address: int) -> Optional[str]:
+        index = bisect_right(self._global_label_addresses, address) - 1
+        return self._global_label_names[index] if index >= 0 else None
+
+    def link(self) -> Optional["array[int]"]:
+        """Подставляет импортируемые имена, возвращает образ памяти или None при ошибке"""
+        for fixup in self._fixups:
+            value = fixup.symbol
+            if value in self.global_labels:
+                self.code[fixup.index] = self.global_labels[value] & 0xFFFF
+            elif value in self.constants:
+                self.code[fixup.index] = self.constants[value] & 0xFFFF
+            else:
+                scope = fixup.scope or self._get_global_label(fixup.index)
+                local_labels = self.local_labels.get(scope or "", {})
+                if value in local_labels:
+                    self.code[fixup.index] = local_labels[value] & 0xFFFF
+                    continue
+                self._report_error(
+                    UndefinedValueError(
+                        f"Undefined value: '{value}'", column=fixup.column
+                    ),
+                    fixup.line,
+                    fixup.path,
+                )
+        if len(self.code) > RAM_SIZE:
+            self._report_error(
+                LinkError(
+                    f"Program is too large: used {len(self.code) * 100 / RAM_SIZE:.2f}% "
+                    "of available RAM (128 KiB)."
+                ),
+                None,
+                None,
+            )
+        if self._was_error:
+            return None
+        return self.code
+
+    @classmethod
+    def link_units(
+        cls, units: Iterable[ObjectUnit], diagnostics: Optional[Diagnostics] = None
+    ) -> Optional["array[int]"]:
+        linker = cls(diagnostics)
+        for unit in units:
+            linker.add(unit)
+        return linker.link()
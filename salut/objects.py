@@ -0,0 +1,121 @@
+import base64
+import json
+import sys
+from array import array
+from pathlib import Path
+from typing import Optional
+
+from salut.fixups import Fixup
+
+OBJECT_FORMAT = "salut-object"
+OBJECT_FORMAT_VERSION = 2
+
+
+class ObjectUnit:
+    """Перемещаемый машинный код одного файла.
+    Адреса меток и номера слов в fixup-ах отсчитываются от начала его кода"""
+
+    def __init__(
+        self,
+        code: "array[int]",
+        fixups: list[Fixup],
+        global_labels: dict[str, int],
+        local_labels: dict[str, dict[str, int]],
+        constants: dict[str, int],
+        dependencies: list[tuple[str, str]],
+        relocations: Optional["array[int]"] = None,
+        line_map: Optional[tuple["array[int]", "array[int]"]] = None,
+        path: Optional[str] = None,
+        instruction_words: Optional["array[int]"] = None,
+    ) -> None:
+        self.code = code
+        # неразрешённые имена (импортируемые из других файлов)
+        self.fixups = fixups
+        # экспортируемые имена
+        self.global_labels = global_labels  # глобальная: адрес
+        self.local_labels = local_labels  # глобальная: {локальная: адрес}
+        self.constants = constants
+        # включённые в код файлы и хэши их содержимого: (путь, sha256)
+        self.dependencies = dependencies
+        # номера слов, в которых уже записан адрес внутри кода (сдвигаются при размещении)
+        self.relocations: array[int] = array("I") if relocations is None else relocations
+        # номер первого слова инструкции и номер её строки
+        self.line_map: tuple[array[int], array[int]] = (
+            (array("I"), array("I")) if line_map is None else line_map
+        )
+        self.path = path
+        # первые слова инструкций (без .DATA), для оптимизации при включении файла
+        self.instruction_words: array[int] = (
+            array("I") if instruction_words is None else instruction_words
+        )
+
+    def get_rebased_code(self, shift: int) -> "array[int]":
+        """Возвращает код, размещённый с адреса shift (без копирования, если можно)"""
+        if not shift or not self.relocations:
+            return self.code
+        code = array("H", self.code)
+        for index in self.relocations:
+            code[index] = (code[index] + shift) & 0xFFFF
+        return code
+
+    def get_rebased_symbols(
+        self, shift: int
+    ) -> tuple[dict[str, int], dict[str, dict[str, int]], list[Fixup]]:
+        """Возвращает метки и fixup-ы для кода, размещённого с адреса shift"""
+        global_labels = {k: v + shift for k, v in self.global_labels.items()}
+        local_labels = {
+            k1: {k2: v2 + shift for k2, v2 in v1.items()}
+            for k1, v1 in self.local_labels.items()
+        }
+        fixups = [fixup._replace(index=fixup.index + shift) for fixup in self.fixups]
+        return global_labels, local_labels, fixups
+
+    def save(self, path: str | Path) -> None:
+        """Сохраняет объектный файл (JSON, код - 16-битные слова little-endian в base64)"""
+        code = array("H", self.code)
+        if sys.byteorder == "big":
+            code.byteswap()
+        data = {
+            "format": OBJECT_FORMAT,
+            "version": OBJECT_FORMAT_VERSION,
+            "path": self.path,
+            "code": base64.b64encode(code.tobytes()).decode("ascii"),
+            "relocations": self.relocations.tolist(),
+            "imports": [fixup._asdict() for fixup in self.fixups],
+            "global_labels": self.global_labels,
+            "local_labels": self.local_labels,
+            "constants": self.constants,
+            "line_map": [self.line_map[0].tolist(), self.line_map[1].tolist()],
+            "dependencies": self.dependencies,
+            "instruction_words": self.instruction_words.tolist(),
+        }
+        with open(path, "w", encoding="utf-8") as object_file:
+            json.dump(data, object_file)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "ObjectUnit":
+        with open(path, encoding="utf-8") as object_file:
+            data = json.load(object_file)
+        if data.get("format") != OBJECT_FORMAT:
+            raise ValueError(f"{path} is not a SALUT object file")
+        if data.get("version") != OBJECT_FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has object format version {data.get('version')}, "
+                f"expected {OBJECT_FORMAT_VERSION}"
+            )
+        code = array("H")
+        code.frombytes(base64.b64decode(data["code"]))
+        if sys.byteorder == "big":
+            code.byteswap()
+        return cls(
+            code,
+            [Fixup(**fixup) for fixup in data["imports"]],
+            data["global_labels"],
+            data["local_labels"],
+            data["constants"],
+            [tuple(dependency) for dependency in data["dependencies"]],
+            array("I", data["relocations"]),
+            (array("I", data["line_map"][0]), array("I", data["line_map"][1])),
+            data["path"],
+            array("I", data["instruction_words"]),
+        )
@@ -0,0 +1,394 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+from salut.decoder import DECODE_TABLE
+from salut.dispatch import find_instruction
+from salut.fixups import Fixup
+from salut.semantics import (
+    falls_through,
+    get_static_jump,
+    get_value_kinds,
+    get_written_values,
+    is_terminator,
+    writes_interrupt_address,
+)
+from salut.utils import IMMEDIATE, REG, SQUARED_IMMEDIATE, SQUARED_REG, Instruction
+
+MAX_PASSES = 8  # проходы повторяются, пока что-то меняется
+
+# разрешение имени: (значение, является ли адресом метки) или None
+Resolver = Callable[[Fixup], Optional[tuple[int, bool]]]
+# значение в регистре: ("value", число), ("label", адрес метки до оптимизации)
+# или ("register", номер) - то же, что в другом регистре
+Value = tuple[str, int]
+
+# класс немедленного операнда: класс регистра на его месте в короткой форме
+_SHORT_KINDS = {IMMEDIATE: REG, SQUARED_IMMEDIATE: SQUARED_REG}
+
+
+class _Item:
+    """Инструкция собранного кода"""
+
+    def __init__(
+        self, address: int, instruction: Instruction, values: tuple[int, ...]
+    ) -> None:
+        self.address = address
+        self.end = address + instruction.get_word_usage()
+        self.instruction = instruction
+        self.values = values
+        self.target: Optional[int] = None  # адрес перехода по метке
+        self.condition: Optional[str] = None  # условие перехода, "" - безусловный
+        self.removed = False
+        self.short_word: Optional[int] = None  # первое слово короткой формы
+
+
+def _get_short_form(instruction: Instruction) -> Optional[Instruction]:
+    """Однословная инструкция с регистром вместо немедленного значения"""
+    kinds = instruction.operand_kinds
+    if sum(kind in _SHORT_KINDS for kind in kinds) != 1:
+        return None
+    short = find_instruction(
+        instruction.names[0], tuple(_SHORT_KINDS.get(kind, kind) for kind in kinds)
+    )
+    if short is None or short.get_word_usage() != 1:
+        return None
+    return short
+
+
+class Optimizer:
+    """Peephole-оптимизация собранного кода до подстановки имён: убирает переходы
+    на следующую инструкцию и повторную загрузку того же значения в регистр,
+    направляет переходы на JMP сразу к его цели и заменяет немедленное значение
+    регистром, в котором оно уже есть (однословная форма инструкции), а также
+    удаляет недостижимые участки кода. Слова .DATA меняются только вместе
+    с участком, адреса меток и fixup-ы сдвигаются. Адреса в коде должны
+    задаваться метками, а не числами"""
+
+    def __init__(
+        self,
+        machine_code: "array[int]",
+        instruction_addresses: Iterable[int],
+        fixups: list[Fixup],
+        label_addresses: Iterable[int],
+        resolve: Resolver,
+        assumptions: Iterable[tuple[int, int, int | Fixup]] = (),
+    ) -> None:
+        self._code = machine_code
+        self._fixups = {fixup.index: fixup for fixup in fixups}
+        self._resolve = resolve
+        self._label_addresses = set(label_addresses)
+        self._items: list[_Item] = []
+        self._items_by_address: dict[int, _Item] = {}
+        for address in instruction_addresses:
+            instruction = DECODE_TABLE[machine_code[address]]
+            if instruction is None:
+                continue
+            next_word = machine_code[address + 1] if address + 1 < len(machine_code) else 0
+            values = instruction.decode_operands(machine_code[address], next_word)
+            item = _Item(address, instruction, values)
+            item.condition = get_static_jump(instruction)
+            if item.condition is not None:
+                item.target = self._get_label_address(address + 1)
+            self._items.append(item)
+            self._items_by_address[address] = item
+        # .ASSUME: начиная с адреса директивы регистр всегда хранит значение
+        self._assumptions: list[tuple[int, int, Value]] = []
+        for address, register, value in assumptions:
+            if isinstance(value, Fixup):
+                name_value = self._get_name_value(value)
+                if name_value is not None:
+                    self._assumptions.append((address, register, name_value))
+            else:
+                self._assumptions.append((address, register, ("value", value)))
+        # с прерываниями регистры могут измениться между любыми двумя инструкциями
+        self._uses_interrupts = any(
+            writes_interrupt_address(item.instruction) for item in self._items
+        )
+        self.removed_jumps = self.removed_moves = self.threaded_jumps = 0
+        self.shortened = self.removed_regions = 0
+        self.saved_words = self.saved_ticks = 0
+        self._dead_regions: list[tuple[int, int]] = []  # (начало, конец)
+        self._removed = array("I")  # адреса удалённых слов по возрастанию
+
+    def _get_label_address(self, index: int) -> Optional[int]:
+        fixup = self._fixups.get(index)
+        if fixup is None:
+            return None
+        resolved = self._resolve(fixup)
+        if resolved is None or not resolved[1]:
+            return None
+        return resolved[0]
+
+    def _get_name_value(self, fixup: Fixup) -> Optional[Value]:
+        resolved = self._resolve(fixup)
+        if resolved is None:
+            return None
+        # адреса меток ещё сдвинутся, но равные адреса останутся равными
+        return ("label" if resolved[1] else "value", resolved[0] & 0xFFFF)
+
+    def _get_immediate_value(self, item: _Item, index: int) -> Optional[Value]:
+        """Значение немедленного операнда номер index, None для неизвестного имени"""
+        fixup = self._fixups.get(item.address + 1)
+        if fixup is None:
+            return ("value", item.values[index])
+        return self._get_name_value(fixup)
+
+    def _remove(self, item: _Item) -> None:
+        item.removed = True
+        self.saved_words += item.end - item.address
+        self.saved_ticks += item.instruction.ticks
+        self._fixups.pop(item.address + 1, None)
+
+    def _skip_removed(self, address: int) -> int:
+        """Адрес, с которого продолжится выполнение, если перейти на address"""
+        item = self._items_by_address.get(address)
+        while item is not None and item.removed:
+            address = item.end
+            item = self._items_by_address.get(address)
+        return address
+
+    def _thread_jumps(self) -> bool:
+        changed = False
+        for item in self._items:
+            if item.removed or item.target is None:
+                continue
+            # цепочка JMP: переход сразу на адрес последнего
+            visited = {item.address}
+            last_jump = None
+            skipped_ticks = 0
+            target = self._items_by_address.get(self._skip_removed(item.target))
+            while (
+                target is not None
+                and target.condition == ""
+                and target.target is not None
+                and target.address not in visited
+            ):
+                visited.add(target.address)
+                last_jump = target
+                skipped_ticks += target.instruction.ticks
+                target = self._items_by_address.get(self._skip_removed(target.target))
+            if last_jump is None or last_jump.target == item.target:
+                continue
+            fixup = self._fixups[last_jump.address + 1]
+            self._fixups[item.address + 1] = self._fixups[item.address + 1]._replace(
+                symbol=fixup.symbol, scope=fixup.scope
+            )
+            item.target = last_jump.target
+            self.threaded_jumps += 1
+            self.saved_ticks += skipped_ticks
+            changed = True
+        return changed
+
+    def _remove_jumps_to_next(self) -> bool:
+        changed = False
+        for item in reversed(self._items):
+            if item.removed or item.target is None:
+                continue
+            if self._skip_removed(item.target) == self._skip_removed(item.end):
+                self._remove(item)
+                self.removed_jumps += 1
+                changed = True
+        return changed
+
+    def remove_unreachable(
+        self, region_starts: Iterable[int], kept_addresses: Iterable[int] = ()
+    ) -> None:
+        """Удаляет участки от глобальной метки до следующей, в которые нельзя попасть
+        из начала программы (адрес 0): ни по ссылке на метку из достижимого участка,
+        ни продолжив выполнение предыдущего. Участки kept_addresses (.KEEP) остаются"""
+        starts = sorted({0, *region_starts})
+        ends = starts[1:] + [len(self._code)]
+
+        def get_region(address: int) -> int:
+            return bisect_right(starts, address) - 1
+
+        references: list[list[int]] = [[] for _ in starts]
+        for index in self._fixups:
+            target = self._get_label_address(index)
+            if target is not None:
+                references[get_region(index)].append(get_region(target))
+        # участок, который кончается не переходом, продолжается следующим
+        # (участок, который кончается данными, - нет)
+        continues = [start == end for start, end in zip(starts, ends)]
+        for item in self._items:
+            region = get_region(item.address)
+            if item.end == ends[region]:
+                continues[region] = falls_through(item.instruction)
+
+        live = [False] * len(starts)
+        stack = [0, *map(get_region, kept_addresses)]
+        while stack:
+            region = stack.pop()
+            if live[region]:
+                continue
+            live[region] = True
+            stack += references[region]
+            if continues[region] and region + 1 < len(starts):
+                stack.append(region + 1)
+
+        for region, (start, end) in enumerate(zip(starts, ends)):
+            if live[region] or start == end:
+                continue
+            self._dead_regions.append((start, end))
+            self.removed_regions += 1
+            self.saved_words += end - start
+        for start, end in self._dead_regions:
+            for index in [index for index in self._fixups if start <= index < end]:
+                del self._fixups[index]
+            for item in self._items[self._get_item_index(start) : self._get_item_index(end)]:
+                item.removed = True
+
+    def _get_item_index(self, address: int) -> int:
+        return bisect_left(self._items, address, key=lambda item: item.address)
+
+    def _get_assumed(self, address: int) -> dict[int, Value]:
+        return {
+            register: value
+            for assumption_address, register, value in self._assumptions
+            if assumption_address <= address
+        }
+
+    def _forget(self, known: dict[int, Value], register: int, address: int) -> None:
+        """Регистр изменился: забывает его значение (кроме .ASSUME)
+        и значения регистров, которые были ему равны"""
+        if register not in self._get_assumed(address):
+            known.pop(register, None)
+        for other, value in list(known.items()):
+            if value == ("register", register):
+                del known[other]
+
+    def _shorten(self, item: _Item, known: dict[int, Value]) -> None:
+        """Заменяет немедленное значение регистром, в котором оно уже есть"""
+        short = _get_short_form(item.instruction)
+        if short is None:
+            return
+        index = get_value_kinds(item.instruction).index(IMMEDIATE)
+        value = self._get_immediate_value(item, index)
+        register = next((r for r, v in known.items() if v == value), None)
+        if value is None or register is None:
+            return
+        values = list(item.values)
+        values[index] = register
+        self.saved_words += 1
+        self.saved_ticks += item.instruction.ticks - short.ticks
+        self.shortened += 1
+        self._fixups.pop(item.address + 1, None)
+        item.short_word = short.encode_operands(values)[0]
+        item.instruction = short
+        item.values = tuple(values)
+        item.condition = item.target = None
+
+    def _propagate_values(self, shorten: bool = False) -> bool:
+        """Убирает MOV Reg, Imm и MOV Reg, Reg, если в регистре уже это значение,
+        с shorten ещё и выбирает однословные формы. Значения известны только
+        внутри линейного участка кода без меток (а из .ASSUME - везде после неё)"""
+        changed = False
+        known: dict[int, Value] = {}
+        end = None
+        for item in self._items:
+            if item.removed:
+                if item.address == end:
+                    end = item.end
+                continue
+            if (
+                item.address != end
+                or item.address in self._label_addresses
+                or self._uses_interrupts
+            ):
+                known = self._get_assumed(item.address)
+            end = item.end
+            instruction = item.instruction
+            kinds = get_value_kinds(instruction)
+            if instruction.names[0] == "MOV" and kinds in ((REG, IMMEDIATE), (REG, REG)):
+                register = item.values[0]
+                if kinds[1] == REG:
+                    value = known.get(item.values[1], ("register", item.values[1]))
+                else:
+                    value = self._get_immediate_value(item, 1)
+                if value == ("register", register) or (
+                    value is not None and known.get(register) == value
+                ):
+                    self._remove(item)
+                    self.removed_moves += 1
+                    changed = True
+                    continue
+                if shorten:
+                    self._shorten(item, known)
+                self._forget(known, register, item.address)
+                if value is not None:
+                    known[register] = value
+                continue
+            if shorten:
+                self._shorten(item, known)
+            for index in get_written_values(instruction):
+                if kinds[index] == REG:
+                    self._forget(known, item.values[index], item.address)
+            # после условного перехода значения остаются верными
+            if is_terminator(instruction) and not item.condition:
+                known = self._get_assumed(item.address)
+        return changed
+
+    def optimize(self) -> None:
+        for _ in range(MAX_PASSES):
+            changed = self._thread_jumps()
+            changed = self._remove_jumps_to_next() or changed
+            changed = self._propagate_values() or changed
+            if not changed:
+                break
+        # короткие формы выбираются последними: переход по регистру уже не направить
+        self._propagate_values(shorten=True)
+        removed: set[int] = set()
+        for start, end in self._dead_regions:
+            removed.update(range(start, end))
+        for item in self._items:
+            if item.removed:
+                removed.update(range(item.address, item.end))
+            elif item.short_word is not None:
+                removed.add(item.address + 1)
+        self._removed = array("I", sorted(removed))
+
+    def get_address(self, address: int) -> int:
+        """Новый адрес слова (для удалённой инструкции - адрес следующей)"""
+        address = self._skip_removed(address)
+        return address - bisect_left(self._removed, address)
+
+    def get_code(self) -> "array[int]":
+        code = array("H", self._code)
+        for item in self._items:
+            if item.short_word is not None and not item.removed:
+                code[item.address] = item.short_word
+        result = array("H")
+        start = 0
+        for index in self._removed:
+            result.extend(code[start:index])
+            start = index + 1
+        result.extend(code[start:])
+        return result
+
+    def get_fixups(self) -> list[Fixup]:
+        return [
+            fixup._replace(index=self.get_address(fixup.index))
+            for fixup in sorted(self._fixups.values(), key=lambda fixup: fixup.index)
+        ]
+
+    def is_region_removed(self, address: int) -> bool:
+        """Входит ли слово в удалённый недостижимый участок (метки в нём удаляются)"""
+        index = bisect_right(self._dead_regions, address, key=lambda region: region[0]) - 1
+        return index >= 0 and address < self._dead_regions[index][1]
+
+    def is_removed(self, address: int) -> bool:
+        """Удалено ли слово (второе слово короткой формы тоже)"""
+        index = bisect_left(self._removed, address)
+        return index < len(self._removed) and self._removed[index] == address
+
+    def get_report(self) -> str:
+        return (
+            f"Optimizer: removed {self.removed_regions} unreachable labels, "
+            f"{self.removed_jumps} jumps to the next instruction "
+            f"and {self.removed_moves} redundant moves, threaded {self.threaded_jumps} "
+            f"jumps, used one-word forms for {self.shortened} instructions; "
+            f"saved {self.saved_words} words and about {self.saved_ticks} estimated ticks "
+            "(each changed instruction executed once)."
+        )
@@ -0,0 +1,242 @@
+import argparse
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+from salut.decoder import DECODE_TABLE
+from salut.errors import SimulatorError
+from salut.linker import RAM_SIZE, Linker
+from salut.semantics import get_static_jump, is_terminator
+from salut.simulator import Simulator
+
+TICKS_PER_SECOND = 40  # тиков в секунду в игре
+MAX_STATIC_INSTRUCTIONS = 1000  # инструкций в статической оценке одной метки
+NO_LABEL = "<start>"  # код до первой метки
+
+# 1 для первых слов переходов по немедленному адресу (циклы ищутся по ним)
+_JUMP_WORDS = bytes(
+    instruction is not None and get_static_jump(instruction) is not None
+    for instruction in DECODE_TABLE
+)
+
+
+class LabelMap:
+    """Находит метку, к которой относится адрес: ближайшую метку не дальше адреса"""
+
+    def __init__(
+        self, global_labels: dict[str, int], local_labels: dict[str, dict[str, int]]
+    ) -> None:
+        # (адрес, 0 - глобальная или 1 - локальная, глобальная метка, полное имя)
+        labels = [(address, 0, name, name) for name, address in global_labels.items()]
+        for global_label, labels_in_scope in local_labels.items():
+            labels += (
+                (address, 1, global_label, global_label + name)
+                for name, address in labels_in_scope.items()
+            )
+        # на одном адресе с глобальной меткой побеждает локальная
+        labels.sort()
+        self._addresses = [label[0] for label in labels]
+        self._labels = [(label[2], label[3]) for label in labels]
+
+    def __iter__(self) -> Iterator[tuple[int, str]]:
+        return iter(zip(self._addresses, (label[1] for label in self._labels)))
+
+    def get_label(self, address: int) -> tuple[str, str]:
+        """Возвращает глобальную метку и полное имя метки"""
+        index = bisect_right(self._addresses, address) - 1
+        return self._labels[index] if index >= 0 else (NO_LABEL, NO_LABEL)
+
+
+def estimate_straight_line(code: "list[int]", address: int) -> tuple[int, int]:
+    """Статическая оценка: инструкции и тики от address до первого перехода
+    (включительно) или до слова, которое не является инструкцией"""
+    instruction_count = ticks = 0
+    while address < len(code) and instruction_count < MAX_STATIC_INSTRUCTIONS:
+        instruction = DECODE_TABLE[code[address]]
+        if instruction is None:
+            break
+        instruction_count += 1
+        ticks += instruction.ticks
+        if is_terminator(instruction):
+            break
+        address += instruction.get_word_usage()
+    return instruction_count, ticks
+
+
+class ProfilingSimulator(Simulator):
+    """Симулятор, который считает выполненные инструкции и тики по адресам
+    и сколько раз выполнялся каждый переход назад (цикл)"""
+
+    def __init__(self, machine_code: Iterable[int]) -> None:
+        super().__init__(machine_code)
+        self.execution_counts = [0] * RAM_SIZE
+        self.tick_counts = [0] * RAM_SIZE
+        self.back_jumps: dict[tuple[int, int], int] = {}  # (откуда, куда): сколько раз
+
+    def run(self, max_instructions: Optional[int] = None) -> int:
+        decoded = self._decoded
+        decode = self._decode
+        memory = self.memory
+        execution_counts = self.execution_counts
+        tick_counts = self.tick_counts
+        back_jumps = self.back_jumps
+        limit = -1 if max_instructions is None else max_instructions
+        count = ticks = 0
+        try:
+            while count != limit and not self.halted:
+                pc = self.pc
+                word = memory[pc]
+                instruction = decoded[pc] or decode(pc)
+                self.pc = instruction[0]
+                instruction[1]()
+                count += 1
+                ticks += instruction[2]
+                execution_counts[pc] += 1
+                tick_counts[pc] += instruction[2]
+                if self.pc <= pc and _JUMP_WORDS[word]:
+                    key = (pc, self.pc)
+                    back_jumps[key] = back_jumps.get(key, 0) + 1
+        finally:
+            self.instruction_count += count
+            self.ticks += ticks
+        return count
+
+
+def _format_table(rows: list[tuple[str, ...]], header: tuple[str, ...]) -> str:
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    lines = []
+    for row in [header, *rows]:
+        cells = [row[0].ljust(widths[0])] + [
+            cell.rjust(width) for cell, width in zip(row[1:], widths[1:])
+        ]
+        lines.append("  ".join(cells).rstrip())
+    return "\n".join(lines)
+
+
+def get_static_report(code: "list[int]", labels: LabelMap) -> str:
+    rows = []
+    for address, name in labels:
+        instruction_count, ticks = estimate_straight_line(code, address)
+        rows.append((name, str(address), str(instruction_count), str(ticks)))
+    return (
+        "Straight-line code from every label to the first jump (estimated ticks):\n"
+        + _format_table(rows, ("label", "address", "instructions", "ticks"))
+    )
+
+
+def get_dynamic_report(
+    simulator: ProfilingSimulator, labels: LabelMap, top: int
+) -> str:
+    total_ticks = simulator.ticks or 1
+    # глобальная метка: полное имя: [инструкции, тики]
+    groups: dict[str, dict[str, list[int]]] = {}
+    for address, count in enumerate(simulator.execution_counts):
+        if not count:
+            continue
+        global_label, name = labels.get_label(address)
+        row = groups.setdefault(global_label, {}).setdefault(name, [0, 0])
+        row[0] += count
+        row[1] += simulator.tick_counts[address]
+
+    def get_row(name: str, counts: list[int], indent: str) -> tuple[str, ...]:
+        return (
+            indent + name,
+            str(counts[0]),
+            str(counts[1]),
+            f"{counts[1] * 100 / total_ticks:.1f}%",
+        )
+
+    rows = []
+    totals = {
+        global_label: [sum(row[i] for row in group.values()) for i in (0, 1)]
+        for global_label, group in groups.items()
+    }
+    for global_label in sorted(totals, key=lambda k: -totals[k][1])[:top]:
+        rows.append(get_row(global_label, totals[global_label], ""))
+        group = groups[global_label]
+        for name in sorted(group, key=lambda k: -group[k][1]):
+            if name != global_label:
+                rows.append(get_row(name, group[name], "  "))
+
+    loops = []
+    for (source, target), iterations in simulator.back_jumps.items():
+        ticks = sum(simulator.tick_counts[target : source + 1])
+        loops.append((ticks, iterations, source, target))
+    loops.sort(reverse=True)
+    loop_rows = [
+        (
+            labels.get_label(target)[1],
+            f"{target}-{source}",
+            str(iterations),
+            str(ticks),
+            f"{ticks * 100 / total_ticks:.1f}%",
+        )
+        for ticks, iterations, source, target in loops[:top]
+    ]
+    return "\n\n".join(
+        [
+            (
+                f"{simulator.instruction_count} instructions, {simulator.ticks} estimated ticks "
+                f"(about {simulator.ticks / TICKS_PER_SECOND:.1f} s in game)"
+            ),
+            _format_table(rows, ("label", "instructions", "ticks", "share")),
+            "Hot loops:\n"
+            + _format_table(
+                loop_rows, ("loop", "addresses", "iterations", "ticks", "share")
+            ),
+        ]
+    )
+
+
+def load_program(paths: list[str]) -> Optional[Linker]:
+    """Собирает и компонует программы, метки остаются в компоновщике"""
+    from assembler import INCLUDE_CACHE_PATH, load_unit
+    from salut.cache import IncludeCache
+
+    include_cache = IncludeCache(INCLUDE_CACHE_PATH)
+    units = [load_unit(path, include_cache) for path in paths]
+    linker = Linker()
+    for unit in units:
+        if unit is None:
+            return None
+        linker.add(unit)
+    if linker.link() is None:
+        return None
+    return linker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SALUT-2 profiler")
+    parser.add_argument(
+        "paths", nargs="+", help="programs or object files to link and profile"
+    )
+    parser.add_argument(
+        "-n", "--max-instructions", type=int, help="stop after this many instructions"
+    )
+    parser.add_argument(
+        "--static",
+        action="store_true",
+        help="only estimate straight-line code from every label, without running",
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="number of labels and loops to show"
+    )
+    args = parser.parse_args()
+    linker = load_program(args.paths)
+    if linker is None:
+        return
+    code = linker.code.tolist()
+    labels = LabelMap(linker.global_labels, linker.local_labels)
+    if args.static:
+        print(get_static_report(code, labels))
+        return
+    simulator = ProfilingSimulator(code)
+    try:
+        simulator.run(args.max_instructions)
+    except SimulatorError as error:
+        print(f"SimulatorError at PC {simulator.pc}:\n{error}")
+    print(get_dynamic_report(simulator, labels, args.top))
+
+
+if __name__ == "__main__":
+    main()
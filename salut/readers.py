@@ -0,0 +1,83 @@
+import json
+import sys
+from array import array
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal, Optional
+
+
+def read_binary(
+    path: str | Path, byteorder: Literal["little", "big"] = "little"
+) -> "array[int]":
+    data = Path(path).read_bytes()
+    if len(data) % 2:
+        raise ValueError(f"{path} has an odd number of bytes, expected 16-bit words")
+    machine_code = array("H")
+    machine_code.frombytes(data)
+    if byteorder != sys.byteorder:
+        machine_code.byteswap()
+    return machine_code
+
+
+def read_intel_hex(
+    path: str | Path, byteorder: Literal["little", "big"] = "little"
+) -> "array[int]":
+    """Читает Intel HEX, записанный write_intel_hex (слово N - по адресу 2N)"""
+    data = bytearray()
+    base_address = 0
+    with open(path, encoding="ascii") as hex_file:
+        for line_number, line in enumerate(hex_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                if line[0] != ":":
+                    raise ValueError
+                record = bytes.fromhex(line[1:])
+                if len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(
+                    f"Invalid Intel HEX record on line {line_number} of {path}"
+                ) from None
+            address = base_address + (record[1] << 8 | record[2])
+            record_type, record_data = record[3], record[4:-1]
+            if record_type == 0:
+                if len(data) < address:
+                    data += bytes(address - len(data))
+                data[address : address + len(record_data)] = record_data
+            elif record_type == 1:
+                break
+            elif record_type == 4:
+                base_address = int.from_bytes(record_data, "big") << 16
+    if len(data) % 2:
+        data.append(0)
+    machine_code = array("H")
+    machine_code.frombytes(bytes(data))
+    if byteorder != sys.byteorder:
+        machine_code.byteswap()
+    return machine_code
+
+
+def read_memory_block_data(path: str | Path) -> "array[int]":
+    """Массив data из файла блока памяти"""
+    with open(path, encoding="utf-8") as memory_block_data_file:
+        return array("H", (word & 0xFFFF for word in json.load(memory_block_data_file)["data"]))
+
+
+# формат (как в salut.writers.WRITERS): функция чтения
+READERS: dict[str, Callable[[str | Path], "array[int]"]] = {
+    "json": read_memory_block_data,
+    "bin": read_binary,
+    "bin-be": lambda path: read_binary(path, "big"),
+    "hex": read_intel_hex,
+}
+# расширение файла: формат по умолчанию
+FORMATS_BY_SUFFIX = {".json": "json", ".bin": "bin", ".hex": "hex"}
+
+
+def read_image(path: str | Path, image_format: Optional[str] = None) -> "array[int]":
+    """Читает образ памяти, формат по умолчанию определяется по расширению"""
+    if image_format is None:
+        image_format = FORMATS_BY_SUFFIX.get(Path(path).suffix.lower(), "bin")
+    return READERS[image_format](path)
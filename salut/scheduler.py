@@ -0,0 +1,95 @@
+from bisect import insort
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from salut.devices import JOYSTICK_BUTTONS
+from salut.utils import INSTRUCTIONS
+
+if TYPE_CHECKING:
+    from salut.simulator import Simulator
+
+# самая долгая инструкция: за столько инструкций время точно не уйдёт дальше нужного
+MAX_INSTRUCTION_TICKS = max(instruction.ticks for instruction in INSTRUCTIONS)
+
+
+class InputEvent(NamedTuple):
+    tick: int
+    port: int
+    value: int
+
+
+class InputTrace:
+    """Запись ввода. В файле каждая строчка - "тик порт значение", значение - число
+    или кнопка джойстика (left, up, down, right, click), после ';' - комментарий"""
+
+    def __init__(self, events: Optional[Iterable[tuple[int, int, int]]] = None) -> None:
+        self.events: list[InputEvent] = sorted(InputEvent(*event) for event in events or [])
+
+    def add(self, tick: int, port: int, value: int) -> None:
+        insort(self.events, InputEvent(tick, port, value))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "InputTrace":
+        events = []
+        with open(path, encoding="utf-8") as trace_file:
+            for line_number, line in enumerate(trace_file, 1):
+                line = line.split(";", 1)[0].strip()
+                if not line:
+                    continue
+                try:
+                    tick, port, value = line.split()
+                    events.append(
+                        InputEvent(
+                            int(tick),
+                            int(port),
+                            JOYSTICK_BUTTONS[value.lower()]
+                            if value.lower() in JOYSTICK_BUTTONS
+                            else int(value, 0),
+                        )
+                    )
+                except ValueError:
+                    raise ValueError(
+                        f"Invalid input event on line {line_number} of {path}: {line!r}"
+                    ) from None
+        return cls(events)
+
+    def save(self, path: str | Path) -> None:
+        lines = ["; tick port value\n"]
+        lines += (f"{event.tick} {event.port} {event.value}\n" for event in self.events)
+        Path(path).write_text("".join(lines), encoding="utf-8")
+
+
+class Scheduler:
+    """Подаёт ввод из записи на порты симулятора, когда время выполнения
+    доходит до тика события. Ввод подаётся между инструкциями, поэтому
+    при одинаковой программе запись воспроизводится одинаково"""
+
+    def __init__(self, simulator: "Simulator", trace: InputTrace) -> None:
+        self.simulator = simulator
+        self.trace = trace
+        self._next_event = 0
+
+    def run_until(self, tick: int) -> None:
+        """Выполняет программу, пока время не дойдёт до tick или до STOP"""
+        simulator = self.simulator
+        while simulator.ticks < tick and not simulator.halted:
+            simulator.run(max(1, (tick - simulator.ticks) // MAX_INSTRUCTION_TICKS))
+
+    def run(self, max_ticks: Optional[int] = None) -> None:
+        """Выполняет программу с вводом из записи до STOP или до max_ticks"""
+        simulator = self.simulator
+        events = self.trace.events
+        while self._next_event < len(events) and not simulator.halted:
+            event = events[self._next_event]
+            if max_ticks is not None and event.tick > max_ticks:
+                break
+            self.run_until(event.tick)
+            if simulator.halted:
+                break
+            simulator.input(event.port, event.value)
+            self._next_event += 1
+        if max_ticks is None:
+            simulator.run()
+        else:
+            self.run_until(max_ticks)
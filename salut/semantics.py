@@ -0,0 +1,287 @@
+import re
+from collections.abc import Callable, Mapping, Sequence
+from typing import Optional
+
+from salut.utils import (
+    FLAG,
+    IMMEDIATE,
+    PORT,
+    REG,
+    SQUARED_IMMEDIATE,
+    SQUARED_REG,
+    SQUARED_SUM_REG,
+    Instruction,
+)
+
+# Что делает каждая инструкция, в виде кода на Python.
+# {0}, {1}, ... - значения операндов (Instruction.decode_operands), регистр
+# подставляется как выражение с его значением, флаг - как выражение с флагом.
+# {N}, {Z}, {C}, {V}, {SL} - флаги, {SP} - указатель стека,
+# {PC} - адрес следующей инструкции, s - симулятор, M - память (список слов).
+# "{jump} адрес" - переход, "{halt}" - остановка процессора,
+# "{interrupt}" - проверка прерывания после изменения IM.
+# Запись в память пишется как "M[адрес] = значение" в отдельной строчке.
+# x, y, q, m, k - временные переменные.
+
+_RESULT_FLAGS = "{N} = x >> 15\n{Z} = x == 0"
+_SET_PS = "{N} = x & 1\n{Z} = x >> 1 & 1\n{C} = x >> 2 & 1\n{V} = x >> 3 & 1"
+_GET_PS = "{N} | {Z} << 1 | {C} << 2 | {V} << 3"
+_POP = "x = M[{SP}]\n{SP} = ({SP} + 1) & 0xFFFF"
+_PUSH = "{SP} = ({SP} - 1) & 0xFFFF\nM[{SP}] = x"
+_CALL = "x = {0}\n{SP} = ({SP} - 1) & 0xFFFF\nM[{SP}] = {PC}\n{jump} x"
+_ADD = (
+    "{C} = x >> 16\n"
+    "x &= 0xFFFF\n"
+    "{V} = (({1} ^ x) & ({2} ^ x)) >> 15\n"
+    "{0} = x\n" + _RESULT_FLAGS
+)
+
+
+def _get_subtract_flags(minuend: str, subtrahend: str) -> str:
+    # флаг C при вычитании - отсутствие заёма
+    return (
+        "{C} = x >= 0\n"
+        "x &= 0xFFFF\n"
+        f"{{V}} = (({minuend} ^ {subtrahend}) & ({minuend} ^ x)) >> 15\n"
+    )
+
+
+_SUB = _get_subtract_flags("{1}", "{2}") + "{0} = x\n" + _RESULT_FLAGS + "\n{SL} = {N} ^ {V}"
+_CMP = _get_subtract_flags("{0}", "{1}") + _RESULT_FLAGS + "\n{SL} = {N} ^ {V}"
+_LOGIC = "{0} = x\n" + _RESULT_FLAGS
+_DIVIDE = (
+    "if y:\n"
+    "    q, m = divmod(x, y)\n"
+    "    {V} = 0\n"
+    "else:\n"  # деление на ноль
+    "    q, m = 0xFFFF, x\n"
+    "    {V} = 1\n"
+    "{C} = m != 0\n"
+)
+
+_JUMP_CONDITIONS = {
+    "JS": "{N}",
+    "JNS": "not {N}",
+    "JE": "{Z}",
+    "JNE": "not {Z}",
+    "JC": "{C}",
+    "JNC": "not {C}",
+    "JO": "{V}",
+    "JNO": "not {V}",
+    "JL": "{SL}",
+    "JGE": "not {SL}",
+    "JA": "{C} and not {Z}",
+    "JBE": "not {C} or {Z}",
+    "JG": "not {SL} and not {Z}",
+    "JLE": "{SL} or {Z}",
+}
+_LOGIC_OPERATIONS = {
+    "AND": "x = {1} & {2}",
+    "OR": "x = {1} | {2}",
+    "XOR": "x = {1} ^ {2}",
+    "NAND": "x = ({1} & {2}) ^ 0xFFFF",
+    "NOR": "x = ({1} | {2}) ^ 0xFFFF",
+    "XNOR": "x = {1} ^ {2} ^ 0xFFFF",
+}
+_SHIFT_OPERATIONS = {
+    "SHL": "x = {1} << {2}\n{C} = x > 0xFFFF\nx &= 0xFFFF",
+    "SHR": "x = {1}\n{C} = (x & ((1 << {2}) - 1)) != 0\nx >>= {2}",
+    "ROL": (
+        "k = {2} & 15\n"
+        "y = {1}\n"
+        "{C} = (y >> (16 - k)) != 0\n"
+        "x = (y << k | y >> (16 - k)) & 0xFFFF"
+    ),
+    "ROR": (
+        "k = {2} & 15\n"
+        "y = {1}\n"
+        "{C} = (y & ((1 << k) - 1)) != 0\n"
+        "x = (y >> k | y << (16 - k)) & 0xFFFF"
+    ),
+}
+
+_IMM, _SQUARED_IMM = (IMMEDIATE,), (SQUARED_IMMEDIATE,)
+_R, _SQUARED_R, _SQUARED_SUM_R = (REG,), (SQUARED_REG,), (SQUARED_SUM_REG,)
+_F, _P = (FLAG,), (PORT,)
+
+# (мнемоника, классы операндов): код инструкции
+SEMANTICS: dict[tuple[str, tuple[str, ...]], str] = {
+    ("NOP", ()): "pass",
+    ("STOP", ()): "{halt}",
+    ("RET", ()): _POP + "\n{jump} x",
+    ("POP", ("PC",)): _POP + "\n{jump} x",
+    ("CALL", _IMM): _CALL,
+    ("CALL", _R): _CALL,
+    ("CALL", ("IA",)): _CALL.replace("{0}", "s.ia"),
+    ("JMP", _IMM): "{jump} {0}",
+    ("JMP", _R): "{jump} {0}",
+    ("MOV", ("PC",) + _IMM): "{jump} {0}",
+    ("MOV", ("IM",) + _IMM): "s.im = {0} & 0xF\n{interrupt}",
+    ("MOV", ("IM",) + _R): "s.im = {0} & 0xF\n{interrupt}",
+    ("MOV", ("IA",) + _IMM): "s.ia = {0}",
+    ("MOV", ("IA",) + _R): "s.ia = {0}",
+    ("MOV", ("PS",) + _IMM): "x = {0}\n" + _SET_PS + "\n{SL} = {N} ^ {V}",
+    ("MOV", ("PS",) + _R): "x = {0}\n" + _SET_PS + "\n{SL} = {N} ^ {V}",
+    ("MOV", _F + _IMM): "{0} = {1} & 1\n{SL} = {N} ^ {V}",
+    ("MOV", _F + _R): "{0} = {1} & 1\n{SL} = {N} ^ {V}",
+    ("MOV", _R + ("PC",)): "{0} = {PC}",
+    ("MOV", _R + ("SP",)): "{0} = {SP}",
+    ("MOV", _R + ("IM",)): "{0} = s.im",
+    ("MOV", _R + ("IA",)): "{0} = s.ia",
+    ("MOV", _R + ("PS",)): "{0} = " + _GET_PS,
+    ("MOV", _R + _F): "{0} = {1} & 1",
+    ("MOV", _R + _IMM): "{0} = {1}",
+    ("MOV", _R + _R): "{0} = {1}",
+    ("SWAP", _R + _R): "{0}, {1} = {1}, {0}",
+    ("DROP", ()): "{SP} = ({SP} + 1) & 0xFFFF",
+    ("PUSH", ("PC",)): "x = {PC}\n" + _PUSH,
+    ("PUSH", ("SP",)): "x = {SP}\n" + _PUSH,
+    ("PUSH", ("IM",)): "x = s.im\n" + _PUSH,
+    ("PUSH", ("IA",)): "x = s.ia\n" + _PUSH,
+    # вместе с PS в стек попадает флаг SL (пятый бит)
+    ("PUSH", ("PS",)): "x = " + _GET_PS + " | {SL} << 4\n" + _PUSH,
+    ("PUSH", _R): "x = {0}\n" + _PUSH,
+    ("POP", ("IM",)): _POP + "\ns.im = x & 0xF\n{interrupt}",
+    ("POP", ("IA",)): _POP + "\ns.ia = x",
+    ("POP", ("PS",)): _POP + "\n" + _SET_PS + "\n{SL} = x >> 4 & 1",
+    ("POP", _R): _POP + "\n{0} = x",
+    ("PEEK", ("PC",)): "{jump} M[{SP}]",
+    ("PEEK", ("IM",)): "s.im = M[{SP}] & 0xF\n{interrupt}",
+    ("PEEK", ("IA",)): "s.ia = M[{SP}]",
+    ("PEEK", ("PS",)): "x = M[{SP}]\n" + _SET_PS + "\n{SL} = x >> 4 & 1",
+    ("PEEK", _R): "{0} = M[{SP}]",
+    ("RND", ()): "x = s.next_random()\n{N} = x >> 15",
+    ("RND", _R): "x = s.next_random()\n{0} = x\n{N} = x >> 15",
+    ("SL", ()): "{SL} = {N} ^ {V}",
+    ("MSB", _R): "{N} = {0} >> 15",
+    ("LSB", _R): "{N} = {0} & 1",
+    ("IN", _R + _P): "{0} = s.in_ports[{1}]",
+    ("OUT", _P + _IMM): "s.out_handlers[{0}]({1})",
+    ("OUT", _P + _R): "s.out_handlers[{0}]({1})",
+    ("LDR", _R + _SQUARED_IMM): "{0} = M[{1}]",
+    ("LDR", _R + _SQUARED_R): "{0} = M[{1}]",
+    ("LDR", _R + _SQUARED_SUM_R): "{0} = M[({1} + {2}) & 0xFFFF]",
+    ("STR", _SQUARED_R + _IMM): "M[{0}] = {1}",
+    ("STR", _SQUARED_IMM + _R): "M[{0}] = {1}",
+    ("STR", _SQUARED_R + _R): "M[{0}] = {1}",
+    ("STR", _SQUARED_SUM_R + _R): "M[({0} + {1}) & 0xFFFF] = {2}",
+    ("INC", _R + _R): "x = ({1} + 1) & 0xFFFF\n{V} = ({1} ^ x) >> 15\n{0} = x\n"
+    + _RESULT_FLAGS,
+    ("DEC", _R + _R): "x = ({1} - 1) & 0xFFFF\n{V} = ({1} ^ x) >> 15\n{0} = x\n"
+    + _RESULT_FLAGS,
+    ("NOT", _R + _R): "x = {1} ^ 0xFFFF\n" + _LOGIC,
+    # V - отрицательное число осталось отрицательным (-32768)
+    ("NEG", _R + _R): "x = -{1} & 0xFFFF\n{V} = ({1} & x) >> 15\n" + _LOGIC,
+    ("ABS", _R + _R): "x = {1}\nif x >> 15:\n    x = -x & 0xFFFF\n"
+    + _LOGIC
+    + "\n{V} = {N}",
+    ("CMP", _R + _R): "x = {0} - {1}\n" + _CMP,
+    ("CMP", _R + _IMM): "x = {0} - {1}\n" + _CMP,
+    ("CMP", _IMM + _R): "x = {0} - {1}\n" + _CMP,
+    ("DIV", _R + _R + _R + _R): "x, y = {2}, {3}\n"
+    + _DIVIDE
+    + "{0} = q\n{1} = m\n{N} = q >> 15\n{Z} = q == 0",
+    ("REM", _R + _R + _R): "x, y = {1}, {2}\n"
+    + _DIVIDE
+    + "{0} = m\n{N} = m >> 15\n{Z} = m == 0",
+}
+for _name, _condition in _JUMP_CONDITIONS.items():
+    for _operand in (_IMM, _R):
+        SEMANTICS[(_name, _operand)] = f"if {_condition}:\n    {{jump}} {{0}}"
+for _operands in (_R + _R + _R, _R + _R + _IMM, _R + _IMM + _R):
+    SEMANTICS[("ADD", _operands)] = "x = {1} + {2}\n" + _ADD
+    SEMANTICS[("ADC", _operands)] = "x = {1} + {2} + {C}\n" + _ADD
+    SEMANTICS[("SUB", _operands)] = "x = {1} - {2}\n" + _SUB
+    SEMANTICS[("SBC", _operands)] = "x = {1} - {2} - {C}\n" + _SUB
+    SEMANTICS[("MUL", _operands)] = (
+        "x = {1} * {2}\n{C} = x > 0xFFFF\nx &= 0xFFFF\n" + _LOGIC
+    )
+    SEMANTICS[("DIV", _operands)] = (
+        "x, y = {1}, {2}\n" + _DIVIDE + "{0} = q\n{N} = q >> 15\n{Z} = q == 0"
+    )
+    for _name, _operation in _LOGIC_OPERATIONS.items():
+        SEMANTICS[(_name, _operands)] = _operation + "\n" + _LOGIC
+    for _name, _operation in _SHIFT_OPERATIONS.items():
+        SEMANTICS[(_name, _operands)] = _operation + "\n" + _LOGIC
+
+_STORE = re.compile(r"^(\s*)M\[(.*)\] = (.*)$")
+_STATIC_JUMP = re.compile(r"^(?:if (.*):\n    )?\{jump\} \{0\}$")
+_ASSIGNMENT = re.compile(r"^\s*([^=\s][^=]*?) = ")
+_VALUE = re.compile(r"\{(\d+)\}")
+
+
+def get_semantics(instruction: Instruction) -> str:
+    return SEMANTICS[(instruction.names[0], instruction.operand_kinds)]
+
+
+def get_value_kinds(instruction: Instruction) -> tuple[str, ...]:
+    """Классы значений, которые возвращает decode_operands (без специальных регистров)"""
+    kinds: list[str] = []
+    for kind in instruction.operand_kinds:
+        if kind in (REG, SQUARED_REG):
+            kinds.append(REG)
+        elif kind == SQUARED_SUM_REG:
+            kinds += [REG, REG]
+        elif kind in (IMMEDIATE, SQUARED_IMMEDIATE, FLAG, PORT):
+            kinds.append(kind if kind != SQUARED_IMMEDIATE else IMMEDIATE)
+    return tuple(kinds)
+
+
+def is_terminator(instruction: Instruction) -> bool:
+    """Может ли инструкция изменить PC (в том числе прерыванием) или остановить процессор"""
+    semantics = get_semantics(instruction)
+    return any(name in semantics for name in ("{jump}", "{halt}", "{interrupt}"))
+
+
+def falls_through(instruction: Instruction) -> bool:
+    """Может ли после инструкции выполниться следующая за ней (после CALL - при возврате)"""
+    semantics = get_semantics(instruction)
+    if "{halt}" in semantics:
+        return False
+    jumps = any(line.startswith("{jump}") for line in semantics.splitlines())
+    return not jumps or "M[{SP}] = {PC}" in semantics
+
+
+def get_static_jump(instruction: Instruction) -> Optional[str]:
+    """Условие перехода, если инструкция переходит по немедленному адресу
+    ("" для безусловного перехода), иначе None"""
+    if get_value_kinds(instruction) != (IMMEDIATE,):
+        return None
+    match = _STATIC_JUMP.match(get_semantics(instruction))
+    return None if match is None else match.group(1) or ""
+
+
+def get_written_values(instruction: Instruction) -> set[int]:
+    """Номера значений decode_operands, в которые инструкция записывает"""
+    written = set()
+    for line in get_semantics(instruction).splitlines():
+        match = _ASSIGNMENT.match(line)
+        if match is not None and not match.group(1).startswith("M["):
+            written.update(int(value) for value in _VALUE.findall(match.group(1)))
+    return written
+
+
+def writes_interrupt_address(instruction: Instruction) -> bool:
+    """Меняет ли инструкция адрес обработчика прерывания (регистр IA)"""
+    return any(
+        match is not None and match.group(1) == "s.ia"
+        for match in map(_ASSIGNMENT.match, get_semantics(instruction).splitlines())
+    )
+
+
+def render(
+    semantics: str,
+    operands: Sequence[str],
+    state: Mapping[str, str],
+    store: Callable[[str, str, str], list[str]],
+) -> list[str]:
+    """Подставляет выражения операндов и состояния процессора в код инструкции.
+    store(отступ, адрес, значение) возвращает строчки записи в память"""
+    lines = []
+    for line in semantics.format(*operands, **state).splitlines():
+        match = _STORE.match(line)
+        if match is None:
+            lines.append(line)
+        else:
+            lines += store(*match.groups())
+    return lines
@@ -0,0 +1,159 @@
+import argparse
+import io
+import json
+import socketserver
+import sys
+from time import perf_counter
+from typing import Any, Optional, TextIO
+
+from assembler import STDIN_PATH, Assembler, LineCache, open_program
+from salut.cache import MemoryIncludeCache
+from salut.diagnostics import Diagnostics
+from salut.writers import WRITERS, write_output
+
+MAX_CACHED_LINES = 1_000_000  # больше строк - кэш строк очищается
+
+
+class AssemblerServer:
+    """
+    Собирает программы по запросам, сохраняя между ними разобранные строки
+    и собранные включаемые файлы. После правки одной строки заново разбирается
+    только она, остальные строки берутся из кэша, имена подставляются заново
+    """
+
+    def __init__(self) -> None:
+        self._line_cache: LineCache = {}
+        self._include_cache = MemoryIncludeCache()
+
+    def assemble(
+        self,
+        path: str,
+        text: Optional[str] = None,
+        output: Optional[str] = None,
+        output_format: str = "json",
+        optimize: bool = False,
+    ) -> dict[str, Any]:
+        """Собирает path (или text - несохранённый текст этого файла),
+        при успехе записывает образ памяти в output"""
+        start = perf_counter()
+        if len(self._line_cache) > MAX_CACHED_LINES:
+            self._line_cache.clear()
+        diagnostics = Diagnostics(echo=False)
+        if text is not None:
+            machine_code = Assembler.assemble(
+                text.splitlines(),
+                path,
+                self._include_cache,
+                optimize=optimize,
+                diagnostics=diagnostics,
+                line_cache=self._line_cache,
+            )
+        else:
+            with open_program(path) as program_file:
+                machine_code = Assembler.assemble(
+                    program_file,
+                    path,
+                    self._include_cache,
+                    optimize=optimize,
+                    diagnostics=diagnostics,
+                    line_cache=self._line_cache,
+                )
+        written = False
+        if machine_code is not None and output is not None:
+            written = write_output(machine_code, output, output_format, None)
+        return {
+            "ok": machine_code is not None,
+            "words": None if machine_code is None else len(machine_code),
+            "written": written,
+            "diagnostics": [item._asdict() for item in diagnostics.items],
+            "time": perf_counter() - start,
+        }
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        method = request.get("method", "assemble")
+        if method == "assemble":
+            path = request["path"]
+            if not isinstance(path, str):
+                raise TypeError(f"path must be a string, not {type(path).__name__}")
+            for key in ("text", "output", "format"):
+                if request.get(key) is not None and not isinstance(request[key], str):
+                    raise TypeError(
+                        f"{key} must be a string, not {type(request[key]).__name__}"
+                    )
+            # стандартный ввод сервера - это его запросы
+            if path == STDIN_PATH and request.get("text") is None:
+                raise ValueError(f"path '{STDIN_PATH}' requires text")
+            output = request.get("output")
+            output_format = request.get("format", "json")
+            if output_format not in WRITERS:
+                raise ValueError(f"Unknown format: {output_format}")
+            if output is None and request.get("write"):
+                from memory_block_data_path import get_memory_block_data_path
+
+                output = get_memory_block_data_path()
+            return self.assemble(
+                path,
+                request.get("text"),
+                output,
+                output_format,
+                bool(request.get("optimize")),
+            )
+        if method == "status":
+            return {"ok": True, "cached_lines": len(self._line_cache)}
+        if method == "clear":
+            self._line_cache.clear()
+            self._include_cache = MemoryIncludeCache()
+            return {"ok": True}
+        raise ValueError(f"Unknown method: {method}")
+
+    def serve(self, requests: TextIO, responses: TextIO) -> None:
+        """Один JSON-запрос на строку, на каждый - одна строка ответа с тем же id.
+        Запрос {"method": "shutdown"} завершает работу"""
+        for line in requests:
+            if not line.strip():
+                continue
+            request: Any = None
+            try:
+                request = json.loads(line)
+                if request.get("method") == "shutdown":
+                    responses.write(json.dumps({"id": request.get("id"), "ok": True}) + "\n")
+                    responses.flush()
+                    return
+                response = self.handle(request)
+            except (OSError, ValueError, KeyError, AttributeError, TypeError) as error:
+                response = {"ok": False, "error": f"{error.__class__.__name__}: {error}"}
+            if isinstance(request, dict):
+                response["id"] = request.get("id")
+            responses.write(json.dumps(response) + "\n")
+            responses.flush()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="SALUT-2 assembler server: JSON requests, one per line"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="listen on this localhost TCP port instead of standard input and output",
+    )
+    args = parser.parse_args()
+    server = AssemblerServer()
+    if args.port is None:
+        server.serve(sys.stdin, sys.stdout)
+        return
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            # shutdown закрывает только это соединение
+            server.serve(
+                io.TextIOWrapper(self.rfile, encoding="utf-8"),
+                io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True),
+            )
+
+    with socketserver.TCPServer(("127.0.0.1", args.port), Handler) as tcp_server:
+        tcp_server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,588 @@
+import argparse
+import re
+import sys
+import time
+from array import array
+from collections.abc import Callable, Iterable
+from functools import partial
+from pathlib import Path
+from typing import Optional, cast
+
+from salut.decoder import DECODE_TABLE
+from salut.devices import Screen
+from salut.errors import SimulatorError
+from salut.linker import RAM_SIZE
+from salut.readers import FORMATS_BY_SUFFIX, read_image
+from salut.scheduler import InputTrace, Scheduler
+from salut.semantics import (
+    get_semantics,
+    get_static_jump,
+    get_value_kinds,
+    is_terminator,
+    render,
+)
+from salut.utils import FLAG, IMMEDIATE, INSTRUCTIONS, PORT, REG, Instruction
+
+PORT_COUNT = 4
+RANDOM_SEED = 0xACE1
+
+FLAG_ATTRIBUTES = ("n", "z", "c", "v")  # F0-F3
+# прерывание выполняется как инструкция CALL IA
+INTERRUPT_TICKS = next(
+    instruction.ticks
+    for instruction in INSTRUCTIONS
+    if instruction.names[0] == "CALL" and instruction.operand_kinds == ("IA",)
+)
+
+# состояние процессора в коде обработчиков (см. salut.semantics)
+_HANDLER_STATE = {
+    "N": "s.n",
+    "Z": "s.z",
+    "C": "s.c",
+    "V": "s.v",
+    "SL": "s.sl",
+    "SP": "s.sp",
+    "PC": "s.pc",  # к началу выполнения PC уже указывает на следующую инструкцию
+    "jump": "s.pc =",
+    "halt": "s.halted = True",
+    "interrupt": "s.check_interrupt()",
+}
+
+
+def _store_and_invalidate(indent: str, address: str, value: str) -> list[str]:
+    return [
+        f"{indent}a = {address}",
+        f"{indent}M[a] = {value}",
+        f"{indent}if K[a]:",
+        f"{indent}    s.invalidate(a)",
+    ]
+
+
+# (инструкция, значения флагов и портов): функция, создающая обработчик
+_handler_factories: dict[tuple[Instruction, tuple[int, ...]], Callable[..., Callable]] = {}
+
+
+def _get_handler_factory(
+    instruction: Instruction, static_values: tuple[int, ...]
+) -> Callable[..., Callable]:
+    """Компилирует обработчик инструкции. Регистры и немедленные значения передаются
+    обработчику аргументами, флаги и порты подставляются в код"""
+    key = (instruction, static_values)
+    factory = _handler_factories.get(key)
+    if factory is not None:
+        return factory
+    static = iter(static_values)
+    operands = []
+    parameters = []
+    for i, kind in enumerate(get_value_kinds(instruction)):
+        if kind == REG:
+            operands.append(f"R[o{i}]")
+            parameters.append(f"o{i}")
+        elif kind == IMMEDIATE:
+            operands.append(f"o{i}")
+            parameters.append(f"o{i}")
+        elif kind == FLAG:
+            operands.append(f"s.{FLAG_ATTRIBUTES[next(static)]}")
+        elif kind == PORT:
+            operands.append(str(next(static)))
+    body = render(
+        get_semantics(instruction), operands, _HANDLER_STATE, _store_and_invalidate
+    )
+    source = "\n".join(
+        [
+            "def make_handler(s, R, M, K):",
+            f"    def handler({', '.join(parameters)}):",
+            *(f"        {line}" for line in body),
+            "    return handler",
+        ]
+    )
+    namespace: dict[str, object] = {}
+    # код собран только из шаблонов SEMANTICS и чисел, декодированных из слов памяти,
+    # текст программы в него не попадает
+    exec(compile(source, f"<{instruction.names[0]}>", "exec"), namespace)
+    factory = _handler_factories[key] = namespace["make_handler"]  # type: ignore[assignment]
+    return factory
+
+
+def _ignore_output(value: int) -> None:
+    pass
+
+
+class Simulator:
+    """Симулятор SALUT-2. Каждое слово памяти при первом выполнении декодируется
+    в обработчик с операндами, запись в это слово сбрасывает декодированную инструкцию"""
+
+    def __init__(self, machine_code: Iterable[int], random_seed: int = RANDOM_SEED) -> None:
+        self.memory: list[int] = list(machine_code)
+        if len(self.memory) > RAM_SIZE:
+            raise SimulatorError("Program doesn't fit in RAM")
+        self.memory += [0] * (RAM_SIZE - len(self.memory))
+        self.registers: list[int] = [0] * 16
+        self.pc = 0
+        self.sp = 0  # 0 - стек пуст, первое значение записывается в конец памяти
+        self.im = 0
+        self.ia = 0
+        self.n = self.z = self.c = self.v = self.sl = 0
+        self.halted = False
+        self.instruction_count = 0
+        self.ticks = 0  # время выполнения в тиках игры по оценкам из INSTRUCTIONS
+        self.random_state = random_seed & 0xFFFF or RANDOM_SEED
+        # значения входных портов и обработчики выходных (по умолчанию вывод никуда не идёт)
+        self.in_ports: list[int] = [0] * PORT_COUNT
+        self.out_handlers: list[Callable[[int], None]] = [_ignore_output] * PORT_COUNT
+        self.signals = 0  # сигнальные биты входных портов
+
+        # адрес: (адрес следующей инструкции, обработчик с операндами, тики)
+        self._decoded: list[Optional[tuple[int, Callable[[], None], int]]] = [None] * RAM_SIZE
+        # 1 для слов, из которых декодирована хотя бы одна инструкция
+        self._code_words = bytearray(RAM_SIZE)
+        self._handlers: dict[tuple[Instruction, tuple[int, ...]], Callable] = {}
+
+    @property
+    def ps(self) -> int:
+        return self.n | self.z << 1 | self.c << 2 | self.v << 3 | self.sl << 4
+
+    def next_random(self) -> int:
+        """Следующее значение 16-битного РСЛОС Фибоначчи (отводы 16, 14, 13, 11)"""
+        state = self.random_state
+        bit = (state ^ state >> 2 ^ state >> 3 ^ state >> 5) & 1
+        self.random_state = state >> 1 | bit << 15
+        return self.random_state
+
+    def input(self, port: int, value: int) -> None:
+        """Значение на входном порту: порт запоминает его и включает свой сигнальный бит"""
+        self.in_ports[port] = value & 0xFFFF
+        self.signals |= 1 << port
+        self.check_interrupt()
+
+    def check_interrupt(self) -> None:
+        """Если сигнал пришёл на порт, отмеченный в IM, сбрасывает сигнальные биты
+        всех портов и выполняет CALL IA"""
+        if not self.signals & self.im:
+            return
+        self.signals = 0
+        self.sp = (self.sp - 1) & 0xFFFF
+        self.memory[self.sp] = self.pc
+        if self._code_words[self.sp]:
+            self.invalidate(self.sp)
+        self.pc = self.ia
+        self.instruction_count += 1
+        self.ticks += INTERRUPT_TICKS
+
+    def invalidate(self, address: int) -> None:
+        """Сбрасывает инструкции, в которые входит слово address"""
+        self._decoded[address] = None
+        self._decoded[(address - 1) & 0xFFFF] = None
+
+    def _get_handler(self, instruction: Instruction, values: tuple[int, ...]) -> Callable:
+        kinds = get_value_kinds(instruction)
+        static_values = tuple(
+            value for value, kind in zip(values, kinds) if kind in (FLAG, PORT)
+        )
+        key = (instruction, static_values)
+        handler = self._handlers.get(key)
+        if handler is None:
+            factory = _get_handler_factory(instruction, static_values)
+            handler = self._handlers[key] = factory(
+                self, self.registers, self.memory, self._code_words
+            )
+        dynamic_values = [
+            value for value, kind in zip(values, kinds) if kind not in (FLAG, PORT)
+        ]
+        return partial(handler, *dynamic_values) if dynamic_values else handler
+
+    def _decode(self, address: int) -> tuple[int, Callable[[], None], int]:
+        word = self.memory[address]
+        instruction = DECODE_TABLE[word]
+        if instruction is None:
+            raise SimulatorError(f"Unknown instruction {word:#06x} at address {address}")
+        next_address = (address + 1) & 0xFFFF
+        values = instruction.decode_operands(word, self.memory[next_address])
+        self._code_words[address] = 1
+        if instruction.get_word_usage() == 2:
+            self._code_words[next_address] = 1
+            next_address = (next_address + 1) & 0xFFFF
+        decoded = self._decoded[address] = (
+            next_address,
+            self._get_handler(instruction, values),
+            instruction.ticks,
+        )
+        return decoded
+
+    def step(self) -> None:
+        self.run(1)
+
+    def run(self, max_instructions: Optional[int] = None) -> int:
+        """Выполняет программу до STOP или max_instructions инструкций.
+        Возвращает число выполненных инструкций"""
+        decoded = self._decoded
+        decode = self._decode
+        limit = -1 if max_instructions is None else max_instructions
+        count = ticks = 0
+        try:
+            while count != limit and not self.halted:
+                instruction = decoded[self.pc] or decode(self.pc)
+                self.pc = instruction[0]
+                instruction[1]()
+                count += 1
+                ticks += instruction[2]
+        finally:
+            self.instruction_count += count
+            self.ticks += ticks
+        return count
+
+
+# состояние процессора в коде блоков: флаги и SP хранятся в локальных переменных
+_BLOCK_STATE = {
+    "N": "n",
+    "Z": "z",
+    "C": "c",
+    "V": "v",
+    "SL": "sl",
+    "SP": "sp",
+    "jump": "next_pc =",
+    "halt": "s.halted = True",
+    "interrupt": "pass",  # инструкция завершает блок, прерывание проверяет BlockSimulator.run
+}
+MAX_BLOCK_INSTRUCTIONS = 256  # инструкций в одном блоке, считая все ветки
+MAX_BLOCK_DEPTH = 16  # вложенных условных переходов
+
+
+def _store_in_block(indent: str, address: str, value: str) -> list[str]:
+    # после инструкции блок завершается, если запись попала в код
+    return [
+        f"{indent}a = {address}",
+        f"{indent}M[a] = {value}",
+        f"{indent}if K[a]:",
+        f"{indent}    s.invalidate(a)",
+        f"{indent}    dirty = 1",
+    ]
+
+
+# элемент пути через блок: ("code", строчки инструкции), ("exit", строчки выхода
+# из блока) или ("branch", условие, путь при выполнении условия)
+_PathItem = tuple[str, list[str]] | tuple[str, str, list["_PathItem"]]
+
+_FLAG_VARIABLES = frozenset(("n", "z", "c", "v", "sl"))
+_FLAG_ASSIGNMENT = re.compile(r"^(n|z|c|v|sl) = (.*)$")
+_FLAG_READ = re.compile(r"\b(n|z|c|v|sl)\b")
+
+
+def _get_read_flags(code: str) -> set[str]:
+    return set(_FLAG_READ.findall(code))
+
+
+def _remove_dead_flags(path: list[_PathItem]) -> set[str]:
+    """Убирает вычисление флагов, которые перезаписываются до чтения.
+    Возвращает флаги, нужные в начале пути. При выходе из блока нужны все флаги"""
+    live: set[str] = set()
+    for item in reversed(path):
+        if item[0] == "exit":
+            live = set(_FLAG_VARIABLES)
+        elif item[0] == "branch":
+            live |= _remove_dead_flags(item[2]) | _get_read_flags(item[1])  # type: ignore[arg-type]
+        else:
+            lines = cast(list[str], item[1])
+            kept = []
+            for line in reversed(lines):
+                # присваивание внутри if (с отступом) не считается перезаписью
+                match = _FLAG_ASSIGNMENT.match(line)
+                if match is None:
+                    live |= _get_read_flags(line)
+                elif match[1] in live:
+                    live.discard(match[1])
+                    live |= _get_read_flags(match[2])
+                else:
+                    continue
+                kept.append(line)
+            lines[:] = reversed(kept)
+    return live
+
+
+class _BlockTranslator:
+    """Переводит код, начинающийся с адреса start, в функцию на Python.
+    Переходы по немедленному адресу продолжают блок (условные - веткой if),
+    переход на start повторяет блок в цикле, остальные переходы завершают блок"""
+
+    def __init__(self, memory: list[int], start: int) -> None:
+        self.memory = memory
+        self.start = start
+        self.variables: set[str] = set()  # регистры и состояние в локальных переменных
+        self.words: set[int] = set()  # слова памяти, из которых собран блок
+        self.instruction_count = 0
+        self.max_length = 0  # самый длинный путь через блок в инструкциях
+        self.has_stores = False
+
+    def _exit(self, length: int, ticks: int, next_pc: Optional[int]) -> _PathItem:
+        self.max_length = max(self.max_length, length)
+        lines = [f"count += {length}", f"ticks += {ticks}"]
+        if next_pc is not None:
+            lines.append(f"next_pc = {next_pc}")
+        return ("exit", lines + ["break"])
+
+    def _loop(self, length: int, ticks: int) -> _PathItem:
+        self.max_length = max(self.max_length, length)
+        return (
+            "exit",
+            [
+                f"count += {length}",
+                f"ticks += {ticks}",
+                "if count > limit:",
+                f"    next_pc = {self.start}",
+                "    break",
+                "continue",
+            ],
+        )
+
+    def _get_state(self, instruction: Instruction, next_address: int) -> dict[str, str]:
+        semantics = get_semantics(instruction)
+        for name, variable in _BLOCK_STATE.items():
+            if f"{{{name}}}" in semantics and name not in ("jump", "halt", "interrupt"):
+                self.variables.add(variable)
+        return {**_BLOCK_STATE, "PC": str(next_address)}
+
+    def _get_operands(self, instruction: Instruction, values: tuple[int, ...]) -> list[str]:
+        operands = []
+        for value, kind in zip(values, get_value_kinds(instruction)):
+            if kind == REG:
+                operands.append(f"r{value}")
+                self.variables.add(f"r{value}")
+            elif kind == FLAG:
+                operands.append(FLAG_ATTRIBUTES[value])
+                self.variables.add(FLAG_ATTRIBUTES[value])
+            else:
+                operands.append(str(value))
+        return operands
+
+    def translate_path(
+        self, address: int, length: int, ticks: int, visited: set[int], depth: int
+    ) -> list[_PathItem]:
+        """Переводит путь от address, length и ticks - число инструкций и тики до него"""
+        path: list[_PathItem] = []
+        while True:
+            if address == self.start and length:
+                path.append(self._loop(length, ticks))
+                return path
+            word = self.memory[address]
+            instruction = DECODE_TABLE[word]
+            if (
+                instruction is None
+                or address in visited
+                or self.instruction_count >= MAX_BLOCK_INSTRUCTIONS
+            ):
+                path.append(self._exit(length, ticks, address))
+                return path
+            visited.add(address)
+            next_address = (address + 1) & 0xFFFF
+            values = instruction.decode_operands(word, self.memory[next_address])
+            self.words.add(address)
+            if instruction.get_word_usage() == 2:
+                self.words.add(next_address)
+                next_address = (next_address + 1) & 0xFFFF
+            self.instruction_count += 1
+            length += 1
+            ticks += instruction.ticks
+
+            condition = get_static_jump(instruction)
+            if condition == "":
+                address = values[0]
+                continue
+            if condition is not None and depth < MAX_BLOCK_DEPTH:
+                state = self._get_state(instruction, next_address)
+                branch = self.translate_path(
+                    values[0], length, ticks, set(visited), depth + 1
+                )
+                path.append(("branch", condition.format(**state), branch))
+                address = next_address
+                continue
+
+            terminator = is_terminator(instruction)
+            state = self._get_state(instruction, next_address)
+            operands = self._get_operands(instruction, values)
+            lines = [f"next_pc = {next_address}"] if terminator else []
+            lines += render(get_semantics(instruction), operands, state, _store_in_block)
+            path.append(("code", lines))
+            if terminator:
+                path.append(self._exit(length, ticks, None))
+                return path
+            if any(line.endswith("dirty = 1") for line in lines):
+                self.has_stores = True
+                _, exit_lines = self._exit(length, ticks, next_address)
+                path.append(("exit", ["if dirty:", *("    " + line for line in exit_lines)]))
+            address = next_address
+
+    def _get_lines(self, path: list[_PathItem], indent: str) -> list[str]:
+        lines = []
+        for item in path:
+            if item[0] == "branch":
+                lines.append(f"{indent}if {item[1]}:")
+                lines += self._get_lines(item[2], indent + "    ")  # type: ignore[arg-type]
+            else:
+                lines += (indent + line for line in cast(list[str], item[1]))
+        return lines
+
+    def get_source(self) -> str:
+        path = self.translate_path(self.start, 0, 0, set(), 0)
+        _remove_dead_flags(path)
+        registers = sorted(v for v in self.variables if v.startswith("r"))
+        state = sorted(self.variables.difference(registers))
+        loads = [f"{v} = R[{v[1:]}]" for v in registers] + [f"{v} = s.{v}" for v in state]
+        stores = [f"R[{v[1:]}] = {v}" for v in registers] + [f"s.{v} = {v}" for v in state]
+        return "\n".join(
+            [
+                "def make_block(s, R, M, K):",
+                "    def block(limit):",
+                *(f"        {line}" for line in loads),
+                "        count = ticks = 0",
+                *(["        dirty = 0"] if self.has_stores else []),
+                "        while True:",
+                *self._get_lines(path, " " * 12),
+                *(f"        {line}" for line in stores),
+                "        s.pc = next_pc",
+                "        s.ticks += ticks",
+                "        return count",
+                "    return block",
+            ]
+        )
+
+
+class BlockSimulator(Simulator):
+    """Симулятор, который переводит участки кода в функции на Python.
+    Регистры и флаги внутри блока хранятся в локальных переменных,
+    запись в слово, из которого собран блок, сбрасывает блок"""
+
+    def __init__(self, machine_code: Iterable[int], random_seed: int = RANDOM_SEED) -> None:
+        super().__init__(machine_code, random_seed)
+        # адрес: (функция блока, самый длинный путь через блок)
+        self._blocks: list[Optional[tuple[Callable[[int], int], int]]] = [None] * RAM_SIZE
+        # слово памяти: адреса блоков, в которые оно входит
+        self._block_words: dict[int, list[int]] = {}
+
+    def invalidate(self, address: int) -> None:
+        super().invalidate(address)
+        for start in self._block_words.pop(address, ()):
+            self._blocks[start] = None
+
+    def _translate(self, address: int) -> tuple[Callable[[int], int], int]:
+        if DECODE_TABLE[self.memory[address]] is None:
+            self._decode(address)  # SimulatorError
+        translator = _BlockTranslator(self.memory, address)
+        source = translator.get_source()
+        namespace: dict[str, object] = {}
+        # как и у make_handler: только шаблоны SEMANTICS и декодированные числа
+        exec(compile(source, f"<block {address}>", "exec"), namespace)
+        make_block = cast(Callable[..., Callable[[int], int]], namespace["make_block"])
+        block = make_block(self, self.registers, self.memory, self._code_words)
+        for word in translator.words:
+            self._code_words[word] = 1
+            self._block_words.setdefault(word, []).append(address)
+        translated = self._blocks[address] = (block, translator.max_length)
+        return translated
+
+    def run(self, max_instructions: Optional[int] = None) -> int:
+        blocks = self._blocks
+        translate = self._translate
+        limit = sys.maxsize if max_instructions is None else max_instructions
+        count = 0
+        block_count = 0  # Simulator.run сам прибавляет к instruction_count
+        try:
+            while count < limit and not self.halted:
+                block, max_length = blocks[self.pc] or translate(self.pc)
+                if limit - count < max_length:
+                    # блок может не уложиться в лимит, выполняем по одной инструкции
+                    count += Simulator.run(self, 1)
+                    continue
+                executed = block(limit - count - max_length)
+                count += executed
+                block_count += executed
+                if self.signals & self.im:  # блок закончился изменением IM
+                    self.check_interrupt()
+        finally:
+            self.instruction_count += block_count
+        return count
+
+
+def load_machine_code(path: str) -> Optional["array[int]"]:
+    """Собирает исходник или читает образ памяти (.bin, .hex или .json)"""
+    if Path(path).suffix.lower() in FORMATS_BY_SUFFIX:
+        return read_image(path)
+    from assembler import Assembler
+
+    with open(path, encoding="utf-8") as program_file:
+        return Assembler.assemble(program_file, path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SALUT-2 simulator")
+    parser.add_argument("path", help="program to assemble or memory image (.bin, .hex, .json)")
+    parser.add_argument(
+        "-n", "--max-instructions", type=int, help="stop after this many instructions"
+    )
+    parser.add_argument(
+        "--interpret",
+        action="store_true",
+        help="execute instructions one by one instead of translating blocks",
+    )
+    parser.add_argument(
+        "--trace", help="input trace to replay: lines of 'tick port value'"
+    )
+    parser.add_argument("--ticks", type=int, help="stop after this many game ticks")
+    parser.add_argument(
+        "--screen",
+        action="store_true",
+        help="connect the screen to P0 OUT and report frames per second",
+    )
+    parser.add_argument(
+        "--frames", metavar="DIRECTORY", help="save every screen frame as PNG"
+    )
+    parser.add_argument(
+        "--raw",
+        metavar="PATH",
+        help="save all screen frames as raw bytes, 1024 per frame (NumPy array for .npy)",
+    )
+    args = parser.parse_args()
+    if args.max_instructions is not None and (args.trace or args.ticks is not None):
+        parser.error("-n can't be used with --trace or --ticks")
+    machine_code = load_machine_code(args.path)
+    if machine_code is None:
+        return
+    simulator = (Simulator if args.interpret else BlockSimulator)(machine_code)
+    screen = None
+    if args.screen or args.frames or args.raw:
+        screen = Screen(keep_frames=bool(args.frames or args.raw))
+        screen.attach(simulator)
+    start = time.perf_counter()
+    try:
+        if args.trace or args.ticks is not None:
+            trace = InputTrace.load(args.trace) if args.trace else InputTrace()
+            Scheduler(simulator, trace).run(args.ticks)
+        else:
+            simulator.run(args.max_instructions)
+    except SimulatorError as error:
+        print(f"SimulatorError at PC {simulator.pc}:\n{error}")
+    if screen is not None:
+        screen.flush()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{simulator.instruction_count} instructions, {simulator.ticks} estimated ticks "
+        f"in {elapsed:.3f} s "
+        f"({simulator.instruction_count / max(elapsed, 1e-9) / 1e6:.2f} MIPS)"
+    )
+    print(
+        " ".join(f"R{i}={value}" for i, value in enumerate(simulator.registers)),
+        f"PC={simulator.pc} SP={simulator.sp} PS={simulator.ps:05b}",
+    )
+    if screen is None:
+        return
+    print(f"{screen.frame_count} frames ({screen.frame_count / max(elapsed, 1e-9):.1f} fps)")
+    if args.frames:
+        screen.save_frames(args.frames)
+    if args.raw:
+        try:
+            screen.save_raw(args.raw)
+        except SimulatorError as error:
+            print(error)
+
+
+if __name__ == "__main__":
+    main()
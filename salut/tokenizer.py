@@ -0,0 +1,117 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from salut.dispatch import OPERAND_CLASSES, classify_operand
+from salut.utils import (
+    FLAG,
+    FLAG_NAMES,
+    IMMEDIATE,
+    PORT,
+    REG,
+    SQUARED_IMMEDIATE,
+    SQUARED_REG,
+    SQUARED_SUM_REG,
+    immediate_to_int,
+)
+
+EMPTY = ""  # класс пропущенного операнда (две запятые подряд)
+
+OperandValue = int | str | tuple[int, int] | None
+
+
+class Operand(NamedTuple):
+    kind: str  # класс операнда, см. salut.utils
+    # номер регистра, флага или порта; пара регистров для [Reg+Reg];
+    # число или имя метки/константы для немедленных значений
+    value: OperandValue
+    text: str  # операнд в верхнем регистре без пробелов
+    column: int  # номер столбца в исходной строке (с единицы)
+
+
+class Statement(NamedTuple):
+    name: str
+    operands: tuple[Operand, ...]
+    signature: tuple[str, ...]  # классы операндов для поиска инструкции
+    column: int
+
+
+class Label(NamedTuple):
+    name: str
+    column: int
+
+
+def _get_reserved_value(text: str, kind: str) -> OperandValue:
+    if kind == REG:
+        return int(text[1:])
+    if kind == SQUARED_REG:
+        return int(text[2:-1])
+    if kind == SQUARED_SUM_REG:
+        register_1, register_2 = text[1:-1].split("+")
+        return int(register_1[1:]), int(register_2[1:])
+    if kind == FLAG:
+        return FLAG_NAMES.index(text) if text in FLAG_NAMES else int(text[1:])
+    if kind == PORT:
+        return int(text[1:])
+    return None  # специальные регистры задаются самим опкодом
+
+
+# имя операнда: (класс, значение) для всех зарезервированных имён
+_RESERVED_OPERANDS: dict[str, tuple[str, OperandValue]] = {
+    text: (kind, _get_reserved_value(text, kind))
+    for text, kind in OPERAND_CLASSES.items()
+}
+
+
+def _get_immediate_value(text: str) -> int | str:
+    """Число, если это литерал, иначе имя метки или константы"""
+    try:
+        return immediate_to_int(text)
+    except ValueError:
+        return text
+
+
+@lru_cache(maxsize=65536)
+def _classify(text: str) -> tuple[str, OperandValue]:
+    reserved = _RESERVED_OPERANDS.get(text)
+    if reserved is not None:
+        return reserved
+    if not text:
+        return EMPTY, None
+    kind = classify_operand(text)
+    if kind == SQUARED_IMMEDIATE:
+        return kind, _get_immediate_value(text.strip("[]"))
+    return IMMEDIATE, _get_immediate_value(text)
+
+
+def tokenize_line(line: str) -> Optional[Statement | Label]:
+    """Разбирает строчку кода за один проход.
+    Возвращает None для пустой строчки (или строчки с одним комментарием)"""
+    code = line.split(";", 1)[0]
+    stripped_code = code.lstrip()
+    if not stripped_code:
+        return None
+    column = len(code) - len(stripped_code) + 1
+    formatted_line = stripped_code.rstrip().upper()
+
+    if formatted_line[-1] == ":":
+        return Label(formatted_line[:-1].strip(), column)
+
+    splitted_line = formatted_line.split(maxsplit=1)
+    if len(splitted_line) == 1:
+        return Statement(formatted_line, (), (), column)
+    instruction_name, operands_part = splitted_line
+
+    operand_column = column + formatted_line.index(operands_part, len(instruction_name))
+    operands = []
+    signature = []
+    for operand in operands_part.split(","):
+        text = operand.replace(" ", "")
+        kind, value = _classify(text)
+        operands.append(
+            Operand(
+                kind, value, text, operand_column + len(operand) - len(operand.lstrip(" "))
+            )
+        )
+        signature.append(kind)
+        operand_column += len(operand) + 1
+    return Statement(instruction_name, tuple(operands), tuple(signature), column)
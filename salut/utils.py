@@ -1,7 +1,11 @@
-from typing import Literal, Optional
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Literal, Optional, cast
 
 from salut.errors import AssemblerError
 
+if TYPE_CHECKING:
+    from salut.tokenizer import Operand
+
 # регистры
 REGISTER_NAMES = R = [f"R{i}" for i in range(16)]
 SQUARED_R = [f"[{r}]" for r in REGISTER_NAMES]
@@ -22,9 +26,37 @@ SQUARED_IMM = ["0_SQUARED_IMMEDIATE"]
 NAME = ["0_NAME"]
 PATH = ["0_PATH"]
 
-RESERVED_NAMES = (
+# множество: имена проверяются при каждом объявлении метки или константы
+RESERVED_NAMES = frozenset(
     REGISTER_NAMES + SPECIAL_REGISTER_NAMES + PORT_NAMES + F + SQUARED_R + SQUARED_SUM_R
 )
+# всё, что не может быть немедленным значением
+NOT_IMMEDIATE_NAMES = RESERVED_NAMES
+
+# классы операндов
+REG = "Reg"
+SQUARED_REG = "[Reg]"
+SQUARED_SUM_REG = "[Reg+Reg]"
+IMMEDIATE = "Imm"
+SQUARED_IMMEDIATE = "[Imm]"
+FLAG = "Flag"
+PORT = "Port"
+# специальные регистры образуют каждый свой класс: "PC", "SP", "IM", "IA", "PS"
+
+# первое значение в списке возможных значений операнда: класс операнда
+_OPERAND_KINDS: dict[str, str] = {
+    R[0]: REG,
+    SQUARED_R[0]: SQUARED_REG,
+    SQUARED_SUM_R[0]: SQUARED_SUM_REG,
+    F[0]: FLAG,
+    P[0]: PORT,
+    IMM[0]: IMMEDIATE,
+    NAME[0]: IMMEDIATE,
+    PATH[0]: IMMEDIATE,
+    SQUARED_IMM[0]: SQUARED_IMMEDIATE,
+} | {name: name for name in SPECIAL_REGISTER_NAMES}
+
+MIN_TICKS = 4  # инструкция не может выполняться быстрее 4 тиков (10 Гц)
 
 
 def immediate_to_int(imm: str) -> int:
@@ -51,6 +83,7 @@ class Instruction:
         names: str | list[str],
         opcode: Optional[int] = None,
         operands: Optional[list[list[str]]] = None,
+        ticks: int = MIN_TICKS,
     ) -> None:
         if isinstance(names, str):
             names = [names]
@@ -59,153 +92,176 @@ class Instruction:
         if operands is None:
             operands = []
         self.operands: list[list[str]] = operands
-
-    @staticmethod
-    def _is_immediate(value: str) -> bool:
-        return value not in (
-            REGISTER_NAMES
-            + SPECIAL_REGISTER_NAMES
-            + FLAG_NAMES
-            + FLAG_NUMBER_NAMES
-            + PORT_NAMES
-            + SQUARED_R
-            + SQUARED_SUM_R
+        # класс каждого операнда (для немедленных значений - Imm или [Imm])
+        self.operand_kinds: tuple[str, ...] = tuple(
+            _OPERAND_KINDS[possible_values[0]] for possible_values in operands
         )
+        self.ticks = ticks  # время выполнения в тиках игры, часто оценка (см. INSTRUCTIONS)
 
-    @staticmethod
-    def _is_squared(value: str) -> bool:
-        if len(value) < 3:
-            return False
-        return value.startswith("[") and value.endswith("]")
+    @property
+    def opcode(self) -> Optional[int]:
+        return self._opcode
 
-    @staticmethod
-    def _is_immediate_squared(value: str) -> bool:
-        return Instruction._is_squared(value) and Instruction._is_immediate(
-            value.strip("[]")
-        )
-
-    def do_operands_match(self, operands: list[str]) -> bool:
-        if len(operands) != len(self.operands):
-            return False
-        for i, operand in enumerate(operands):
-            if operand in self.operands[i]:
-                continue
-            if self._is_immediate(operand) and any(
-                j in self.operands[i] for j in ["0_IMMEDIATE", "0_NAME", "0_PATH"]
-            ):
-                continue
-            if (
-                self._is_immediate_squared(operand)
-                and "0_SQUARED_IMMEDIATE" in self.operands[i]
-            ):
-                continue
-            return False
-        return True
+    def _uses_second_word_registers(self) -> bool:
+        return len(self.operands) == 4 or "REM" in self.names
 
-    def _get_word_usage(self) -> Literal[1, 2]:
-        """Возвращает, сколько слов использует инструкция"""
+    def get_word_usage(self) -> Literal[1, 2]:
+        """Возвращает, сколько слов использует инструкция (с опкодом)"""
         if (
-            any("IMMEDIATE" in possible_values for possible_values in self.operands)
-            or len(self.operands) == 4
-            or "REM" in self.names  # REM и DIV c 4 операндами используют IMMEDIATE неявно
+            any(kind in (IMMEDIATE, SQUARED_IMMEDIATE) for kind in self.operand_kinds)
+            # REM и DIV c 4 операндами используют IMMEDIATE неявно
+            or self._uses_second_word_registers()
         ):
             return 2
         return 1
 
     @staticmethod
-    def _place_immediate_last(operands: list[str]) -> None:
-        for i, operand in enumerate(operands):
-            if Instruction._is_immediate(operand) or Instruction._is_immediate_squared(
-                operand
-            ):
-                operands[i], operands[-1] = operands[-1], operands[i]  # noqa: PLR1736
+    def _get_operand_sum(
+        ports: list[int], flags: list[int], registers: list[int]
+    ) -> int:
+        sum_ = 0
+        for port in ports:
+            sum_ = (sum_ << Instruction._port_bits) + port
+        for flag in flags:
+            sum_ = (sum_ << Instruction._flag_bits) + flag
+        for register in reversed(registers):
+            sum_ = (sum_ << Instruction._register_bits) + register
+        return sum_
 
-    def _normalize_operands(self, operands: list[str]) -> list[str]:
+    def get_machine_code(self, operands: Sequence["Operand"]) -> list[int | str]:
         """
-        1) Убирает специальные регистры, превращает флаги: N=F0, Z=F1, C=F2, V=F3
-        2) Превращает [Reg+Reg] в [Reg], [Reg]
-        3) Ставит порты, флаги и значения в квадратных скобках первее регистров.
-        Убирает квадратные скобки.
-        4) Ставит немедленное значение в конце.
-        5) Если это DIV с 4 операндами или REM, переворачивает операнды.
+        Кодирует инструкцию по операндам из salut.tokenizer:
+        1) Специальные регистры задаются самим опкодом и пропускаются.
+        2) [Reg+Reg] превращается в два регистра, регистры в квадратных скобках идут
+        после остальных.
+        3) Порты, флаги и регистры складываются в сумму операндов, первый регистр
+        занимает младшие биты.
+        4) Немедленное значение записывается вторым словом.
+        5) DIV с 4 операндами и REM записывают регистры вторым словом,
+        первый регистр занимает старшие биты.
         """
+        values: list[int | str] = []
+        for operand in operands:
+            if operand.kind == SQUARED_SUM_REG:
+                values.extend(cast(tuple[int, int], operand.value))
+            elif operand.kind not in SPECIAL_REGISTER_NAMES:
+                values.append(cast(int | str, operand.value))
+        return self.encode_operands(values)
 
-        operands = [
-            f"F{FLAG_NAMES.index(operand)}" if operand in FLAG_NAMES else operand
-            for operand in operands
-            if operand not in SPECIAL_REGISTER_NAMES
-        ]
-
-        for operand in operands[:]:
-            if "+" in operand:
-                operands.remove(operand)
-                operand_1, operand_2 = operand.split("+")
-                operands.append(operand_1 + "]")
-                operands.append("[" + operand_2)
-
-        squared_operands = [
-            operand.strip("[]") for operand in operands if self._is_squared(operand)
-        ]
-        operands = [
-            operand for operand in operands if not self._is_squared(operand)
-        ] + squared_operands
-
-        flag_and_port_oprands = [
-            operand for operand in operands if operand in (FLAG_NUMBER_NAMES + PORT_NAMES)
-        ]
-        operands = [
-            operand for operand in operands if operand not in flag_and_port_oprands
-        ] + flag_and_port_oprands
-
-        self._place_immediate_last(operands)
-
-        if len(operands) == 4 or "REM" in self.names:
-            operands = operands[::-1]
-
-        return operands
+    def encode_operands(self, values: Sequence[int | str]) -> list[int | str]:
+        """Обратное к decode_operands: машинный код по значениям операндов"""
+        if self._opcode is None:
+            raise AssemblerError("Unexpected assembler exception.")
+        ports: list[int] = []
+        flags: list[int] = []
+        registers: list[int] = []
+        squared_registers: list[int] = []
+        immediate: int | str | None = None
+        remaining_values = iter(values)
+        for kind in self.operand_kinds:
+            if kind == REG:
+                registers.append(cast(int, next(remaining_values)))
+            elif kind == SQUARED_REG:
+                squared_registers.append(cast(int, next(remaining_values)))
+            elif kind == SQUARED_SUM_REG:
+                squared_registers += [
+                    cast(int, next(remaining_values)),
+                    cast(int, next(remaining_values)),
+                ]
+            elif kind == FLAG:
+                flags.append(cast(int, next(remaining_values)))
+            elif kind == PORT:
+                ports.append(cast(int, next(remaining_values)))
+            elif kind in (IMMEDIATE, SQUARED_IMMEDIATE):
+                immediate = next(remaining_values)
+        registers += squared_registers
 
-    @staticmethod
-    def _get_bits(operand: str) -> int:
-        if operand in PORT_NAMES:
-            return Instruction._port_bits
-        if operand in FLAG_NUMBER_NAMES:
-            return Instruction._flag_bits
-        if operand in REGISTER_NAMES:
-            return Instruction._register_bits
-        raise AssemblerError("Unexpected assembler error: operands were normalized wrong")
+        if self._uses_second_word_registers():
+            return [self._opcode, self._get_operand_sum([], [], registers[::-1])]
+        operand_sum = self._get_operand_sum(ports, flags, registers)
+        if immediate is not None:
+            return [self._opcode + operand_sum, immediate]
+        return [self._opcode + operand_sum]
 
-    @staticmethod
-    def _get_operand_sum(operands: list[str]) -> int:
-        ports = [operand for operand in operands if operand in PORT_NAMES]
-        flags = [operand for operand in operands if operand in FLAG_NUMBER_NAMES]
-        registers = [operand for operand in operands if operand in REGISTER_NAMES]
-        operands = ports + flags + registers[::-1]
-        sum_ = 0
-        for i in operands:
-            sum_ <<= Instruction._get_bits(i)
-            sum_ += int(i[1:])
-        print(operands, format(sum_, "016b"))
-        return sum_
+    def get_operand_bits(self) -> int:
+        """Сколько младших бит первого слова занимают операнды"""
+        if self._uses_second_word_registers():
+            return 0
+        return sum(
+            {
+                REG: self._register_bits,
+                SQUARED_REG: self._register_bits,
+                SQUARED_SUM_REG: 2 * self._register_bits,
+                FLAG: self._flag_bits,
+                PORT: self._port_bits,
+            }.get(kind, 0)
+            for kind in self.operand_kinds
+        )
 
-    def get_machine_code(self, operands: list[str]) -> list[int | str]:
+    def decode_operands(self, word: int, next_word: int) -> tuple[int, ...]:
+        """
+        Обратное к get_machine_code: возвращает значения операндов по порядку.
+        [Reg+Reg] даёт два регистра, немедленное значение - второе слово,
+        специальные регистры пропускаются
+        """
         if self._opcode is None:
-            raise AssemblerError("Unexpected assembler exception.")
-        operands = self._normalize_operands(operands)
-        if not operands:
-            return [self._opcode]
-        has_immediate = self._is_immediate(operands[-1])
-        if has_immediate and (len(operands) == 4 or "REM" in self.names):
-            return [self._opcode, self._get_operand_sum(operands)]
-        if has_immediate:
-            return [self._opcode + self._get_operand_sum(operands[:-1]), operands[-1]]
-        return [self._opcode + self._get_operand_sum(operands)]
+            raise ValueError(f"{self.names[0]} has no opcode")
+        kinds = self.operand_kinds
+        if self._uses_second_word_registers():
+            return tuple(
+                (next_word >> (self._register_bits * (len(kinds) - 1 - i))) & 0xF
+                for i in range(len(kinds))
+            )
+        operand_sum = word - self._opcode
+        registers = []
+        for kind in kinds:
+            if kind in (REG, SQUARED_REG):
+                registers.append(0)
+            elif kind == SQUARED_SUM_REG:
+                registers += [0, 0]
+        for i in range(len(registers)):
+            registers[i] = operand_sum & 0xF
+            operand_sum >>= self._register_bits
+        flags = [0] * kinds.count(FLAG)
+        for i in reversed(range(len(flags))):
+            flags[i] = operand_sum & 0x3
+            operand_sum >>= self._flag_bits
+        ports = [0] * kinds.count(PORT)
+        for i in reversed(range(len(ports))):
+            ports[i] = operand_sum & 0x3
+            operand_sum >>= self._port_bits
+
+        # регистры в квадратных скобках записаны после остальных
+        plain_registers = iter(registers)
+        squared_registers = iter(
+            registers[sum(1 for kind in kinds if kind == REG) :]
+        )
+        values = []
+        for kind in kinds:
+            if kind == REG:
+                values.append(next(plain_registers))
+            elif kind == SQUARED_REG:
+                values.append(next(squared_registers))
+            elif kind == SQUARED_SUM_REG:
+                values += [next(squared_registers), next(squared_registers)]
+            elif kind == FLAG:
+                values.append(flags.pop(0))
+            elif kind == PORT:
+                values.append(ports.pop(0))
+            elif kind in (IMMEDIATE, SQUARED_IMMEDIATE):
+                values.append(next_word)
+        return tuple(values)
 
 
+# Время выполнения в тиках. Из описания процессора следуют только минимум
+# в 4 тика (10 Гц) и 105 тиков для DIV и REM (0.38 Гц при 40 тиках в секунду).
+# Остальное - оценки, а не замеры в игре: MUL - 20 тиков, PUSH, POP, PEEK, CALL
+# и RET - 6, LDR и STR - 5, все прочие инструкции считаются по минимуму
 INSTRUCTIONS: list[Instruction] = [
     Instruction("NOP", 0),
     Instruction("STOP", 1),
-    Instruction("RET", 2),
-    Instruction("CALL", 3, [IMM]),
+    Instruction("RET", 2, ticks=6),
+    Instruction("CALL", 3, [IMM], ticks=6),
     Instruction("JS", 4, [IMM]),
     Instruction("JNS", 5, [IMM]),
     Instruction(["JE", "JZ"], 6, [IMM]),
@@ -226,26 +282,26 @@ INSTRUCTIONS: list[Instruction] = [
     Instruction("MOV", 20, [IA, IMM]),
     Instruction("MOV", 21, [PS, IMM]),
     Instruction("DROP", 22),
-    Instruction("PUSH", 23, [PC]),
-    Instruction("PUSH", 24, [SP]),
-    Instruction("PUSH", 25, [IM]),
-    Instruction("PUSH", 26, [IA]),
-    Instruction("PUSH", 27, [PS]),
-    Instruction("POP", 2, [PC]),
-    Instruction("POP", 28, [IM]),
-    Instruction("POP", 29, [IA]),
-    Instruction("POP", 30, [PS]),
-    Instruction("PEEK", 31, [PC]),
-    Instruction("PEEK", 32, [IM]),
-    Instruction("PEEK", 33, [IA]),
-    Instruction("PEEK", 34, [PS]),
+    Instruction("PUSH", 23, [PC], ticks=6),
+    Instruction("PUSH", 24, [SP], ticks=6),
+    Instruction("PUSH", 25, [IM], ticks=6),
+    Instruction("PUSH", 26, [IA], ticks=6),
+    Instruction("PUSH", 27, [PS], ticks=6),
+    Instruction("POP", 2, [PC], ticks=6),
+    Instruction("POP", 28, [IM], ticks=6),
+    Instruction("POP", 29, [IA], ticks=6),
+    Instruction("POP", 30, [PS], ticks=6),
+    Instruction("PEEK", 31, [PC], ticks=6),
+    Instruction("PEEK", 32, [IM], ticks=6),
+    Instruction("PEEK", 33, [IA], ticks=6),
+    Instruction("PEEK", 34, [PS], ticks=6),
     Instruction("RND", 35),
-    Instruction("DIV", 37, [R, R, R, R]),
-    Instruction("REM", 38, [R, R, R]),
+    Instruction("DIV", 37, [R, R, R, R], ticks=105),
+    Instruction("REM", 38, [R, R, R], ticks=105),
     Instruction("SL", 39),
     Instruction("MOV", 40, [F, IMM]),
     Instruction("OUT", 44, [P, IMM]),
-    Instruction("CALL", 48, [IMM]),
+    Instruction("CALL", 48, [R], ticks=6),
     Instruction("JS", 64, [R]),
     Instruction("JNS", 80, [R]),
     Instruction(["JE", "JZ"], 96, [R]),
@@ -270,26 +326,26 @@ INSTRUCTIONS: list[Instruction] = [
     Instruction("MOV", 400, [IA, R]),
     Instruction("MOV", 416, [PS, R]),
     Instruction("MOV", 432, [R, IMM]),
-    Instruction("PUSH", 448, [R]),
-    Instruction("POP", 464, [R]),
-    Instruction("PEEK", 480, [R]),
-    Instruction("STR", 496, [SQUARED_R, IMM]),
+    Instruction("PUSH", 448, [R], ticks=6),
+    Instruction("POP", 464, [R], ticks=6),
+    Instruction("PEEK", 480, [R], ticks=6),
+    Instruction("STR", 496, [SQUARED_R, IMM], ticks=5),
     Instruction("MSB", 512, [R]),
     Instruction("LSB", 528, [R]),
     Instruction("RND", 544, [R]),
     Instruction("CMP", 560, [R, IMM]),
     Instruction("CMP", 576, [IMM, R]),
-    Instruction("STR", 592, [SQUARED_IMM, R]),
-    Instruction("LDR", 608, [R, SQUARED_IMM]),
-    Instruction("CALL", 624, [IA]),
+    Instruction("STR", 592, [SQUARED_IMM, R], ticks=5),
+    Instruction("LDR", 608, [R, SQUARED_IMM], ticks=5),
+    Instruction("CALL", 624, [IA], ticks=6),
     Instruction("MOV", 640, [R, F]),
     Instruction("MOV", 704, [F, R]),
     Instruction("IN", 768, [R, P]),
     Instruction("OUT", 832, [P, R]),
     Instruction("MOV", 1024, [R, R]),
     Instruction("SWAP", 1280, [R, R]),
-    Instruction("LDR", 1536, [R, SQUARED_R]),
-    Instruction("STR", 1792, [SQUARED_R, R]),
+    Instruction("LDR", 1536, [R, SQUARED_R], ticks=5),
+    Instruction("STR", 1792, [SQUARED_R, R], ticks=5),
     Instruction("DEC", 2048, [R, R]),
     Instruction("INC", 2304, [R, R]),
     Instruction("CMP", 2560, [R, R]),
@@ -303,8 +359,8 @@ INSTRUCTIONS: list[Instruction] = [
     Instruction("ADC", 3840, [R, IMM, R]),
     Instruction("SUB", 4096, [R, R, IMM]),
     Instruction("SBC", 4352, [R, R, IMM]),
-    Instruction("SUB", 4608, [R, R, IMM]),
-    Instruction("SBC", 4864, [R, R, IMM]),
+    Instruction("SUB", 4608, [R, IMM, R]),
+    Instruction("SBC", 4864, [R, IMM, R]),
     Instruction("AND", 5120, [R, R, IMM]),
     Instruction("AND", 5120, [R, IMM, R]),
     Instruction("OR", 5376, [R, R, IMM]),
@@ -321,11 +377,11 @@ INSTRUCTIONS: list[Instruction] = [
     Instruction("SHR", 6912, [R, R, IMM]),
     Instruction("ROL", 7168, [R, R, IMM]),
     Instruction("ROR", 7424, [R, R, IMM]),
-    Instruction("MUL", 7680, [R, R, IMM]),
-    Instruction("MUL", 7680, [R, IMM, R]),
-    Instruction("DIV", 7936, [R, R, IMM]),
-    Instruction("LDR", 8192, [R, SQUARED_SUM_R]),
-    Instruction("STR", 12288, [SQUARED_SUM_R, R]),
+    Instruction("MUL", 7680, [R, R, IMM], ticks=20),
+    Instruction("MUL", 7680, [R, IMM, R], ticks=20),
+    Instruction("DIV", 7936, [R, R, IMM], ticks=105),
+    Instruction("LDR", 8192, [R, SQUARED_SUM_R], ticks=5),
+    Instruction("STR", 12288, [SQUARED_SUM_R, R], ticks=5),
     Instruction("ADD", 16384, [R, R, R]),
     Instruction("ADC", 20480, [R, R, R]),
     Instruction("SUB", 24576, [R, R, R]),
@@ -336,9 +392,13 @@ INSTRUCTIONS: list[Instruction] = [
     Instruction("NAND", 45056, [R, R, R]),
     Instruction("NOR", 49152, [R, R, R]),
     Instruction("XNOR", 53248, [R, R, R]),
-    Instruction("MUL", 57344, [R, R, R]),
-    Instruction("DIV", 61440, [R, R, R]),
+    Instruction("MUL", 57344, [R, R, R], ticks=20),
+    Instruction("DIV", 61440, [R, R, R], ticks=105),
     Instruction(".DATA", operands=[IMM]),
     Instruction(".EQU", operands=[NAME, IMM]),
     Instruction(".INCLUDE", operands=[PATH]),
+    Instruction(".ASSUME", operands=[R, IMM]),
+    Instruction(".KEEP", operands=[NAME]),
+    Instruction(".RLE", operands=[PATH]),
+    Instruction(".DELTA", operands=[PATH, IMM]),
 ]
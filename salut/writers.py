@@ -0,0 +1,161 @@
+import contextlib
+import hashlib
+import json
+import os
+import secrets
+import sys
+from array import array
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal, Optional
+
+INTEL_HEX_RECORD_SIZE = 16  # байт данных в одной записи
+TEMP_NAME_ATTEMPTS = 100  # попыток выбрать свободное имя временного файла
+
+
+def _create_temp_file(path: Path) -> tuple[int, str]:
+    """Создаёт временный файл рядом с path. Права как у open(): 0o666 без битов
+    umask, их применяет система (umask процесса не меняется)"""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    for _ in range(TEMP_NAME_ATTEMPTS):
+        temp_path = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            return os.open(temp_path, flags, 0o666), str(temp_path)
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"Can't create a temporary file next to {path}")
+
+
+def _write_atomic(path: str | Path, data: bytes) -> None:
+    """Записывает файл целиком: при ошибке старый файл остаётся нетронутым.
+    Права старого файла сохраняются, новый файл получает обычные права"""
+    path = Path(path)
+    file_descriptor, temp_path = _create_temp_file(path)
+    try:
+        with os.fdopen(file_descriptor, "wb") as temp_file:
+            temp_file.write(data)
+        # права заменяемого файла, у нового остаются права от os.open
+        with contextlib.suppress(OSError):
+            os.chmod(temp_path, os.stat(path).st_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+def _to_bytes(machine_code: "array[int]", byteorder: Literal["little", "big"]) -> bytes:
+    code = array("H", machine_code)
+    if byteorder != sys.byteorder:
+        code.byteswap()
+    return code.tobytes()
+
+
+def write_binary(
+    machine_code: "array[int]",
+    path: str | Path,
+    byteorder: Literal["little", "big"] = "little",
+) -> None:
+    """Образ памяти без заголовка: по два байта на слово"""
+    _write_atomic(path, _to_bytes(machine_code, byteorder))
+
+
+def _get_intel_hex_record(address: int, record_type: int, data: bytes) -> str:
+    record = bytes((len(data), address >> 8, address & 0xFF, record_type)) + data
+    checksum = -sum(record) & 0xFF
+    return f":{record.hex().upper()}{checksum:02X}\n"
+
+
+def write_intel_hex(
+    machine_code: "array[int]",
+    path: str | Path,
+    byteorder: Literal["little", "big"] = "little",
+) -> None:
+    """Intel HEX с байтовыми адресами (слово N лежит по адресу 2N).
+    Больше 64 KiB адресуется записями расширенного линейного адреса"""
+    data = _to_bytes(machine_code, byteorder)
+    records = []
+    for address in range(0, len(data), INTEL_HEX_RECORD_SIZE):
+        if address and not address & 0xFFFF:
+            records.append(_get_intel_hex_record(0, 4, (address >> 16).to_bytes(2, "big")))
+        records.append(
+            _get_intel_hex_record(
+                address & 0xFFFF, 0, data[address : address + INTEL_HEX_RECORD_SIZE]
+            )
+        )
+    records.append(_get_intel_hex_record(0, 1, b""))
+    _write_atomic(path, "".join(records).encode("ascii"))
+
+
+def write_memory_block_data(machine_code: "array[int]", path: str | Path) -> None:
+    """Заменяет массив data в файле блока памяти, остальные поля не меняются.
+    Файл записывается без отступов, иначе каждое слово занимает отдельную строку"""
+    with open(path, encoding="utf-8") as memory_block_data_file:
+        memory_block_data = json.load(memory_block_data_file)
+    memory_block_data["data"] = machine_code.tolist()
+    _write_atomic(
+        path, json.dumps(memory_block_data, separators=(",", ":")).encode("utf-8")
+    )
+
+
+# формат: (функция записи, расширение файла по умолчанию)
+WRITERS: dict[str, tuple[Callable[["array[int]", str | Path], None], str]] = {
+    "json": (write_memory_block_data, ".json"),
+    "bin": (write_binary, ".bin"),
+    "bin-be": (lambda code, path: write_binary(code, path, "big"), ".bin"),
+    "hex": (write_intel_hex, ".hex"),
+}
+
+
+class OutputStamps:
+    """Хэши последних записанных образов памяти, чтобы не перезаписывать файл
+    с тем же содержимым. Файл считается неизменённым, только если его размер
+    и время изменения совпадают с записанными"""
+
+    def __init__(self, directory: str | Path) -> None:
+        self._directory = Path(directory)
+
+    def _get_stamp_path(self, output_format: str, path: str | Path) -> Path:
+        key = hashlib.sha256(f"{output_format}\0{Path(path).resolve()}".encode())
+        return self._directory / f"{key.hexdigest()}.stamp"
+
+    @staticmethod
+    def _get_stamp(machine_code: "array[int]", path: str | Path) -> str:
+        stat = os.stat(path)
+        image_hash = hashlib.sha256(_to_bytes(machine_code, "little")).hexdigest()
+        return f"{image_hash} {stat.st_size} {stat.st_mtime_ns}"
+
+    def is_unchanged(
+        self, output_format: str, machine_code: "array[int]", path: str | Path
+    ) -> bool:
+        try:
+            stamp = self._get_stamp_path(output_format, path).read_text()
+            return stamp == self._get_stamp(machine_code, path)
+        except OSError:
+            return False
+
+    def store(self, output_format: str, machine_code: "array[int]", path: str | Path) -> None:
+        # без отметки файл просто будет записан в следующий раз
+        with contextlib.suppress(OSError):
+            self._directory.mkdir(parents=True, exist_ok=True)
+            _write_atomic(
+                self._get_stamp_path(output_format, path),
+                self._get_stamp(machine_code, path).encode(),
+            )
+
+
+def write_output(
+    machine_code: "array[int]",
+    path: str | Path,
+    output_format: str = "json",
+    stamps: Optional[OutputStamps] = None,
+) -> bool:
+    """Записывает образ памяти в формате output_format.
+    Возвращает False, если запись пропущена, потому что образ не изменился"""
+    if stamps is not None and stamps.is_unchanged(output_format, machine_code, path):
+        return False
+    writer, _ = WRITERS[output_format]
+    writer(machine_code, path)
+    if stamps is not None:
+        stamps.store(output_format, machine_code, path)
+    return True
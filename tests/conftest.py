@@ -0,0 +1,13 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# assembler.py лежит в корне репозитория, а .INCLUDE ищет файлы от текущей папки
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def repository_directory(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,56 @@
+from array import array
+from collections.abc import Iterable
+from typing import Any, Optional
+
+from salut.api import assemble, assemble_file
+from salut.errors import SimulatorError
+from salut.scheduler import InputTrace, Scheduler
+from salut.simulator import PORT_COUNT, Simulator
+
+
+def get_machine_code(source: str, optimize: bool = False) -> "array[int]":
+    """Собирает текст или файл (*.txt), при ошибке тест падает с её описанием"""
+    if source.endswith(".txt"):
+        result = assemble_file(source, optimize)
+    else:
+        result = assemble(source, optimize=optimize)
+    assert result.machine_code is not None, result.errors
+    return result.machine_code
+
+
+def run(
+    simulator_class: type[Simulator],
+    machine_code: Iterable[int],
+    max_instructions: Optional[int] = None,
+    trace: Optional[InputTrace] = None,
+    max_ticks: Optional[int] = None,
+) -> tuple[Simulator, dict[str, Any]]:
+    """Выполняет программу и возвращает симулятор и его состояние после выполнения:
+    регистры, флаги, память, вывод в порты и ошибку симулятора"""
+    simulator = simulator_class(machine_code)
+    outputs: list[list[int]] = [[] for _ in range(PORT_COUNT)]
+    simulator.out_handlers = [port_outputs.append for port_outputs in outputs]
+    error = None
+    try:
+        if trace is not None:
+            Scheduler(simulator, trace).run(max_ticks)
+        else:
+            simulator.run(max_instructions)
+    except SimulatorError as exception:
+        error = str(exception)
+    return simulator, {
+        "registers": list(simulator.registers),
+        "pc": simulator.pc,
+        "sp": simulator.sp,
+        "im": simulator.im,
+        "ia": simulator.ia,
+        "ps": simulator.ps,
+        "halted": simulator.halted,
+        "instruction_count": simulator.instruction_count,
+        "ticks": simulator.ticks,
+        "random_state": simulator.random_state,
+        "signals": simulator.signals,
+        "memory": list(simulator.memory),
+        "outputs": outputs,
+        "error": error,
+    }
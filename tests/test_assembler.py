@@ -0,0 +1,121 @@
+import pytest
+
+import assembler
+from assembler import Assembler
+from salut.api import assemble
+from salut.diagnostics import Diagnostics, Stats
+
+# метки до и после использования, одинаковые локальные метки у разных
+# глобальных, константа после использования и адрес в .DATA
+SYMBOLS = """
+start:
+    JMP later
+    .loop:
+    JMP .loop
+    MOV R1, SIZE
+    STR [value], R1
+later:
+    .loop:
+    JMP .loop
+    JMP start
+.EQU SIZE, 0x1234
+value:
+    .DATA later
+"""
+
+
+def test_names_are_resolved_before_and_after_definition():
+    result = assemble(SYMBOLS)
+    assert list(result.machine_code) == [
+        *(18, 8),  # JMP later
+        *(18, 2),  # JMP .loop (start)
+        *(433, 0x1234),  # MOV R1, SIZE
+        *(593, 12),  # STR [value], R1
+        *(18, 8),  # JMP .loop (later)
+        *(18, 0),  # JMP start
+        8,  # .DATA later
+    ]
+    assert result.global_labels == {"START": 0, "LATER": 8, "VALUE": 12}
+    assert result.local_labels == {"START": {".LOOP": 2}, "LATER": {".LOOP": 8}, "VALUE": {}}
+    assert result.constants == {"SIZE": 0x1234}
+
+
+def test_every_name_is_put_in_once():
+    stats = Stats()
+    assemble(SYMBOLS, stats=stats)
+    # слова с именами: later, .loop, SIZE, value, .loop, start, later
+    assert stats.to_dict()["counters"]["fixups"] == 7
+
+
+def test_every_use_of_undefined_name_is_reported():
+    result = assemble("MOV R1, a\nMOV R2, b\nJMP a")
+    assert result.machine_code is None
+    assert [(item.line, item.column, item.message) for item in result.errors] == [
+        (1, 9, "Undefined value: 'A'"),
+        (2, 9, "Undefined value: 'B'"),
+        (3, 5, "Undefined value: 'A'"),
+    ]
+
+
+def test_local_label_of_other_global_label_is_undefined():
+    result = assemble("start:\nJMP .missing\nother:\n.missing:\nSTOP")
+    assert [(item.line, item.message) for item in result.errors] == [
+        (2, "Undefined value: '.MISSING'")
+    ]
+
+
+def test_names_from_included_file_are_resolved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    library = ".EQU ANSWER, 42\nget_answer:\nMOV R1, ANSWER\nRET\n"
+    (tmp_path / "lib.txt").write_text(library, encoding="utf-8")
+    result = assemble("CALL get_answer\nMOV R2, ANSWER\nSTOP\n.INCLUDE lib.txt")
+    assert list(result.machine_code) == [3, 5, 434, 42, 1, 433, 42, 2]
+    assert result.global_labels == {"GET_ANSWER": 5}
+
+
+def get_long_program(routine_count: int) -> list[str]:
+    """Подпрограммы с локальными метками, ссылки вперёд и назад через границы частей"""
+    lines = ["start:", "CALL routine_0", "JMP end"]
+    for i in range(routine_count):
+        lines += [
+            f"routine_{i}:",
+            f"MOV R1, VALUE_{i}",
+            ".loop:",
+            "DEC R1, R1",
+            "JNZ .loop",
+            f"CALL routine_{(i + 1) % routine_count}",
+            f"STR [routine_{i // 2}], R1",
+            "RET",
+            f".EQU VALUE_{i}, {i}",
+            f".DATA {i}",
+            f".DATA routine_{routine_count - 1 - i}",
+        ]
+    return lines + ["end:", "STOP"]
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_parallel_assembly_equals_sequential(jobs, monkeypatch):
+    monkeypatch.setattr(assembler, "CHUNK_LINES", 100)
+    lines = get_long_program(200)
+    sequential = Assembler.assemble(lines, diagnostics=Diagnostics(echo=False))
+    assert sequential is not None
+    stats = Stats()
+    parallel = Assembler.assemble(
+        lines, jobs=jobs, diagnostics=Diagnostics(echo=False), stats=stats
+    )
+    assert parallel == sequential
+    assert stats.to_dict()["counters"]["lines"] == len(lines)
+
+
+def test_parallel_assembly_reports_same_errors(monkeypatch):
+    monkeypatch.setattr(assembler, "CHUNK_LINES", 100)
+    lines = get_long_program(200)
+    lines[501] = "MOVE R1, R2"
+    lines[1500] = "routine_3:"
+    reports = []
+    for jobs in (1, 2):
+        diagnostics = Diagnostics(echo=False)
+        assert Assembler.assemble(lines, jobs=jobs, diagnostics=diagnostics) is None
+        reports.append(diagnostics.items)
+    assert reports[0] == reports[1]
+    assert [item.line for item in reports[0] if item.kind != "info"] == [502, 1501]
@@ -0,0 +1,163 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from salut import batch
+from salut.api import assemble_file
+from salut.batch import Program, find_programs, load_manifest, remove_duplicates
+from salut.readers import read_image
+
+LIBRARY = """
+double:
+    ADD R1, R1, R1
+    RET
+"""
+PROGRAM = """
+.INCLUDE lib.txt
+MOV R1, {value}
+CALL double
+STOP
+"""
+
+
+@pytest.fixture
+def programs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Папка с двумя программами, включающими общий файл, и программой с ошибкой"""
+    monkeypatch.chdir(tmp_path)
+    Path("lib.txt").write_text(LIBRARY, encoding="utf-8")
+    Path("one.txt").write_text(PROGRAM.format(value=1), encoding="utf-8")
+    Path("two.txt").write_text(PROGRAM.format(value=2), encoding="utf-8")
+    Path("bad").mkdir()
+    Path("bad/broken.txt").write_text("MOV R1, undefined\nSTOP\n", encoding="utf-8")
+    return tmp_path
+
+
+def write_manifest(manifest: object) -> str:
+    Path("manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return "manifest.json"
+
+
+def run_batch(monkeypatch: pytest.MonkeyPatch, *args: str) -> int:
+    """Запускает salut.batch с аргументами args и возвращает код выхода"""
+    monkeypatch.setattr(sys, "argv", ["salut.batch", "-j", "1", *args])
+    try:
+        batch.main()
+    except SystemExit as error:
+        return error.code
+    return 0
+
+
+def test_manifest_with_paths_and_objects(programs):
+    manifest = write_manifest(
+        {
+            "format": "hex",
+            "output_dir": "build",
+            "programs": [
+                "one.txt",
+                {"path": "two.txt", "output": "two.json", "format": "json", "optimize": True},
+                {"path": "bad/broken.txt", "format": "bin-be"},
+            ],
+        }
+    )
+    assert load_manifest(manifest) == [
+        Program("one.txt", str(Path("build/one.hex")), "hex", False),
+        Program("two.txt", "two.json", "json", True),
+        Program("bad/broken.txt", str(Path("build/broken.bin")), "bin-be", False),
+    ]
+    assert load_manifest(write_manifest(["one.txt"]), optimize=True) == [
+        Program("one.txt", "one.bin", "bin", True)
+    ]
+
+
+@pytest.mark.parametrize(
+    ("manifest", "error"),
+    [
+        ({"programs": "one.txt"}, TypeError),
+        (["one.txt", 5], TypeError),
+        ([{"output": "one.bin"}], TypeError),
+        ([{"path": "one.txt", "output": 5}], TypeError),
+        ([{"path": "one.txt", "format": ["bin"]}], TypeError),
+        ([{"path": "one.txt", "format": "elf"}], ValueError),
+        ({"output_dir": 5, "programs": ["one.txt"]}, TypeError),
+        ({"format": None, "programs": ["one.txt"]}, TypeError),
+        ({"format": "elf", "programs": ["one.txt"]}, ValueError),
+    ],
+)
+def test_invalid_manifest_is_rejected(programs, manifest, error):
+    with pytest.raises(error):
+        load_manifest(write_manifest(manifest))
+
+
+def test_patterns_find_every_program_once(programs):
+    found = find_programs(["*.txt", "one.txt", "**/broken.txt"], "hex", "build")
+    assert [program.path for program in found] == [
+        "lib.txt",
+        "one.txt",
+        "two.txt",
+        str(Path("bad/broken.txt")),
+    ]
+    assert found[1].output == str(Path("build/one.hex"))
+    with pytest.raises(ValueError):
+        find_programs(["missing/*.txt"])
+
+
+def test_same_program_from_pattern_and_manifest_is_built_once(programs):
+    found = find_programs(["one.txt", "two.txt"])
+    found += load_manifest(write_manifest(["./one.txt", "bad/broken.txt"]))
+    assert [program.path for program in remove_duplicates(found)] == [
+        "one.txt",
+        "two.txt",
+        "bad/broken.txt",
+    ]
+
+
+def test_programs_written_to_one_file_are_rejected(programs):
+    Path("other").mkdir()
+    Path("other/broken.txt").write_text("STOP\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="both written"):
+        remove_duplicates(find_programs(["*/broken.txt"], output_directory="build"))
+    with pytest.raises(ValueError, match="both written"):
+        remove_duplicates(
+            load_manifest(
+                write_manifest([{"path": "one.txt"}, {"path": "two.txt", "output": "one.bin"}])
+            )
+        )
+    with pytest.raises(ValueError, match="different options"):
+        remove_duplicates(
+            load_manifest(write_manifest(["one.txt", {"path": "one.txt", "optimize": True}]))
+        )
+
+
+def test_shared_includes_are_found(programs):
+    assert batch.find_shared_includes(find_programs(["one.txt", "two.txt"])) == ["lib.txt"]
+    assert batch.find_shared_includes(find_programs(["one.txt"])) == []
+
+
+def test_failed_program_gives_exit_code_1(programs, monkeypatch):
+    code = run_batch(monkeypatch, "*.txt", "bad/*.txt", "-d", "build", "--report", "report.json")
+    report = json.loads(Path("report.json").read_text(encoding="utf-8"))
+    assert code == 1
+    assert report["programs"] == 4
+    assert report["failed"] == 1
+    results = {Path(result["path"]).name: result for result in report["results"]}
+    assert not results["broken.txt"]["ok"]
+    assert results["broken.txt"]["errors"] == 1
+    assert results["one.txt"]["ok"]
+    assert report["words"] == sum(result["words"] or 0 for result in report["results"])
+    # общий файл собран в кэш до программ, программы взяли его оттуда
+    assert results["one.txt"]["counters"]["include_cache_hits"] == 1
+    assert read_image("build/one.bin") == assemble_file("one.txt").machine_code
+
+
+def test_successful_batch_gives_exit_code_0(programs, monkeypatch, capsys):
+    assert run_batch(monkeypatch, "one.txt", "two.txt", "-f", "hex") == 0
+    assert Path("one.hex").is_file()
+    assert "2 programs, 0 failed" in capsys.readouterr().out
+
+
+def test_bad_manifest_is_reported_as_usage_error(programs, monkeypatch, capsys):
+    manifest = write_manifest([{"path": "one.txt", "output": 5}])
+    assert run_batch(monkeypatch, "--manifest", manifest) == 2
+    assert "output in manifest.json must be a str" in capsys.readouterr().err
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from salut import cache
+from salut.api import assemble
+from salut.cache import IncludeCache, MemoryIncludeCache
+from salut.diagnostics import Stats
+
+PROGRAM = "MOV R1, VALUE\nCALL routine\nSTOP\n.INCLUDE lib.txt\n"
+
+
+@pytest.fixture(params=["disk", "memory"])
+def include_cache(request, tmp_path, monkeypatch) -> IncludeCache:
+    """Кэш на диске и в памяти, текущая папка - временная с lib.txt и sub.txt"""
+    monkeypatch.chdir(tmp_path)
+    write("lib.txt", ".INCLUDE sub.txt\nroutine:\nMOV R2, 1\nRET\n")
+    write("sub.txt", ".EQU VALUE, 5\n")
+    return IncludeCache(tmp_path / "cache") if request.param == "disk" else MemoryIncludeCache()
+
+
+def write(path: str, text: str) -> None:
+    Path(path).write_text(text, encoding="utf-8")
+
+
+def build(include_cache: IncludeCache) -> tuple[list[int], int]:
+    """Машинный код и число включённых файлов, взятых из кэша"""
+    stats = Stats()
+    result = assemble(PROGRAM, include_cache=include_cache, stats=stats)
+    assert result.ok, result.errors
+    return list(result.machine_code), stats.to_dict()["counters"]["include_cache_hits"]
+
+
+def test_unchanged_include_is_taken_from_cache(include_cache):
+    code, hits = build(include_cache)
+    assert hits == 0
+    assert build(include_cache) == (code, 1)
+
+
+def test_changed_include_is_assembled_again(include_cache):
+    build(include_cache)
+    write("lib.txt", ".INCLUDE sub.txt\nroutine:\nMOV R2, 2\nRET\n")
+    code, hits = build(include_cache)
+    assert hits == 1  # только неизменённый sub.txt
+    assert code == list(assemble(PROGRAM).machine_code)
+    assert code[6] == 2
+
+
+def test_change_of_nested_include_invalidates_cache(include_cache):
+    build(include_cache)
+    write("sub.txt", ".EQU VALUE, 7\n")
+    code, hits = build(include_cache)
+    assert hits == 0
+    assert code[1] == 7
+
+
+def test_cache_of_other_assembler_version_is_not_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("lib.txt", "routine:\nRET\n.EQU VALUE, 5\n")
+    include_cache = IncludeCache(tmp_path / "cache")
+    build(include_cache)
+    monkeypatch.setattr(cache, "ASSEMBLER_VERSION", cache.ASSEMBLER_VERSION + "-next")
+    assert build(include_cache)[1] == 0
+    assert build(include_cache)[1] == 1
+
+
+def test_damaged_cache_file_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("lib.txt", "routine:\nRET\n.EQU VALUE, 5\n")
+    include_cache = IncludeCache(tmp_path / "cache")
+    code, _ = build(include_cache)
+    for unit_path in (tmp_path / "cache").iterdir():
+        unit_path.write_bytes(b"not a pickle")
+    assert build(include_cache) == (code, 0)
+    assert build(include_cache) == (code, 1)
@@ -0,0 +1,141 @@
+import random
+from array import array
+from pathlib import Path
+
+import pytest
+
+from salut.api import assemble
+from salut.compression import (
+    MAX_BLOCK,
+    RUN_BIT,
+    delta_decode,
+    delta_encode,
+    rle_decode,
+    rle_encode,
+)
+from salut.simulator import Simulator
+from salut.writers import write_output
+
+from helpers import run
+
+STRIDE = 16
+
+# читает все слова данных в output, распаковка - compression_lib.txt
+RLE_PROGRAM = """
+start:
+    MOV R1, data
+    CALL rle_start
+    MOV R4, output
+    MOV R5, {count}
+    .loop:
+        CALL rle_next
+        STR [R4], R1
+        INC R4, R4
+        DEC R5, R5
+        JNZ .loop
+    STOP
+"""
+DELTA_PROGRAM = """
+start:
+    MOV R1, data
+    MOV R2, buffer
+    MOV R3, {stride}
+    CALL delta_start
+    MOV R4, output
+    MOV R5, {count}
+    .loop:
+        CALL delta_next
+        STR [R4], R1
+        INC R4, R4
+        DEC R5, R5
+        JNZ .loop
+    STOP
+"""
+
+
+def get_words(count: int, seed: int = 0) -> "array[int]":
+    """Слова без сжатия, повторы разной длины и слова со старшим битом"""
+    generator = random.Random(seed)
+    words = array("H")
+    while len(words) < count:
+        word = generator.choice([0, 1, RUN_BIT, 0xFFFF, generator.randrange(0x10000)])
+        words += array("H", [word]) * generator.choice([1, 1, 2, 3, 7, 50])
+    return words[:count]
+
+
+def get_frames(frame_count: int) -> "array[int]":
+    """Кадры по STRIDE слов, каждый немного отличается от прошлого"""
+    generator = random.Random(1)
+    frame = [generator.randrange(0x10000) for _ in range(STRIDE)]
+    words = array("H")
+    for _ in range(frame_count):
+        frame[generator.randrange(STRIDE)] ^= 1 << generator.randrange(16)
+        words.extend(frame)
+    return words
+
+
+@pytest.mark.parametrize(
+    "words",
+    [
+        array("H"),
+        array("H", [5]),
+        array("H", [7, 7]),
+        array("H", [7, 7, 7]),
+        get_words(2000),
+        # блоки длиннее MAX_BLOCK делятся на несколько
+        array("H", [0xABCD]) * (MAX_BLOCK + 10),
+        array("H", range(MAX_BLOCK + 10)),
+    ],
+    ids=["empty", "one", "two", "run", "mixed", "long run", "long literals"],
+)
+def test_rle_round_trip(words):
+    encoded = rle_encode(words)
+    assert rle_decode(encoded) == words
+    assert delta_decode(delta_encode(words, 3), 3) == words
+
+
+def test_compression_makes_repeated_data_smaller():
+    assert len(rle_encode(array("H", [1]) * 1000)) == 2
+    frames = get_frames(100)
+    assert len(delta_encode(frames, STRIDE)) < len(rle_encode(frames)) < len(frames) * 2
+
+
+def decode_on_processor(
+    source: str,
+    directive: str,
+    words: "array[int]",
+    directory: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> list[int]:
+    """Собирает программу с compression_lib.txt и данными words в директиве,
+    выполняет её и возвращает слова из output"""
+    source += Path("compression_lib.txt").read_text(encoding="utf-8")
+    source += f"data:\n    {directive}\nbuffer:\n" + "    .DATA 0\n" * STRIDE
+    source += "output:\n    .DATA 0\n"
+    # .RLE и .DELTA ищут файл от текущей папки
+    monkeypatch.chdir(directory)
+    write_output(words, "data.bin", "bin")
+    result = assemble(source)
+    assert result.ok, result.errors
+    simulator, state = run(Simulator, result.machine_code)
+    assert state["halted"]
+    assert state["error"] is None
+    output = result.global_labels["OUTPUT"]
+    return list(simulator.memory[output : output + len(words)])
+
+
+def test_rle_data_is_decoded_on_processor(tmp_path, monkeypatch):
+    words = get_words(3000)
+    source = RLE_PROGRAM.format(count=len(words))
+    assert decode_on_processor(
+        source, ".RLE data.bin", words, tmp_path, monkeypatch
+    ) == list(words)
+
+
+def test_delta_data_is_decoded_on_processor(tmp_path, monkeypatch):
+    words = get_frames(200)
+    source = DELTA_PROGRAM.format(stride=STRIDE, count=len(words))
+    directive = f".DELTA data.bin, {STRIDE}"
+    assert decode_on_processor(
+        source, directive, words, tmp_path, monkeypatch
+    ) == list(words)
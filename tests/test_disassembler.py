@@ -0,0 +1,101 @@
+import json
+import sys
+from array import array
+
+import pytest
+
+from salut import disassembler
+from salut.api import assemble, assemble_file
+from salut.disassembler import Disassembler
+from salut.readers import read_image
+from salut.writers import write_output
+
+from helpers import get_machine_code
+
+PROGRAMS = ["program.txt", "pixel_move.txt", "bad_apple_program.txt", "compression_lib.txt"]
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_disassembled_program_assembles_into_same_image(path):
+    machine_code = get_machine_code(path)
+    text = Disassembler(machine_code).disassemble(listing=False)
+    assert get_machine_code("\n".join(text)) == machine_code
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_disassembled_program_with_labels_assembles_into_same_image(path):
+    result = assemble_file(path)
+    text = Disassembler(
+        result.machine_code, result.global_labels, result.local_labels
+    ).disassemble(listing=False)
+    reassembled = assemble(text)
+    assert reassembled.machine_code == result.machine_code
+    assert reassembled.global_labels == result.global_labels
+
+
+def test_data_words_are_kept():
+    # второе слово MOV R1, Imm под меткой и слово без инструкции - это данные
+    machine_code = get_machine_code("start:\nMOV R1, 5\nSTOP\n.DATA 0x0024\n.DATA 0x0011")
+    labels = {"START": 0, "TAIL": 4}
+    text = Disassembler(machine_code, labels).disassemble(listing=False)
+    assert "    .DATA 0x0024" in text
+    assert text[-2:] == ["TAIL:", "    .DATA 0x0011"]
+    assert assemble(text).machine_code == machine_code
+
+
+def test_listing_shows_addresses_and_words():
+    lines = Disassembler(get_machine_code("MOV R1, 5\nSTOP")).disassemble()
+    assert lines[0].startswith("0000  ")
+    assert lines[1].startswith("0002  0001")
+    assert lines[1].endswith("STOP")
+
+
+@pytest.mark.parametrize("output_format", ["json", "bin", "bin-be", "hex"])
+def test_command_line_round_trip(output_format, tmp_path, monkeypatch, capsys):
+    machine_code = get_machine_code("pixel_move.txt")
+    image = tmp_path / f"image.{output_format}"
+    if output_format == "json":
+        image.write_text('{"data": []}', encoding="utf-8")
+    write_output(machine_code, image, output_format)
+    argv = ["salut.disassembler", str(image), "-f", output_format, "--plain"]
+    monkeypatch.setattr(sys, "argv", argv + ["-s", "pixel_move.txt"])
+    disassembler.main()
+    assert assemble(capsys.readouterr().out).machine_code == machine_code
+
+
+def test_images_are_read_in_every_format(tmp_path):
+    words = array("H", [0x1234, 0xABCD, 0x0000, 0xFFFF])
+    (tmp_path / "image.bin").write_bytes(bytes.fromhex("3412CDAB0000FFFF"))
+    (tmp_path / "image.be").write_bytes(bytes.fromhex("1234ABCD0000FFFF"))
+    (tmp_path / "image.json").write_text(
+        json.dumps({"name": "block", "data": [0x1234, 0xABCD, 0, -1]}), encoding="utf-8"
+    )
+    (tmp_path / "image.hex").write_text(
+        ":080000003412CDAB0000FFFF3C\n:00000001FF\n", encoding="ascii"
+    )
+    assert read_image(tmp_path / "image.bin") == words
+    assert read_image(tmp_path / "image.be", "bin-be") == words
+    assert read_image(tmp_path / "image.json") == words
+    assert read_image(tmp_path / "image.hex") == words
+
+
+def test_intel_hex_above_64_kib_is_read(tmp_path):
+    # записи расширенного адреса, пропуски между записями заполняются нулями
+    (tmp_path / "image.hex").write_text(
+        ":0400000001000200F9\n:020000040001F9\n:02000200FFFFFE\n:00000001FF\n",
+        encoding="ascii",
+    )
+    words = read_image(tmp_path / "image.hex")
+    assert len(words) == 0x8002
+    assert words[:2] == array("H", [1, 2])
+    assert words[0x8001] == 0xFFFF
+    assert not any(words[2:0x8001])
+
+
+def test_invalid_images_are_rejected(tmp_path):
+    (tmp_path / "odd.bin").write_bytes(b"\x01\x02\x03")
+    with pytest.raises(ValueError, match="odd number of bytes"):
+        read_image(tmp_path / "odd.bin")
+    (tmp_path / "bad.hex").write_text(":0400000001000200F8\n", encoding="ascii")
+    with pytest.raises(ValueError, match="line 1"):
+        read_image(tmp_path / "bad.hex")
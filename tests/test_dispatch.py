@@ -0,0 +1,75 @@
+import pytest
+
+from salut.api import assemble
+from salut.decoder import DECODE_TABLE
+from salut.disassembler import Disassembler
+from salut.dispatch import INSTRUCTION_INDEX, classify_operand
+from salut.utils import (
+    FLAG,
+    IMMEDIATE,
+    PORT,
+    REG,
+    SQUARED_IMMEDIATE,
+    SQUARED_REG,
+    SQUARED_SUM_REG,
+)
+
+from helpers import get_machine_code
+
+# пример операнда каждого класса, специальные регистры - сами себя
+EXAMPLES = {
+    REG: "R3",
+    SQUARED_REG: "[R5]",
+    SQUARED_SUM_REG: "[R6+R7]",
+    IMMEDIATE: "1",
+    SQUARED_IMMEDIATE: "[1]",
+    FLAG: "Z",
+    PORT: "P2",
+}
+# (мнемоника, классы операндов) всех инструкций процессора
+SIGNATURES = [
+    (name, signature)
+    for (name, signature), instruction in INSTRUCTION_INDEX.items()
+    if instruction.opcode is not None
+]
+
+
+@pytest.mark.parametrize(
+    ("name", "signature"),
+    SIGNATURES,
+    ids=[f"{name} {', '.join(signature)}" for name, signature in SIGNATURES],
+)
+def test_instruction_is_found_by_its_operands(name, signature):
+    operands = ", ".join(EXAMPLES.get(kind, kind) for kind in signature)
+    machine_code = get_machine_code(f"{name} {operands}")
+    # у псевдонимов (MOV PC, Imm = JMP Imm; ADD Reg, Imm, Reg) тот же опкод
+    assert DECODE_TABLE[machine_code[0]].opcode == INSTRUCTION_INDEX[name, signature].opcode
+    # операнды закодированы туда, откуда их читает дизассемблер
+    text = Disassembler(machine_code).disassemble(listing=False)
+    assert get_machine_code("\n".join(text)) == machine_code
+
+
+def test_register_sum_is_not_an_immediate_address():
+    assert classify_operand("[R1+R2]") == SQUARED_SUM_REG
+    assert classify_operand("[R1]") == SQUARED_REG
+    assert classify_operand("[LABEL]") == SQUARED_IMMEDIATE
+    load, store = get_machine_code("LDR R1, [R2+R3]\nSTR [R2+R3], R1")[:2]
+    assert DECODE_TABLE[load].operand_kinds == (REG, SQUARED_SUM_REG)
+    assert DECODE_TABLE[store].operand_kinds == (SQUARED_SUM_REG, REG)
+
+
+@pytest.mark.parametrize(
+    ("source", "message"),
+    [
+        ("MOVE R1, R2", "Unknown instruction 'MOVE'"),
+        ("MOV R1", "expected 2 operands"),
+        ("MOV R1, R2, R3", "expected 2 operands"),
+        ("OUT R1, P0", "OUT"),
+        ("MOV R1,, R2", "Missing operand"),
+    ],
+)
+def test_wrong_operands_are_reported(source, message):
+    result = assemble(source)
+    assert result.machine_code is None
+    assert len(result.errors) == 1
+    assert message in result.errors[0].message
@@ -0,0 +1,147 @@
+import json
+from array import array
+from typing import Optional
+
+import pytest
+
+from assembler import Assembler
+from salut.api import assemble
+from salut.diagnostics import Diagnostics
+from salut.linker import RAM_SIZE, Linker
+from salut.objects import OBJECT_FORMAT_VERSION, ObjectUnit
+
+from helpers import get_machine_code
+
+# main использует метку и константу из lib, lib - метку из main
+MAIN = """
+start:
+    MOV R1, STEPS
+    CALL count
+    OUT P0, R2
+    STOP
+counter:
+    .DATA 0
+"""
+LIBRARY = """
+.EQU STEPS, 5
+count:
+    MOV R2, 0
+    .loop:
+    INC R2, R2
+    STR [counter], R2
+    CMP R2, R1
+    JL .loop
+    RET
+"""
+
+
+def compile_unit(source: str, path: Optional[str] = None) -> ObjectUnit:
+    unit = Assembler.compile(source.splitlines(), path, diagnostics=Diagnostics(echo=False))
+    assert unit is not None
+    return unit
+
+
+def link(*units: ObjectUnit) -> tuple[Optional["array[int]"], Diagnostics]:
+    diagnostics = Diagnostics(echo=False)
+    return Linker.link_units(units, diagnostics), diagnostics
+
+
+def test_linked_units_equal_one_file():
+    machine_code, diagnostics = link(
+        compile_unit(MAIN, "main.txt"), compile_unit(LIBRARY, "lib.txt")
+    )
+    assert not diagnostics.errors
+    assert machine_code == get_machine_code(MAIN + LIBRARY)
+
+
+def test_unit_with_includes_links_like_assembled_file():
+    with open("pixel_move.txt", encoding="utf-8") as program_file:
+        unit = Assembler.compile(program_file, "pixel_move.txt")
+    assert unit is not None
+    machine_code, _ = link(unit)
+    assert machine_code == get_machine_code("pixel_move.txt")
+
+
+def test_linker_exports_symbols_of_all_units():
+    linker = Linker(Diagnostics(echo=False))
+    linker.add(compile_unit(MAIN, "main.txt"))
+    linker.add(compile_unit(LIBRARY, "lib.txt"))
+    assert linker.link() is not None
+    result = assemble(MAIN + LIBRARY)
+    assert linker.global_labels == result.global_labels
+    assert linker.local_labels == result.local_labels
+    assert linker.constants == result.constants
+    assert linker.units == [(0, "main.txt"), (result.global_labels["COUNT"], "lib.txt")]
+
+
+def test_object_file_round_trip(tmp_path):
+    unit = compile_unit(MAIN + LIBRARY, "program.txt")
+    path = tmp_path / "program.sobj"
+    unit.save(path)
+    loaded = ObjectUnit.load(path)
+    for name in (
+        "code",
+        "fixups",
+        "global_labels",
+        "local_labels",
+        "constants",
+        "dependencies",
+        "relocations",
+        "line_map",
+        "path",
+        "instruction_words",
+    ):
+        assert getattr(loaded, name) == getattr(unit, name), name
+    assert loaded.instruction_words
+
+
+def test_object_file_with_imports_round_trip(tmp_path):
+    main, library = compile_unit(MAIN, "main.txt"), compile_unit(LIBRARY, "lib.txt")
+    assert main.fixups and library.fixups and library.relocations
+    main.save(tmp_path / "main.sobj")
+    library.save(tmp_path / "lib.sobj")
+    loaded = [ObjectUnit.load(tmp_path / name) for name in ("main.sobj", "lib.sobj")]
+    assert link(*loaded)[0] == link(main, library)[0]
+
+
+def test_object_file_of_other_version_is_rejected(tmp_path):
+    path = tmp_path / "program.sobj"
+    compile_unit(MAIN + LIBRARY).save(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["version"] = OBJECT_FORMAT_VERSION - 1
+    path.write_text(json.dumps(data), encoding="utf-8")
+    with pytest.raises(ValueError, match="object format version"):
+        ObjectUnit.load(path)
+    path.write_text(json.dumps({"data": []}), encoding="utf-8")
+    with pytest.raises(ValueError, match="not a SALUT object file"):
+        ObjectUnit.load(path)
+
+
+def test_symbol_defined_twice_is_link_error():
+    machine_code, diagnostics = link(
+        compile_unit(MAIN + LIBRARY, "main.txt"), compile_unit(LIBRARY, "lib.txt")
+    )
+    assert machine_code is None
+    assert [item.kind for item in diagnostics.errors] == ["LinkError", "LinkError"]
+    assert "already defined in main.txt" in diagnostics.errors[0].message
+
+
+def test_missing_symbol_is_undefined_value_error():
+    machine_code, diagnostics = link(compile_unit(MAIN, "main.txt"))
+    assert machine_code is None
+    assert {item.kind for item in diagnostics.errors} == {"UndefinedValueError"}
+    assert {item.path for item in diagnostics.errors} == {"main.txt"}
+
+
+def test_too_large_program_is_link_error():
+    memory = ObjectUnit(array("H", [0]) * RAM_SIZE, [], {}, {}, {}, [])
+    machine_code, diagnostics = link(memory, compile_unit("STOP"))
+    assert machine_code is None
+    assert [item.kind for item in diagnostics.errors] == ["LinkError"]
+    assert "too large" in diagnostics.errors[0].message
+
+
+def test_too_large_file_is_memory_overflow_error():
+    result = assemble("MOV R1, 5\n" * (RAM_SIZE // 2 + 1))
+    assert result.machine_code is None
+    assert [item.kind for item in result.errors] == ["MemoryOverflowError"]
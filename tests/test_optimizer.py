@@ -0,0 +1,170 @@
+import pytest
+
+from salut.api import assemble, assemble_file
+from salut.decoder import DECODE_TABLE
+from salut.scheduler import InputTrace
+from salut.semantics import writes_interrupt_address
+from salut.simulator import BlockSimulator
+
+from helpers import get_machine_code, run
+
+# адреса и число инструкций после оптимизации другие, поэтому сравниваются
+# только результаты: вывод в порты, остановка и ошибка
+RESULT_KEYS = ("outputs", "halted", "error")
+# в отдельных инструкциях регистры не хранят адресов, их можно сравнить тоже
+STATE_KEYS = RESULT_KEYS + ("registers", "sp", "ps", "random_state", "signals")
+
+CASES = {
+    "jumps": """
+        start:
+        MOV R1, 5
+        JMP .next
+        .next:
+        CMP R1, 5
+        JE .equal
+        MOV R2, 1
+        .equal:
+        JMP .chain
+        .back:
+        OUT P0, R1
+        OUT P1, R2
+        STOP
+        .chain:
+        JMP .back
+    """,
+    "repeated values": """
+        MOV R3, 500
+        MOV R3, 500
+        MOV R1, 7
+        CMP R1, 500
+        MOV R2, PS
+        ADD R4, R3, 500
+        MOV R5, R3
+        MOV R5, R3
+        SUB R6, R5, 7
+        OUT P0, R4
+        OUT P1, R6
+        STOP
+    """,
+    "assumed register": """
+        MOV R15, 1
+        .ASSUME R15, 1
+        MOV R1, 10
+        SUB R1, R1, 1
+        ADD R2, R1, 1
+        SHL R3, R2, 1
+        OUT P0, R3
+        STOP
+    """,
+    "unused routines": """
+        MOV R1, 3
+        CALL double
+        OUT P0, R1
+        STOP
+        double:
+            ADD R1, R1, R1
+            RET
+        unused:
+            MOV R1, 99
+            RET
+        unused_too:
+            JMP unused
+    """,
+    # second вызывается только по вычисленному адресу: first + 3 слова
+    "kept routine": """
+        MOV R1, first
+        ADD R1, R1, 3
+        CALL R1
+        OUT P0, R2
+        STOP
+        first:
+            MOV R2, 1
+            RET
+        second:
+            MOV R2, 2
+            RET
+        .KEEP second
+    """,
+}
+
+
+def assert_same_results(source: str, keys: tuple[str, ...] = RESULT_KEYS, **kwargs) -> dict:
+    """Выполняет программу, собранную без оптимизации и с ней, и сравнивает keys"""
+    _, plain = run(BlockSimulator, get_machine_code(source), **kwargs)
+    _, optimized = run(BlockSimulator, get_machine_code(source, optimize=True), **kwargs)
+    assert {key: optimized[key] for key in keys} == {key: plain[key] for key in keys}
+    return plain
+
+
+@pytest.mark.parametrize("path", ["program.txt", "bad_apple_program.txt"])
+def test_optimized_programs_give_the_same_output(path):
+    state = assert_same_results(path)
+    assert state["halted"]
+    assert state["error"] is None
+
+
+def test_optimized_interrupt_handlers_give_the_same_output():
+    events = [(500, 3), (900, 3), (1400, 1), (2000, 7), (2600, 0), (3100, 7)]
+    state = assert_same_results(
+        "pixel_move.txt",
+        trace=InputTrace((tick, 0, button) for tick, button in events),
+        max_ticks=6000,
+    )
+    assert state["outputs"][0]
+
+
+@pytest.mark.parametrize("source", CASES.values(), ids=CASES)
+def test_optimized_instructions_give_the_same_state(source):
+    state = assert_same_results(source, STATE_KEYS)
+    assert state["halted"]
+    assert state["error"] is None
+
+
+def test_optimizer_makes_code_shorter():
+    # в "kept routine" удалять нечего
+    for name in ("jumps", "repeated values", "assumed register", "unused routines"):
+        source = CASES[name]
+        assert len(get_machine_code(source, optimize=True)) < len(get_machine_code(source))
+
+
+def test_kept_routine_is_called_by_computed_address():
+    _, state = run(BlockSimulator, get_machine_code(CASES["kept routine"], optimize=True))
+    assert state["outputs"][0] == [2]
+    assert "SECOND" in assemble(CASES["kept routine"], optimize=True).global_labels
+    # без .KEEP участок second удаляется
+    source = CASES["kept routine"].replace(".KEEP second", "")
+    assert "SECOND" not in assemble(source, optimize=True).global_labels
+
+
+def test_labels_of_removed_routines_are_dropped():
+    plain = assemble(CASES["unused routines"])
+    optimized = assemble(CASES["unused routines"], optimize=True)
+    assert {"UNUSED", "UNUSED_TOO"} <= plain.global_labels.keys()
+    assert optimized.global_labels.keys() == {"DOUBLE"}
+    # оставшиеся метки указывают на свой код, а не на следующий живой
+    addresses = list(optimized.global_labels.values())
+    assert len(set(addresses)) == len(addresses)
+    assert addresses[0] < len(optimized.machine_code)
+
+
+def test_labels_of_removed_library_routines_are_dropped():
+    plain = assemble_file("pixel_move.txt").global_labels
+    optimized = assemble_file("pixel_move.txt", optimize=True).global_labels
+    assert optimized.keys() < plain.keys()
+    assert len(set(optimized.values())) == len(optimized)
+
+
+
+def test_instructions_writing_interrupt_address():
+    written = {
+        (instruction.names[0], instruction.operand_kinds)
+        for instruction in DECODE_TABLE
+        if instruction is not None and writes_interrupt_address(instruction)
+    }
+    # чтение IA (MOV Reg, IA; PUSH IA; CALL IA) обработчик не меняет
+    assert written == {
+        ("MOV", ("IA", "Imm")),
+        ("MOV", ("IA", "Reg")),
+        ("POP", ("IA",)),
+        ("PEEK", ("IA",)),
+    }
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+
+from salut.server import AssemblerServer
+
+
+def serve(*requests: dict) -> list[dict]:
+    """Передаёт запросы серверу через потоки и возвращает ответы"""
+    responses = io.StringIO()
+    lines = "".join(json.dumps(request) + "\n" for request in requests)
+    AssemblerServer().serve(io.StringIO(lines), responses)
+    return [json.loads(line) for line in responses.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize(
+    "request_",
+    [
+        {"path": None},
+        # 0 и 1 иначе открылись бы как стандартный ввод и вывод
+        {"path": 0},
+        {"path": 1},
+        {"path": "-"},
+        {"path": "program.txt", "text": 5},
+        {"path": "program.txt", "output": ["program.bin"]},
+        {"path": "program.txt", "format": {}},
+        {},
+    ],
+)
+def test_bad_request_gets_error_and_server_goes_on(request_):
+    bad, good = serve({"id": 1, **request_}, {"id": 2, "path": "program.txt"})
+    assert bad["id"] == 1
+    assert not bad["ok"]
+    assert bad["error"]
+    assert good == {**good, "id": 2, "ok": True, "words": 9}
+
+
+def test_text_is_assembled_instead_of_file():
+    (response,) = serve({"path": "program.txt", "text": "MOV R1, 5\nSTOP"})
+    assert response["ok"]
+    assert response["words"] == 3
@@ -0,0 +1,220 @@
+import pytest
+
+from salut import devices
+from salut.devices import Screen
+from salut.errors import SimulatorError
+from salut.scheduler import InputTrace
+from salut.simulator import BlockSimulator, Simulator
+
+from helpers import get_machine_code, run
+
+# программы из репозитория: путь и сколько инструкций выполнять
+PROGRAMS = [
+    ("program.txt", None),
+    ("debug.txt", 1000),
+    ("compression_lib.txt", 20000),
+    ("bad_apple_program.txt", 300000),
+]
+
+# отдельные инструкции: флаги, деление на ноль, стек через границу памяти,
+# изменение собственного кода
+CASES = {
+    "add flags": """
+        MOV R1, 0x7FFF
+        ADD R2, R1, 1
+        MOV R3, PS
+        ADD R4, R1, 0x8001
+        MOV R5, PS
+        ADC R6, R1, R0
+        MOV R7, PS
+        STOP
+    """,
+    "subtract flags": """
+        start:
+        MOV R1, 5
+        CMP R1, 7
+        MOV R2, PS
+        SUB R3, R1, 0x8000
+        MOV R4, PS
+        SBC R5, R1, 3
+        MOV R6, PS
+        CMP 0x8000, R1
+        MOV R7, PS
+        JL .less
+        MOV R8, 1
+        .less:
+        JG .end
+        MOV R9, 1
+        .end:
+        STOP
+    """,
+    "unary flags": """
+        MOV R1, 0x8000
+        NEG R2, R1
+        MOV R3, PS
+        ABS R4, R1
+        MOV R5, PS
+        MOV R6, 0xFFFF
+        INC R7, R6
+        MOV R8, PS
+        DEC R9, R0
+        MOV R10, PS
+        NOT R11, R6
+        MOV R12, PS
+        STOP
+    """,
+    "shifts and logic": """
+        MOV R1, 0x8001
+        SHL R2, R1, 1
+        MOV R3, PS
+        ROR R4, R1, 1
+        SHR R5, R1, 15
+        ROL R6, R1, 17
+        MUL R7, R1, 3
+        MOV R8, PS
+        XNOR R9, R1, 0x00FF
+        MOV R10, PS
+        MSB R1
+        MOV R11, PS
+        LSB R1
+        MOV R12, PS
+        STOP
+    """,
+    "manual flags": """
+        start:
+        MOV PS, 0b01001
+        MOV R1, PS
+        MOV F2, 1
+        MOV R2, F0
+        MOV R3, PS
+        SL
+        MOV R4, PS
+        JL .signed_less
+        MOV R5, 1
+        .signed_less:
+        STOP
+    """,
+    "division by zero": """
+        MOV R1, 100
+        DIV R2, R3, R1, R0
+        MOV R4, PS
+        REM R5, R1, R0
+        DIV R6, R1, 0
+        MOV R7, PS
+        MOV R11, 7
+        DIV R8, R9, R1, R11
+        REM R10, R1, R11
+        DIV R12, R1, 7
+        STOP
+    """,
+    "stack wrap": """
+        POP R1
+        MOV R2, SP
+        PUSH R2
+        PUSH R2
+        MOV R3, SP
+        PEEK R4
+        DROP
+        DROP
+        DROP
+        MOV R5, SP
+        CALL function
+        PUSH PS
+        POP R7
+        STOP
+        function:
+            MOV R6, SP
+            RET
+    """,
+    "random": """
+        RND R1
+        RND R2
+        RND R3
+        STOP
+    """,
+    "self-modifying code": """
+        CALL patched
+        MOV R2, source
+        LDR R1, [R2]
+        STR [patched], R1
+        INC R2, R2
+        LDR R1, [R2]
+        MOV R3, patched
+        INC R3, R3
+        STR [R3], R1
+        CALL patched
+        STOP
+        source:
+            MOV R5, 42
+        patched:
+            NOP
+            NOP
+            RET
+    """,
+    "ports": """
+        OUT P0, 0x1234
+        MOV R1, 7
+        OUT P1, R1
+        IN R2, P0
+        STOP
+    """,
+}
+
+
+def assert_same_run(machine_code, **kwargs) -> dict:
+    _, interpreted = run(Simulator, machine_code, **kwargs)
+    _, translated = run(BlockSimulator, machine_code, **kwargs)
+    assert interpreted == translated
+    return interpreted
+
+
+@pytest.mark.parametrize(("path", "max_instructions"), PROGRAMS)
+def test_programs_run_the_same_in_both_modes(path, max_instructions):
+    state = assert_same_run(get_machine_code(path), max_instructions=max_instructions)
+    assert state["error"] is None
+
+
+def test_interrupts_run_the_same_in_both_modes():
+    # курсор двигается и ставит точки, пока программа мигает курсором
+    trace = InputTrace(
+        (tick, 0, button)
+        for tick, button in [(500, 3), (900, 3), (1400, 1), (2000, 7), (2600, 0), (3100, 7)]
+    )
+    state = assert_same_run(get_machine_code("pixel_move.txt"), trace=trace, max_ticks=6000)
+    assert state["error"] is None
+    assert state["outputs"][0]
+
+
+@pytest.mark.parametrize("source", CASES.values(), ids=CASES)
+def test_instructions_run_the_same_in_both_modes(source):
+    state = assert_same_run(get_machine_code(source))
+    assert state["halted"]
+    assert state["error"] is None
+
+
+def test_self_modifying_code_is_executed_after_change():
+    for simulator_class in (Simulator, BlockSimulator):
+        simulator, _ = run(simulator_class, get_machine_code(CASES["self-modifying code"]))
+        assert simulator.registers[5] == 42
+
+
+def test_unknown_instruction_is_reported_the_same_in_both_modes():
+    # 0x0024 - слово без инструкции, до него выполняется RND
+    state = assert_same_run([0x0023, 0x0024])
+    assert "Unknown instruction" in state["error"]
+
+
+def test_raw_frames_without_numpy(tmp_path, monkeypatch):
+    monkeypatch.setattr(devices, "np", None)
+    simulator = Simulator(get_machine_code("OUT P0, 0x1C21\nSTOP"))  # пиксель и показ
+    screen = Screen()
+    screen.attach(simulator)
+    simulator.run()
+    screen.flush()
+    # без NumPy кадры сохраняются байтами, а в .npy - нельзя
+    screen.save_raw(tmp_path / "frames.bin")
+    assert (tmp_path / "frames.bin").read_bytes() == b"".join(screen.frames)
+    assert screen.frame_count == 1
+    with pytest.raises(SimulatorError, match="NumPy is required"):
+        screen.save_raw(tmp_path / "frames.npy")
+    assert not (tmp_path / "frames.npy").exists()
@@ -0,0 +1,91 @@
+import pytest
+
+from salut.api import assemble
+from salut.tokenizer import EMPTY, Label, Operand, Statement, tokenize_line
+from salut.utils import IMMEDIATE, REG, SQUARED_IMMEDIATE, SQUARED_SUM_REG
+
+
+@pytest.mark.parametrize("line", ["", "   ", "; comment", "\t  ; comment"])
+def test_empty_lines(line):
+    assert tokenize_line(line) is None
+
+
+@pytest.mark.parametrize(
+    ("line", "label"),
+    [("loop:", Label("LOOP", 1)), ("  .end: ; comment", Label(".END", 3))],
+)
+def test_labels(line, label):
+    assert tokenize_line(line) == label
+
+
+def test_statement_without_operands():
+    assert tokenize_line("  stop ; end") == Statement("STOP", (), (), 3)
+
+
+def test_operands_and_columns():
+    # столбцы считаются с единицы от начала строки, табуляция - один столбец
+    assert tokenize_line("\tldr r1,  [r2 + r3] ; comment") == Statement(
+        "LDR",
+        (
+            Operand(REG, 1, "R1", 6),
+            Operand(SQUARED_SUM_REG, (2, 3), "[R2+R3]", 11),
+        ),
+        (REG, SQUARED_SUM_REG),
+        2,
+    )
+    assert tokenize_line("STR [counter], R2") == Statement(
+        "STR",
+        (Operand(SQUARED_IMMEDIATE, "COUNTER", "[COUNTER]", 5), Operand(REG, 2, "R2", 16)),
+        (SQUARED_IMMEDIATE, REG),
+        1,
+    )
+
+
+@pytest.mark.parametrize(
+    ("text", "value"),
+    [
+        ("42", 42),
+        ("-5", -5),
+        ("0x1f", 31),
+        ("0b101", 5),
+        ("1_000", 1000),
+        ("'A'", 65),
+        ("label", "LABEL"),
+    ],
+)
+def test_immediate_values(text, value):
+    statement = tokenize_line(f"MOV R1, {text}")
+    assert statement.operands[1].kind == IMMEDIATE
+    assert statement.operands[1].value == value
+
+
+def test_missing_operand_is_kept_with_its_column():
+    statement = tokenize_line("MOV R1,,R2")
+    assert statement.operands[1] == Operand(EMPTY, None, "", 8)
+    assert statement.signature == (REG, EMPTY, REG)
+
+
+@pytest.mark.parametrize(
+    ("source", "kind", "line", "column"),
+    [
+        ("MOV R1, undefined", "UndefinedValueError", 1, 9),
+        ("STOP\n  MOVE R1, R2", "InstructionError", 2, 3),
+        ("MOV R1,, R2", "OperandError", 1, 8),
+        ("  MOV R1, [R2+R3+R4]", "UndefinedValueError", 1, 11),
+        ("label:\nlabel:\nSTOP", "AssemblerNameError", 2, 1),
+        ("  .local:\nSTOP", "AssemblerNameError", 1, 3),
+    ],
+)
+def test_errors_point_to_line_and_column(source, kind, line, column):
+    result = assemble(source)
+    assert result.machine_code is None
+    assert [(item.kind, item.line, item.column) for item in result.errors] == [
+        (kind, line, column)
+    ]
+
+
+def test_case_and_spaces_do_not_change_machine_code():
+    plain = assemble("start:\nLDR R1, [R2+R3]\nJMP start").machine_code
+    spaced = assemble("  Start:  ; x\n\tldr   r1 ,[ r2 + r3 ]\n  jmp START ; y").machine_code
+    assert plain is not None
+    assert spaced == plain
@@ -0,0 +1,103 @@
+import json
+import os
+import random
+import stat
+from array import array
+
+import pytest
+
+from salut import writers
+from salut.readers import read_image
+from salut.writers import WRITERS, OutputStamps, write_output
+
+
+def get_image(word_count: int) -> "array[int]":
+    generator = random.Random(word_count)
+    return array("H", (generator.randrange(0x10000) for _ in range(word_count)))
+
+
+@pytest.mark.parametrize("output_format", WRITERS)
+# 40000 слов - больше 64 KiB, в Intel HEX нужны записи расширенного адреса
+@pytest.mark.parametrize("word_count", [0, 1, 9, 40000])
+def test_image_is_read_back(output_format, word_count, tmp_path):
+    path = tmp_path / f"image{WRITERS[output_format][1]}"
+    if output_format == "json":
+        path.write_text('{"name": "block", "data": [1, 2, 3]}', encoding="utf-8")
+    machine_code = get_image(word_count)
+    assert write_output(machine_code, path, output_format)
+    assert read_image(path, output_format) == machine_code
+
+
+def test_memory_block_data_keeps_other_fields(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text('{"name": "block", "data": [], "size": 7}', encoding="utf-8")
+    write_output(array("H", [5, 0xFFFF]), path, "json")
+    assert json.loads(path.read_text(encoding="utf-8")) == {
+        "name": "block",
+        "data": [5, 0xFFFF],
+        "size": 7,
+    }
+
+
+def test_binary_byte_orders(tmp_path):
+    machine_code = array("H", [0x1234, 0xABCD])
+    write_output(machine_code, tmp_path / "le.bin", "bin")
+    write_output(machine_code, tmp_path / "be.bin", "bin-be")
+    assert (tmp_path / "le.bin").read_bytes() == bytes.fromhex("3412CDAB")
+    assert (tmp_path / "be.bin").read_bytes() == bytes.fromhex("1234ABCD")
+
+
+def test_intel_hex_records(tmp_path):
+    write_output(array("H", range(9)), tmp_path / "image.hex", "hex")
+    assert (tmp_path / "image.hex").read_text(encoding="ascii").splitlines() == [
+        ":1000000000000100020003000400050006000700D4",
+        ":020010000800E6",
+        ":00000001FF",
+    ]
+
+
+def test_failed_write_keeps_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "image.bin"
+    path.write_bytes(b"old!")
+
+    def fail(*args: object) -> None:
+        raise OSError("disk is full")
+
+    monkeypatch.setattr(writers.os, "replace", fail)
+    with pytest.raises(OSError, match="disk is full"):
+        write_output(array("H", [1, 2, 3]), path, "bin")
+    assert path.read_bytes() == b"old!"
+    assert os.listdir(tmp_path) == ["image.bin"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="file modes are only checked on POSIX")
+def test_file_modes(tmp_path):
+    old_umask = os.umask(0o027)
+    try:
+        write_output(array("H", [1]), tmp_path / "new.bin", "bin")
+        assert os.umask(0o027) == 0o027  # запись не меняет umask
+        existing = tmp_path / "existing.bin"
+        existing.write_bytes(b"")
+        existing.chmod(0o604)
+        write_output(array("H", [1]), existing, "bin")
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(tmp_path / "new.bin").st_mode) == 0o640
+    assert stat.S_IMODE(os.stat(existing).st_mode) == 0o604
+
+
+def test_unchanged_image_is_not_written_again(tmp_path):
+    stamps = OutputStamps(tmp_path / "stamps")
+    path = tmp_path / "image.bin"
+    machine_code = array("H", [1, 2, 3])
+    assert write_output(machine_code, path, "bin", stamps)
+    assert not write_output(machine_code, path, "bin", stamps)
+    # другой формат, другой образ и изменённый файл записываются заново
+    assert write_output(machine_code, path, "bin-be", stamps)
+    assert write_output(array("H", [1, 2, 4]), path, "bin-be", stamps)
+    path.write_bytes(b"changed")
+    assert write_output(array("H", [1, 2, 4]), path, "bin-be", stamps)
+    assert read_image(path, "bin-be") == array("H", [1, 2, 4])
+    path.unlink()
+    assert write_output(array("H", [1, 2, 4]), path, "bin-be", stamps)
+    assert path.is_file()